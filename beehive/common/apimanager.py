@@ -2,21 +2,24 @@
 #
 # (C) Copyright 2018-2024 CSI-Piemonte
 
+import atexit
 from logging import Logger, getLogger
 from time import time
+from random import random
 from typing import List
 from zlib import decompress
 from uuid import uuid4
 from base64 import b64decode
 from binascii import a2b_base64, a2b_hex
-from typing import List, Union, Callable
+from hashlib import md5
+from typing import List, Union, Callable, Tuple, Type
 from re import match
 from datetime import datetime
 from copy import deepcopy
 from Crypto.Hash import SHA256
 from six import ensure_text
 import ujson as json
-from flask import request, Response, session, current_app
+from flask import request, Response, session, current_app, stream_with_context
 from flask.views import MethodView as FlaskView
 from flask_session import Session
 from flask_session.sessions import RedisSessionInterface
@@ -31,14 +34,26 @@ from beecell.file import read_file
 from beecell.types.type_class import get_class_methods_by_decorator
 from beecell.types.type_string import truncate, str2bool
 from beecell.types.type_date import format_date
-from beecell.simple import import_class, get_class_name, dynamic_import, jsonDumps
+from beecell.simple import import_class, get_class_name, dynamic_import
 from beecell.flask.api_util import get_remote_ip
 from beecell.sendmail import Mailer
 from beehive.common.data import operation, trace, encrypt_data, decrypt_data
-from beehive.common.audit import Audit, initAudit, localAudit
+from beehive.common.perms import (
+    SNAPSHOT_PREFIX,
+    PermissionIndex,
+    PermissionCache,
+    decode_perms,
+    encode_perms,
+    get_perms_index,
+    is_perms_snapshot,
+)
+from beehive.common.audit import Audit, AuditShipper, initAudit, localAudit
+from beehive.common.metrics import PhaseTimer, metrics
+from beehive.common.maintenance import MaintenanceCache
+from beehive.common.serializer import dumps as serializer_dumps, loads as serializer_loads, set_serializer
 from beecell.auth import DatabaseAuth, LdapAuth, SystemUser
 from beehive.common.apiclient import BeehiveApiClient, BeehiveApiClientError
-from beehive.common.model import AbstractDbManager
+from beehive.common.model import AbstractDbManager, PaginatedQueryGenerator
 from beehive.common.model.config import ConfigDbManager
 from beehive.common.model.authorization import AuthDbManager, Role
 from dict2xml import dict2xml
@@ -53,7 +68,7 @@ except Exception:
     pass
 from elasticsearch import Elasticsearch
 from flasgger import Swagger, SwaggerView
-from marshmallow import fields, Schema, ValidationError
+from marshmallow import fields, Schema, ValidationError, validates, validates_schema
 from marshmallow.validate import OneOf, Range
 
 ## from beecell.debug import dbgprint
@@ -245,6 +260,16 @@ class ApiManager(object):
         self.api_timeout = float(self.params.get("api_timeout", 10.0))
         self.api_timeout_max = float(self.params.get("api_timeout_max", 3600.0))
 
+        # json serializer used for api request and response. Can be auto, orjson, json
+        set_serializer(ensure_text(self.params.get("api_json_serializer", "auto")))
+
+        # api response schema validation. Mode can be off, sampled, always
+        self.response_validation = ensure_text(self.params.get("api_response_validation", "always"))
+        self.response_validation_sample = float(self.params.get("api_response_validation_sample", 10.0))
+        if self.response_validation not in ApiView.RESPONSE_VALIDATION_MODES:
+            self.logger.warning("Response validation mode %s is not supported. Use always" % self.response_validation)
+            self.response_validation = "always"
+
         # api endpoints
         self.endpoints = []
         self.api_user = None
@@ -258,6 +283,9 @@ class ApiManager(object):
         # elasticsearch
         self.elasticsearch = None
 
+        # background audit shipper
+        self.audit_shipper: AuditShipper = None
+
         # logstash
         self.logstash = None
 
@@ -276,6 +304,52 @@ class ApiManager(object):
         self.prefix_index = "identity:index:"
         self.expire = 3600
 
+        # decoded identity permissions cache
+        self.perms_cache = PermissionCache(
+            size=int(self.params.get("api_perms_cache_size", 1000)),
+            ttl=int(self.params.get("api_perms_cache_ttl", self.expire)),
+        )
+
+        # identity permissions stored as snapshots shared by the identities with the same permissions
+        self.perms_snapshot = str2bool(ensure_text(self.params.get("api_perms_snapshot", "false")))
+        self.perms_snapshot_ttl = int(self.params.get("api_perms_snapshot_ttl", 86400))
+        self.prefix_perms_snapshot = "perms:snapshot:"
+
+        # task step progress write-behind buffer. Progress traces can be stored in db or in redis
+        self.task_trace_buffer_size = int(self.params.get("task_trace_buffer_size", 50))
+        self.task_trace_flush_interval = float(self.params.get("task_trace_flush_interval", 5.0))
+        self.task_progress_trace = ensure_text(self.params.get("task_progress_trace", "db"))
+
+        # task status mirrored in redis and read by the task status api before the database
+        self.task_status_cache = str2bool(ensure_text(self.params.get("task_status_cache", "true")))
+
+        # scheduler tasks retention. Tasks older than the retention days of their name, or of the default retention,
+        # are archived and deleted with their steps and traces. task_retention syntax is <name>:<days>,<name>:<days>
+        self.task_retention_days = int(self.params.get("task_retention_days", 30))
+        self.task_retention = {}
+        for item in ensure_text(self.params.get("task_retention", "")).split(","):
+            if item.strip() != "":
+                name, days = item.strip().rsplit(":", 1)
+                self.task_retention[name] = int(days)
+        self.task_archive_path = ensure_text(self.params.get("task_archive_path", "")) or None
+        self.task_purge_chunk = int(self.params.get("task_purge_chunk", 500))
+
+        # role permissions cache used to build the identity permissions at login
+        AuthDbManager.role_perms_cache.size = int(self.params.get("api_role_perms_cache_size", 1000))
+        AuthDbManager.role_perms_cache.ttl = float(self.params.get("api_role_perms_cache_ttl", 60))
+
+        # list queries filter entities by permission tag ids resolved once for every identity. Unused permission tags
+        # are kept to not invalidate the resolved ids
+        self.perm_tag_ids = str2bool(ensure_text(self.params.get("api_perm_tag_ids", "false")))
+        AbstractDbManager.keep_perm_tags = self.perm_tag_ids
+        self.perm_tag_miss_ttl = float(self.params.get("api_perm_tag_miss_ttl", 0.0))
+
+        # maintenance flags cache
+        self.maintenance_cache = MaintenanceCache(ttl=float(self.params.get("api_maintenance_ttl", 1.0)))
+
+        # time to live of the totals cached by paginated queries with cached count strategy
+        self.count_cache_ttl = int(self.params.get("api_count_cache_ttl", 30))
+
         # scheduler
         self.redis_taskmanager: RedisManager = None
         self.redis_scheduler: RedisManager = None
@@ -399,6 +473,60 @@ class ApiManager(object):
             self.logger.error(str(ex))
             raise ApiManagerError(str(ex))
 
+    def set_perms_snapshot(self, perms: list) -> str:
+        """Store identity permissions in a snapshot shared by all the identities with the same permissions. Snapshot
+        key is the digest of the encoded permissions. When the snapshot already exists only its expire time is
+        extended.
+
+        :param perms: list of [id, oid, objtype, objdef, objid, aid, action]
+        :return: snapshot reference to store in the identity in place of the permissions
+        """
+        data = encode_perms(perms)
+        digest = md5(data).hexdigest()
+        key = self.prefix_perms_snapshot + digest
+        conn = self.redis_identity_manager.conn
+        if not conn.expire(key, self.perms_snapshot_ttl):
+            conn.set(key, data, ex=self.perms_snapshot_ttl)
+            self.logger.debug("Set permissions snapshot %s: %s bytes" % (digest, len(data)))
+        return SNAPSHOT_PREFIX + digest
+
+    def get_perms(self, perms) -> list:
+        """Get identity permissions
+
+        :param perms: compressed permissions or permissions snapshot reference
+        :return: list of [id, oid, objtype, objdef, objid, aid, action]
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        if is_perms_snapshot(perms):
+            digest = ensure_text(perms)[len(SNAPSHOT_PREFIX) :]
+            key = self.prefix_perms_snapshot + digest
+            pipe = self.redis_identity_manager.conn.pipeline()
+            data, res = pipe.get(key).expire(key, self.perms_snapshot_ttl).execute()
+            if data is None:
+                raise ApiManagerError("Permissions snapshot %s does not exist or is expired" % digest, code=401)
+            return decode_perms(data)
+        return serializer_loads(decompress(a2b_base64(perms)))
+
+    def get_perms_index(self, key: str, perms) -> PermissionIndex:
+        """Get identity permissions index. Index is read from the permissions cache when identity permissions are not
+        changed. The index of a permissions snapshot is cached once for all the identities that reference it.
+
+        :param key: identity key
+        :param perms: compressed permissions or permissions snapshot reference
+        :return: PermissionIndex instance
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        if is_perms_snapshot(perms):
+            key = ensure_text(perms)
+            digest = key[len(SNAPSHOT_PREFIX) :]
+        else:
+            digest = self.perms_cache.digest(perms)
+        index = self.perms_cache.get(key, digest)
+        if index is None:
+            index = PermissionIndex(self.get_perms(perms))
+            self.perms_cache.set(key, digest, index)
+        return index
+
     def verify_simple_http_credentials(self, user, pwd, user_ip):
         """Verify simple http credentials.
 
@@ -586,6 +714,43 @@ class ApiManager(object):
         """
         return self.modules[name]
 
+    def get_audit_sender(self) -> Union[AuditShipper, Elasticsearch, None]:
+        """Return object used to send audit. It is the background audit shipper when configured, otherwise the
+        elasticsearch client
+
+        :return: AuditShipper instance, Elasticsearch instance or None
+        """
+        if self.audit_shipper is not None:
+            return self.audit_shipper
+        return self.elasticsearch
+
+    def get_event_producer_info(self) -> Union[dict, None]:
+        """Return event producer buffered mode statistics
+
+        :return: dict with statistics or None if event producer is not configured
+        """
+        if self.event_producer is None:
+            return None
+        return self.event_producer.info()
+
+    def get_api_client_pool_info(self) -> Union[dict, None]:
+        """Return api client keep-alive connection pool statistics
+
+        :return: dict with statistics or None if api client or its pool is not configured
+        """
+        if self.api_client is None or self.api_client.pool is None:
+            return None
+        return self.api_client.pool.info()
+
+    def get_audit_shipper_info(self) -> Union[dict, None]:
+        """Return background audit shipper statistics
+
+        :return: dict with statistics or None if audit shipper is not configured
+        """
+        if self.audit_shipper is None:
+            return None
+        return self.audit_shipper.info()
+
     def configure(self):
         """Configure api manager"""
         self.logger.info("Configure server - CONFIGURE")
@@ -958,6 +1123,18 @@ class ApiManager(object):
                         )
                         self.logger.info("Elasticsearch client: %s" % self.elasticsearch)
                         self.logger.info("Configure elasticsearch - CONFIGURED")
+
+                        # background audit shipper
+                        if str2bool(self.params.get("api_audit_async", "true")) is True:
+                            self.audit_shipper = AuditShipper(
+                                self.elasticsearch,
+                                queue_size=int(self.params.get("api_audit_queue_size", 10000)),
+                                batch_size=int(self.params.get("api_audit_batch_size", 500)),
+                                flush_interval=float(self.params.get("api_audit_flush_interval", 1.0)),
+                                drop_policy=ensure_text(self.params.get("api_audit_drop_policy", "drop_new")),
+                            )
+                            atexit.register(self.audit_shipper.stop)
+                            self.logger.info("Configure audit shipper: %s" % self.audit_shipper)
                     else:
                         self.logger.warning("Configure elasticsearch - NOT CONFIGURED")
                 except Exception:
@@ -1067,6 +1244,16 @@ class ApiManager(object):
                         self.logger.info("Configure event queue - CONFIGURED")
                     else:
                         self.logger.warning("Configure event queue - NOT CONFIGURED")
+
+                    # buffered event producer
+                    if self.event_producer is not None and str2bool(self.params.get("api_event_buffered", "false")):
+                        self.event_producer.set_buffered(
+                            queue_size=int(self.params.get("api_event_queue_size", 10000)),
+                            batch_size=int(self.params.get("api_event_batch_size", 100)),
+                            max_latency=float(self.params.get("api_event_max_latency", 0.5)),
+                        )
+                        atexit.register(self.event_producer.stop)
+                        self.logger.info("Configure event queue - buffered mode: %s" % self.event_producer.info())
                 except Exception:
                     self.logger.warning("Configure event queue - NOT CONFIGURED", exc_info=True)
 
@@ -1298,6 +1485,9 @@ class ApiManager(object):
             client_config=self.api_oauth2_client,
             oauth2_grant_type=oauth2_grant_type,
             authtype=authtype,
+            pool_size=int(self.params.get("api_client_pool_size", 10)),
+            pool_idle=float(self.params.get("api_client_pool_idle", 30.0)),
+            task_wait=int(self.params.get("api_client_task_wait", 0)),
         )
         self.logger.debug("Configure api client: %s" % self.api_client)
 
@@ -1579,6 +1769,10 @@ class ApiController(object):
                 "sql_ping": sql_ping,
                 "redis_ping": redis_ping,
                 "redis_identity_ping": redis_identity_ping,
+                "perms_cache": self.module.api_manager.perms_cache.info(),
+                "role_perms_cache": AuthDbManager.role_perms_cache.info(),
+                "audit_shipper": self.module.api_manager.get_audit_shipper_info(),
+                "event_producer": self.module.api_manager.get_event_producer_info(),
             }
             self.logger.debug("ping service: %s" % truncate(res))
             return res
@@ -1596,6 +1790,11 @@ class ApiController(object):
                 "name": self.module.api_manager.app_name,
                 "id": self.module.api_manager.app_id,
                 "modules": {k: v.info() for k, v in self.module.api_manager.modules.items()},
+                "perms_cache": self.module.api_manager.perms_cache.info(),
+                "role_perms_cache": AuthDbManager.role_perms_cache.info(),
+                "audit_shipper": self.module.api_manager.get_audit_shipper_info(),
+                "event_producer": self.module.api_manager.get_event_producer_info(),
+                "api_client_pool": self.module.api_manager.get_api_client_pool_info(),
             }
             self.logger.debug("Get server info: %s" % truncate(res))
             return res
@@ -1603,6 +1802,25 @@ class ApiController(object):
             self.logger.error(ex)
             raise ApiManagerError(ex, code=8000)
 
+    def get_metrics(self, prefix=None):
+        """Get in-process timing histograms
+
+        :param prefix: return only histograms whose name starts with prefix [optional]
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        try:
+            res = {
+                "name": self.module.api_manager.app_name,
+                "id": self.module.api_manager.app_id,
+                "hostname": self.module.api_manager.server_name,
+                "histograms": metrics.info(prefix=prefix),
+            }
+            self.logger.debug("Get server metrics: %s" % truncate(res))
+            return res
+        except Exception as ex:
+            self.logger.error(ex)
+            raise ApiManagerError(ex, code=8000)
+
     def __get_version(self, package):
         """Get package version
 
@@ -1785,6 +2003,45 @@ class ApiController(object):
             child(self).init_object()
         self.logger.info("Init %s - STOP" % self)
 
+    def register_objects(self, objs: List[Tuple[Type["ApiObject"], List[str], int, str]]):
+        """Register many objects in bulk. It is the bulk version of ApiObject.register_object. Authorization objects
+        of the entities and of their child classes are added with one call for every class, existing objects are
+        skipped. Permission tags of all the entities are added in a single transaction.
+
+        :param objs: list of (entity_class, objids, oid, desc). objids is the objid split by //, oid the database id
+            used for the permission tags. Use oid None for entities without permission tags
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        entities = {}
+        sysobjs = {}
+        tags = []
+
+        def add(entity_class, objids, oid, desc):
+            entity = entities.get(entity_class, None)
+            if entity is None:
+                entity = entities[entity_class] = entity_class(self, oid=None)
+            objids = [ensure_text(o) for o in objids]
+            sysobjs.setdefault(entity_class, []).append(("//".join(objids), desc))
+            if oid is not None:
+                tags.extend(entity.get_object_permtags(objids, oid=oid))
+            for child in entity.child_classes:
+                add(child, objids + ["*"], None, child.objdesc)
+
+        for entity_class, objids, oid, desc in objs:
+            add(entity_class, objids, oid, desc)
+
+        for entity_class, items in sysobjs.items():
+            entities[entity_class].add_system_objects(items)
+        self.logger.debug("Register objects: %s" % {k.objdef: len(v) for k, v in sysobjs.items()})
+
+        if len(tags) > 0:
+            try:
+                self.manager.add_perm_tags(tags)
+            except TransactionError as ex:
+                self.logger.error(ex, exc_info=False)
+                raise ApiManagerError(ex, code=ex.code)
+        self.logger.debug("Register objects permission tags: %s" % len(tags))
+
     def get_session(self):
         """open db session"""
         return self.module.api_manager.get_session()
@@ -1859,62 +2116,13 @@ class ApiController(object):
         :raises ApiManagerError: raise :class:`ApiManagerError`
         """
 
-        # dbgprint( action=action, objtype=objtype, definition=definition, user0=operation.user[0], user1=operation.user[1], perms=operation.perms )
         try:
-            objids = []
-            defs = []
-            # user = (operation.user[0], operation.user[1])
             self.logger.debug2("can - action, objtype, definition - %s, %s, %s" % (action, objtype, definition))
 
-            res = {}
-            self.logger.debug2("can - operation.perms: %s" % operation.perms)
-            for perm in operation.perms:
-                # perm = (0-pid, 1-oid, 2-type, 3-definition, 4-objid, 5-aid, 6-action)
-                # Es: (5, 1, 'resource', 'container.org.group.vm', 'c1.o1.g1.*', 6, 'use')
-                perm_objtype = perm[2]
-                perm_objid = perm[4]
-                perm_action = perm[6]
-                perm_definition = perm[3].lower()
-
-                # definition is specified
-                if definition is not None:
-                    definition = definition.lower()
-                    # self.logger.debug2("can - perm_action, perm_objtype, perm_definition - %s, %s, %s" % (perm_action, perm_objtype, perm_definition))
-
-                    # verify object type, definition and action. If they match
-                    # append objid to values list
-                    if perm_objtype == objtype and perm_definition == definition and perm_action in ["*", action]:
-                        objids.append(perm_objid)
-                        # self.logger.debug2("can - match definition - perm_action, perm_objtype, perm_definition - %s, %s, %s" % (perm_action, perm_objtype, perm_definition))
-
-                    # loop between object objids, compact objids and verify match
-                    if len(objids) > 0:
-                        res[definition] = objids
-
-                elif objtype is not None:
-                    if perm_objtype == objtype and perm_action in ["*", action]:
-                        if perm_definition in res:
-                            res[perm_definition].append(perm_objid)
-                        else:
-                            res[perm_definition] = [perm_objid]
-                        # self.logger.debug2("can - match objtype - perm_action, perm_objtype, perm_definition - %s, %s, %s" % (perm_action, perm_objtype, perm_definition))
+            # get compiled permissions index of the current identity
+            res = get_perms_index().can(action, objtype, definition=definition)
 
-                else:
-                    if perm_action in ["*", action]:
-                        if perm_definition in res:
-                            res[perm_definition].append(perm_objid)
-                        else:
-                            res[perm_definition] = [perm_objid]
-                        # self.logger.debug2("can - match perm_action - perm_action, perm_objtype, perm_definition - %s, %s, %s" % (perm_action, perm_objtype, perm_definition))
-
-            for objdef, objids in res.items():
-                # loop between object objids, compact objids and verify match
-                if len(objids) > 0:
-                    res[objdef] = extract(res[objdef])
-                    # self.logger.debug('%s:%s can %s objects {%s, %s, %s}' %
-                    #    (user[0], user[1], action, objtype, objdef, res[objdef]))
-
-            if len(list(res.keys())) > 0:
+            if len(res) > 0:
                 return res
             else:
                 if definition is None:
@@ -1974,9 +2182,8 @@ class ApiController(object):
         if operation.authorize is False:
             return True
         try:
-            objs = self.can(action, objtype, definition=objdef)
             # check authorization
-            objset = set(objs[objdef.lower()])
+            self.can(action, objtype, definition=objdef)
 
             # create needs
             if action == "insert":
@@ -1987,8 +2194,9 @@ class ApiController(object):
             needs = self.get_needs(objid.split("//"))
 
             # check needs overlaps perms
-            res = self.has_needs(needs, objset)
+            res = get_perms_index().has_needs(action, objtype, objdef, needs)
             if res is False:
+                self.logger.warning("Perms do not overlap needs %s" % needs)
                 raise ApiManagerError("")
             self.logger.debug2("check authorization OK")
         except ApiManagerError:
@@ -2014,15 +2222,14 @@ class ApiController(object):
         action = "*"
 
         try:
-            objs = self.can(action, objtype, definition=objdef)
             # check authorization
-            objset = set(objs[objdef.lower()])
+            self.can(action, objtype, definition=objdef)
 
             # create needs
             needs = self.get_needs(objid.split("//"))
 
             # check needs overlaps perms
-            res = self.has_needs(needs, objset)
+            res = get_perms_index().has_needs(action, objtype, objdef, needs)
             if res is False:
                 raise ApiManagerError("")
             self.logger.debug2("check authorization service OK")
@@ -2042,15 +2249,14 @@ class ApiController(object):
         action = "*"
 
         try:
-            objs = self.can(action, objtype, definition=objdef)
             # check authorization
-            objset = set(objs[objdef.lower()])
+            self.can(action, objtype, definition=objdef)
 
             # create needs
             needs = self.get_needs(objid.split("//"))
 
             # check needs overlaps perms
-            res = self.has_needs(needs, objset)
+            res = get_perms_index().has_needs(action, objtype, objdef, needs)
             if res is False:
                 raise ApiManagerError("")
             self.logger.debug2("check authorization resource OK")
@@ -2182,6 +2388,29 @@ class ApiController(object):
         """
         return None
 
+    def set_perm_tag_ids(self, entity_class, kvargs):
+        """Add to kvargs the ids of the permission tags used to filter entities. Ids are resolved once for every
+        identity and reused by the following queries.
+
+        :param entity_class: ApiObject Extension class
+        :param kvargs: query params
+        """
+        api_manager = self.module.api_manager
+        if api_manager.perm_tag_ids is not True:
+            return
+        try:
+            kvargs["tag_ids"] = get_perms_index().get_tag_ids(
+                "view",
+                entity_class.objtype,
+                entity_class.objdef,
+                self.manager.hash_from_permission,
+                self.manager.get_perm_tag_ids,
+                miss_ttl=api_manager.perm_tag_miss_ttl,
+            )
+            self.logger.debug("Permission tag ids to apply: %s" % truncate(kvargs["tag_ids"]))
+        except QueryError as ex:
+            self.logger.warning("Permission tag ids can not be resolved. Use tags: %s" % ex)
+
     def get_paginated_entities(
         self,
         entity_class,
@@ -2211,22 +2440,33 @@ class ApiController(object):
         :param authorize: boolean if True check authorizatione and query with perm_tag default True
         :param args: custom params
         :param kvargs: custom params
+        :param kvargs.stream: if True return a generator of entity_class instances. Records are fetched from db
+            and customized in chunks [default=False]
+        :param kvargs.count_strategy: strategy used to calculate total. Can be exact, cached, window, has_more
+            [default=exact]
         :return: (list of entity_class instances, total)
         :raises ApiManagerError: raise :class:`ApiManagerError`
         """
         res = []
         tags = []
+        stream = kvargs.get("stream", False)
+
+        # cached count strategy save totals in api cache
+        if kvargs.get("count_strategy", None) == "cached":
+            kvargs["count_cache"] = self.cache
+            kvargs["count_cache_ttl"] = self.module.api_manager.count_cache_ttl
 
         if operation.authorize is True:
             if authorize:
                 # verify permissions
-                objs = self.can("view", entity_class.objtype, definition=entity_class.objdef)
-                objs = objs.get(entity_class.objdef.lower())
+                self.can("view", entity_class.objtype, definition=entity_class.objdef)
 
                 # create permission tags
-                for p in objs:
-                    tags.append(self.manager.hash_from_permission(entity_class.objdef, p))
-                self.logger.debug("Permission tags to apply: %s" % tags)
+                tags = get_perms_index().get_tags(
+                    "view", entity_class.objtype, entity_class.objdef, self.manager.hash_from_permission
+                )
+                self.logger.debug("Permission tags to apply: %s" % truncate(tags))
+                self.set_perm_tag_ids(entity_class, kvargs)
             else:
                 kvargs["with_perm_tag"] = False
                 self.logger.debug("Auhtorization disabled by flag for command")
@@ -2245,6 +2485,10 @@ class ApiController(object):
                 **kvargs,
             )
 
+            if stream is True:
+                self.logger.debug("Stream %s (total:%s)" % (entity_class.__name__, total))
+                return self.stream_entities(entity_class, entities, customize, tags, *args, **kvargs), total
+
             for entity in entities:
                 obj = entity_class(
                     self,
@@ -2267,6 +2511,43 @@ class ApiController(object):
             self.logger.warning(ex, exc_info=True)
             return [], 0
 
+    def stream_entities(self, entity_class, entities, customize=None, tags=None, *args, **kvargs):
+        """Generator of entities. Entities are converted to entity_class instances and customized in chunks so only
+        one chunk is kept in memory
+
+        :param entity_class: ApiObject Extension class
+        :param entities: iterable of model entities
+        :param customize: function used to customize entities. Signature: def customize(entities, *args, **kvargs)
+        :param tags: permission tags [optional]
+        :param args: custom params
+        :param kvargs: custom params
+        :param kvargs.chunk: number of entities in a chunk [default=100]
+        :return: generator of entity_class instances
+        """
+        size = kvargs.pop("chunk", 100)
+        chunk = []
+        for entity in entities:
+            obj = entity_class(
+                self,
+                oid=entity.id,
+                objid=entity.objid,
+                name=entity.name,
+                active=entity.active,
+                desc=entity.desc,
+                model=entity,
+            )
+            chunk.append(obj)
+            if len(chunk) >= size:
+                if customize is not None:
+                    customize(chunk, tags=tags, *args, **kvargs)
+                yield from chunk
+                chunk = []
+
+        if len(chunk) > 0:
+            if customize is not None:
+                customize(chunk, tags=tags, *args, **kvargs)
+            yield from chunk
+
     def get_entities(self, entity_class, get_entities, authorize=True, *args, **kvargs):
         """Get entities less pagination
 
@@ -2288,15 +2569,14 @@ class ApiController(object):
         if operation.authorize is True:
             if authorize:
                 # verify permissions
-                objs = self.can("view", entity_class.objtype, definition=entity_class.objdef)
-                objs = objs.get(entity_class.objdef.lower())
+                self.can("view", entity_class.objtype, definition=entity_class.objdef)
 
                 # create permission tags
                 # todo check me:  creo tags solo se operation.authorize altrimenti query fallisce senza tags
-                tags = []
-                for p in objs:
-                    tags.append(self.manager.hash_from_permission(entity_class.objdef, p))
-                self.logger.debug("Permission tags to apply: %s" % tags)
+                tags = get_perms_index().get_tags(
+                    "view", entity_class.objtype, entity_class.objdef, self.manager.hash_from_permission
+                )
+                self.logger.debug("Permission tags to apply: %s" % truncate(tags))
 
         try:
             entities = get_entities(tags=tags, *args, **kvargs)
@@ -2720,6 +3000,22 @@ class ApiObject(object):
 
         return objdis
 
+    def get_object_permtags(self, args, oid=None):
+        """Get object permission tags
+
+        :param args: objid split by //
+        :param oid: database id [default=self.oid]
+        :return: list of (tag, explain, oid, objdef) like the items of AbstractDbManager.add_perm_tags
+        """
+        if oid is None:
+            oid = self.oid
+        abstractDbManager: AbstractDbManager = self.manager
+        objdef = self.objdef.lower()
+        return [
+            (abstractDbManager.hash_from_permission(objdef, i), "%s-%s" % (objdef, i), oid, self.objdef)
+            for i in self.get_all_valid_objids(args)
+        ]
+
     def register_object_permtags(self, args):
         """Register object permission tags. Create new permission tags in perm_tag if they do not already exist.
         Create association between permission tags and object in perm_tag_entity.
@@ -2727,14 +3023,7 @@ class ApiObject(object):
         :param args: objid split by //
         """
         if self.oid is not None:
-            ids = self.get_all_valid_objids(args)
-            for i in ids:
-                perm = "%s-%s" % (self.objdef.lower(), i)
-
-                abstractDbManager: AbstractDbManager = self.manager
-                tag = abstractDbManager.hash_from_permission(self.objdef.lower(), i)
-                table = self.objdef
-                self.manager.add_perm_tag(tag, perm, self.oid, table)
+            self.manager.add_perm_tags(self.get_object_permtags(args))
 
     def deregister_object_permtags(self):
         """Deregister object permission tags."""
@@ -2772,6 +3061,15 @@ class ApiObject(object):
             self.logger.debug("Register api object child - objids: %s - desc: %s - START" % (objids, child.objdesc))
             child(self.controller, oid=None).register_object(list(objids), desc=child.objdesc)
 
+    def add_system_objects(self, objs):
+        """Add authorization objects of this class with all related permissions. Objects that already exist are
+        skipped.
+
+        :param objs: list of (objid, desc)
+        """
+        objects = [{"subsystem": self.objtype, "type": self.objdef, "objid": o, "desc": d} for o, d in objs]
+        self.api_client.add_objects(objects)
+
     def deregister_object(self, objids):
         """Deregister object types, objects and permissions related to module.
 
@@ -3354,6 +3652,21 @@ class ApiInternalObject(ApiObject):
         for child in self.child_classes:
             child(self.controller, oid=None).register_object(objids, desc=child.objdesc)
 
+    def add_system_objects(self, objs):
+        """Add authorization objects of this class with all related permissions. Objects that already exist are
+        skipped.
+
+        :param objs: list of (objid, desc)
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        try:
+            obj_type = self.auth_db_manager.get_object_type(objtype=self.objtype, objdef=self.objdef)[0][0]
+            actions = self.auth_db_manager.get_object_action()
+            self.auth_db_manager.add_objects([(obj_type, o, d) for o, d in objs], actions)
+        except (QueryError, TransactionError) as ex:
+            self.logger.error("Add system objects: %s - ERROR" % ex.value)
+            raise ApiManagerError(ex, code=400)
+
     def deregister_object(self, objids):
         """Deregister object types, objects and permissions related to module.
 
@@ -3557,7 +3870,7 @@ class ApiViewResponse(ApiObject):
             action = "delete"
 
         params_obscured = obscure_data(deepcopy(params))
-        kwargs_obscure = jsonDumps(params_obscured)
+        kwargs_obscure = serializer_dumps(params_obscured)
 
         # send event
         data = {
@@ -3610,12 +3923,21 @@ class ApiView(FlaskView):
     parameters = []
     parameters_schema = None
     response_schema = None
+    response_validation = None  #: response validation mode: off, sampled, always. None use api manager mode
+    response_validation_sample = None  #: percentage of validated responses in sampled mode. None use api manager one
 
     RESPONSE_MIME_TYPE = ["application/json", "application/bson", "text/xml", "*/*"]
+    RESPONSE_VALIDATION_MODES = ["off", "sampled", "always"]
+    STREAM_BUFFER_SIZE = 65536  #: size in bytes of the chunks written by a streamed response
+
+    # response schema instances by view class
+    _response_schemas = {}
 
     def __init__(self, *argc, **argv):
         self.identity_key: str = None
         self.logger = getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
+        self.timer: PhaseTimer = PhaseTimer("api")
+        self.streamed: bool = False
 
     def get_user_agent(self):
         return request.headers.get("User-Agent")
@@ -3743,13 +4065,17 @@ class ApiView(FlaskView):
         if authfilter == "keyauth":
             # get identity and verify signature
             uid, sign, data = self.__get_token()
+            self.timer.mark("auth_filter")
             identity = controller.verify_request_signature(uid, sign, data)
+            self.timer.mark("identity")
             self.identity_key = uid
         # - oauth2
         elif authfilter == "oauth2":
             uid = self.__get_oauth2_token()
+            self.timer.mark("auth_filter")
             # get identity
             identity = controller.get_oauth2_identity(uid)
+            self.timer.mark("identity")
             self.identity_key = uid
             if identity["type"] != "oauth2":
                 msg = "Token type oauth2 does not match with supplied token"
@@ -3759,7 +4085,9 @@ class ApiView(FlaskView):
         # - simple http authentication
         elif authfilter == "simplehttp":
             user, pwd, user_ip = self.__get_http_credentials()
+            self.timer.mark("auth_filter")
             identity = controller.verify_simple_http_credentials(user, pwd, user_ip)
+            self.timer.mark("identity")
             uid = None
             identity["seckey"] = None
             identity["ip"] = user_ip
@@ -3778,9 +4106,13 @@ class ApiView(FlaskView):
             name = user["name"]
             compress_perms = user["perms"]
 
-            # get permissions
-            operation.perms = json.loads(decompress(a2b_base64(compress_perms)))
+            # get permissions. Use cached permissions index if identity permissions are not changed
+            perms_key = uid if uid is not None else name
+            perms_index = module.api_manager.get_perms_index(perms_key, compress_perms)
+            operation.perms = perms_index.perms
+            operation.perms_index = perms_index
             operation.user = (name, identity["ip"], uid, identity.get("seckey", None))
+            self.timer.mark("perms")
             self.logger.debug2("Get user %s permissions: %s" % (name, truncate(operation.perms)))
             if self.authorizable:
                 ## TODO manage per method authorization
@@ -3900,13 +4232,13 @@ class ApiView(FlaskView):
 
             # render json
             elif self.response_mime == "application/json":
-                resp = jsonDumps(response)
+                resp = serializer_dumps(response)
                 self.logger.debug2("Api response: %s" % truncate(resp))
                 return Response(resp, mimetype="application/json", status=code, headers=headers)
 
             # render Bson
             elif self.response_mime == "application/bson":
-                resp = jsonDumps(response)
+                resp = serializer_dumps(response)
                 self.logger.debug2("Api response: %s" % truncate(resp))
                 return Response(resp, mimetype="application/bson", status=code, headers=headers)
 
@@ -3926,7 +4258,9 @@ class ApiView(FlaskView):
             self.logger.error(msg)
             raise ApiManagerError(msg, code=400)
 
-    def format_paginated_response(self, response, entity, total, page=None, field="id", order="DESC", **kvargs):
+    def format_paginated_response(
+        self, response, entity, total, page=None, field="id", order="DESC", objs=None, **kvargs
+    ):
         """Format response with pagination info
 
         :param response: response
@@ -3935,6 +4269,11 @@ class ApiView(FlaskView):
         :param total: total response records that user can view
         :param field: sorting field [default=id]
         :param order: sorting order [default=DESC]
+        :param objs: list of objects of the page with a db model. Used to build next_cursor [optional]
+        :param kvargs.cursor: keyset pagination cursor. If set response contains next_cursor [optional]
+        :param kvargs.size: page size [optional]
+        :param kvargs.count_strategy: requested count strategy. If set response contains the count strategy used
+            [optional]
         :return: dict with data
         """
         resp = {
@@ -3944,9 +4283,104 @@ class ApiView(FlaskView):
             "total": total,
             "sort": {"field": field, "order": order},
         }
+        if "cursor" in kvargs:
+            resp["next_cursor"] = self.get_next_cursor(response, field, kvargs.get("size"), objs=objs)
+        if kvargs.get("count_strategy", None) is not None:
+            resp["count_strategy"] = getattr(total, "strategy", "exact")
+            if resp["count_strategy"] == "has_more":
+                resp["has_more"] = total.has_more
 
         return resp
 
+    def get_next_cursor(self, response, field="id", size=None, objs=None):
+        """Get keyset pagination cursor of the next page from the last item of the page. When objs are passed cursor
+        is built from the db model of the last object, that contains the sorting field value used by the query.
+
+        :param response: list of items
+        :param field: sorting field [default=id]
+        :param size: page size [optional]
+        :param objs: list of objects of the page with a db model [optional]
+        :return: cursor or None if this is the last page
+        :raises ApiManagerError: raise :class:`ApiManagerError` if sorting field can not be used by cursor
+        """
+        if size is None or size <= 0 or len(response) < size:
+            return None
+        if objs is not None:
+            last = getattr(objs[-1], "model", None)
+            if last is None or not hasattr(last, field):
+                raise ApiManagerError("Field %s can not be used with pagination cursor" % field, code=400)
+            return PaginatedQueryGenerator.encode_cursor(getattr(last, field), last.id)
+        last = response[-1]
+        if not isinstance(last, dict) or field not in last or "id" not in last:
+            raise ApiManagerError("Field %s can not be used with pagination cursor" % field, code=400)
+        return PaginatedQueryGenerator.encode_cursor(last[field], last["id"])
+
+    def stream_paginated_response(
+        self, controller, objs, entity, total, page=None, field="id", order="DESC", **kvargs
+    ) -> Response:
+        """Stream response with pagination info. Use in place of format_paginated_response with the generator returned
+        by ApiController.get_paginated_entities called with stream=True. Json is written in chunks while objects are
+        read from db so memory does not grow with the page size. Db session is released when the response is closed.
+
+        :param controller: ApiController instance
+        :param objs: iterable of ApiObject
+        :param entity: entity like users
+        :param page: page number [optional]
+        :param total: total response records that user can view
+        :param field: sorting field [default=id]
+        :param order: sorting order [default=DESC]
+        :return: Flask Response
+        """
+        module = controller.module
+        perms = operation.perms
+        perms_index = operation.perms_index
+        buffer_size = self.STREAM_BUFFER_SIZE
+        self.streamed = True
+
+        def generate():
+            # permissions are unset by dispatch_request before the response is written
+            operation.perms = perms
+            operation.perms_index = perms_index
+
+            count = 0
+            chunk = ['{"%s": [' % entity]
+            chunk_size = 0
+            try:
+                for obj in objs:
+                    item = serializer_dumps(obj.info())
+                    if count > 0:
+                        item = "," + item
+                    chunk.append(item)
+                    chunk_size += len(item)
+                    count += 1
+                    if chunk_size >= buffer_size:
+                        yield "".join(chunk)
+                        chunk = []
+                        chunk_size = 0
+
+                sort = {"field": field, "order": order}
+                tail = serializer_dumps({"count": count, "page": page, "total": total, "sort": sort})
+                chunk.append("]," + tail[1:])
+                yield "".join(chunk)
+                self.logger.debug("Stream %s %s of %s" % (count, entity, total))
+            except Exception as ex:
+                # status code is already sent. Client gets a truncated json
+                self.logger.error("Error streaming %s: %s" % (entity, ex), exc_info=True)
+
+        def close():
+            operation.perms = None
+            operation.perms_index = None
+            module.release_session()
+
+        headers = {
+            "Cache-Control": "no-store",
+            "Pragma": "no-cache",
+            "remote-server": module.api_manager.server_name,
+        }
+        resp = Response(stream_with_context(generate()), mimetype="application/json", headers=headers)
+        resp.call_on_close(close)
+        return resp
+
     def dispatch(self, controller, data, *args, **kwargs):
         """http inner function. Override to implement apis
 
@@ -3996,6 +4430,72 @@ class ApiView(FlaskView):
 
         controller.check_authorization(type, ApiMethod.objdef, objid, action)
 
+    @classmethod
+    def get_response_schema(cls) -> Schema:
+        """Get response schema instance. Instance is created once for every view class and reused by all the requests
+
+        :return: Schema instance
+        """
+        item = ApiView._response_schemas.get(cls, None)
+        if item is None or item[0] is not cls.response_schema:
+            item = (cls.response_schema, cls.response_schema())
+            ApiView._response_schemas[cls] = item
+        return item[1]
+
+    @staticmethod
+    def check_response_validation(mode: str, sample: float) -> bool:
+        """Check if a response must be validated
+
+        :param mode: validation mode. Can be off, sampled, always
+        :param sample: percentage of validated responses in sampled mode
+        :return: True if response must be validated
+        """
+        if mode == "always":
+            return True
+        if mode == "sampled":
+            return random() * 100 < sample
+        return False
+
+    def is_response_validated(self, module: ApiModule) -> bool:
+        """Check if current response must be validated. View response_validation and response_validation_sample
+        override the api manager configuration.
+
+        :param module: ApiModule instance
+        :return: True if response must be validated
+        """
+        mode = self.response_validation
+        if mode is None:
+            mode = module.api_manager.response_validation
+        sample = self.response_validation_sample
+        if sample is None:
+            sample = module.api_manager.response_validation_sample
+        return self.check_response_validation(mode, sample)
+
+    def validate_response(self, resp):
+        """Validate response with response schema. Validation errors are only logged.
+
+        :param resp: view response. Can be a dict or a tuple (dict, code, [headers])
+        """
+        try:
+            schema: Schema = self.get_response_schema()
+            if isinstance(resp, tuple):
+                schema.load(data=resp[0])
+            else:
+                schema.load(data=resp)
+            self.logger.debug("+++++ validate response - OK - %s" % self.response_schema)
+        except ValidationError as err:
+            self.logger.error("+++++ validate response - KO - %s" % self.response_schema)
+            self.logger.error("+++++ validate response - err.messages: {}".format(err.messages))
+
+            try:
+                if isinstance(resp, tuple):
+                    # self.logger.warning('+++++ validate response - resp original: %s' % (resp[0]))
+                    self.logger.warning("+++++ validate response - resp: %s" % (obscure_data(resp[0])))
+                else:
+                    self.logger.warning("+++++ validate response - resp: %s" % (obscure_data(resp)))
+            except Exception as ex:
+                self.logger.error("ex trying logging resp: %s" % ex)
+
     def dispatch_request(self, module: ApiModule = None, secure=True, *args, **kwargs):
         """Base dispatch_request method. Extend this method in your child class
 
@@ -4029,6 +4529,11 @@ class ApiView(FlaskView):
         start = time()
         data = None
 
+        # request phases timer
+        self.timer = PhaseTimer("api")
+        self.streamed = False
+        streaming = False
+
         # open database session.
         # dbsession = module.get_session()
         module.get_session()
@@ -4046,6 +4551,7 @@ class ApiView(FlaskView):
             operation.authorize = True
             operation.cache = True
             operation.encryption_key = module.api_manager.app_fernet_key
+            operation.timeout = timeout_duration
             self.logger.debug2("Set response timeout to: %s" % timeout_duration)
 
             if self.get_user_agent() != "beehive-cmp":
@@ -4072,17 +4578,18 @@ class ApiView(FlaskView):
             self._get_response_mime_type()
 
             # check security
+            self.timer.mark("request")
             if secure is True:
                 self.authorize_request(module)
 
-            # get request data
+            # get request data. request_data is a copy of data used for audit and event. Parsing the body twice is
+            # faster than a deepcopy of parsed data
             try:
-                data = request_data
-                data = json.loads(data)
-            except (AttributeError, ValueError):
+                data = serializer_loads(request_data)
+                request_data = serializer_loads(request_data)
+            except (AttributeError, TypeError, ValueError):
                 data = request.values.to_dict()
-
-            request_data = deepcopy(data)
+                request_data = deepcopy(data)
 
             audit: Audit = initAudit(
                 request_id=operation.id,
@@ -4092,20 +4599,22 @@ class ApiView(FlaskView):
             )
 
             self.logger.debug2("Api request headers: %s" % headers)
+            self.timer.mark("request")
 
             # check system under maintenance
             from beehive.module.basic.views.status import StatusAPI
 
             if request.path.find(StatusAPI.MAINTENANCE_URI) < 0:
                 http_method = request.method.lower()
-                key = "cmp.%s.%s" % (module.name, http_method)
-                cmp_http_perm = controller.cache.redis_manager.get(key)
+                key = MaintenanceCache.get_key(module.name, http_method)
+                cmp_http_perm = module.api_manager.maintenance_cache.get(controller.cache.redis_manager, key)
                 if cmp_http_perm is not None and not str2bool(cmp_http_perm.decode("ascii")):
                     raise ApiManagerError(
                         "Nivola under maintenance: method %s in subsystem %s temporarily unavailable"
                         % (http_method, module.name),
                         code=503,
                     )
+            self.timer.mark("maintenance")
 
             # validate query/input data
             if self.parameters_schema is not None:
@@ -4136,38 +4645,23 @@ class ApiView(FlaskView):
                 self.logger.debug2("Api request data after validation: %s" % obscure_data(request_data))
             else:
                 self.logger.debug2("Api request data: %s" % obscure_data(request_data))
+            self.timer.mark("schema")
 
             # since relase 1.14.0
             if self.authorizable == True:
                 self.check_permission(controller, request.url_rule.rule, request.method.lower())
+                self.timer.mark("permission")
             # dispatch request
             meth = getattr(self, request.method.lower(), None)
             if meth is None:
                 meth = self.dispatch
             resp = meth(controller, data, *args, **kwargs)
+            self.timer.mark("handler")
 
             # fv - validate response
-            if self.response_schema is not None:
-                try:
-                    # self.logger.info('+++++ validate response - self.response_schema: %s' % self.response_schema)
-                    schema: Schema = self.response_schema()
-                    if isinstance(resp, tuple):
-                        parsed_response = schema.load(data=resp[0])
-                    else:
-                        parsed_response = schema.load(data=resp)
-                    self.logger.info("+++++ validate response - OK - %s" % self.response_schema)
-                except ValidationError as err:
-                    self.logger.error("+++++ validate response - KO - %s" % self.response_schema)
-                    self.logger.error("+++++ validate response - err.messages: {}".format(err.messages))
-
-                    try:
-                        if isinstance(resp, tuple):
-                            # self.logger.warning('+++++ validate response - resp original: %s' % (resp[0]))
-                            self.logger.warning("+++++ validate response - resp: %s" % (obscure_data(resp[0])))
-                        else:
-                            self.logger.warning("+++++ validate response - resp: %s" % (obscure_data(resp)))
-                    except Exception as ex:
-                        self.logger.error("ex trying logging resp: %s" % ex)
+            if self.response_schema is not None and self.streamed is False and self.is_response_validated(module):
+                self.validate_response(resp)
+                self.timer.mark("response_validation")
 
             if isinstance(resp, tuple):
                 code = resp[1]
@@ -4178,8 +4672,10 @@ class ApiView(FlaskView):
             else:
                 code = 200
                 res = self.get_response(resp, module=module)
+            self.timer.mark("serialization")
             # unset user permisssions in local thread object
             operation.perms = None
+            operation.perms_index = None
             # print('############# %s %s' % (gevent.getcurrent().name, request.path))
             # get request elapsed time
             elapsed = round(time() - start, 4)
@@ -4191,10 +4687,16 @@ class ApiView(FlaskView):
                 "code": code,
                 "user-agent": self.get_user_agent(),
             }
+            self.timer.skip()
             audit.update(state=code, api_method=request.path, req_method=request.method)
-            audit.send_audit(module.api_manager.elasticsearch, data=request_data)
+            audit.send_audit(module.api_manager.get_audit_sender(), data=request_data)
+            self.timer.mark("audit")
 
             ApiViewResponse(controller).send_event(event_data, request_data, opid=opid)
+            self.timer.mark("event")
+
+            # streamed response release db session when it is closed
+            streaming = self.streamed is True and isinstance(res, Response)
         except gevent.Timeout:
             # get request elapsed time
             elapsed = round(time() - start, 4)
@@ -4210,7 +4712,7 @@ class ApiView(FlaskView):
             try:
                 # audit = localAudit()
                 audit.update(state=408, api_method=request.path, req_method=request.method)
-                audit.send_audit(module.api_manager.elasticsearch, data=request_data)
+                audit.send_audit(module.api_manager.get_audit_sender(), data=request_data)
             except Exception as e:
                 pass
 
@@ -4230,7 +4732,7 @@ class ApiView(FlaskView):
             try:
                 # audit = localAudit()
                 audit.update(state=ex.code, api_method=request.path, req_method=request.method)
-                audit.send_audit(module.api_manager.elasticsearch, data=request_data)
+                audit.send_audit(module.api_manager.get_audit_sender(), data=request_data)
             except Exception as e:
                 pass
             ApiViewResponse(controller).send_event(event_data, request_data, exception=ex.value, opid=opid)
@@ -4250,7 +4752,7 @@ class ApiView(FlaskView):
             try:
                 # audit = localAudit()
                 audit.update(state=ex.code, api_method=request.path, req_method=request.method)
-                audit.send_audit(module.api_manager.elasticsearch, data=request_data)
+                audit.send_audit(module.api_manager.get_audit_sender(), data=request_data)
             except Exception as e:
                 pass
 
@@ -4271,18 +4773,29 @@ class ApiView(FlaskView):
             try:
                 # audit = localAudit()
                 audit.update(state=ex.code, api_method=request.path, req_method=request.method)
-                audit.send_audit(module.api_manager.elasticsearch, data=request_data)
+                audit.send_audit(module.api_manager.get_audit_sender(), data=request_data)
             except Exception as e:
                 pass
 
             return self.get_error("Exception", 400, str(ex), module=module)
         finally:
-            module.release_session()
+            if streaming is False:
+                module.release_session()
             timeout.cancel()
             self.logger.debug2("Timeout released")
+            self.observe_timer()
 
         return res
 
+    def observe_timer(self):
+        """Add request phases elapsed time to the metrics registry"""
+        try:
+            rule = request.url_rule.rule if request.url_rule is not None else request.path
+            self.timer.observe("%s %s" % (request.method, rule))
+            self.logger.debug2("Api request phases: %s" % self.timer.phases)
+        except Exception as ex:
+            self.logger.warning("Request metrics can not be collected: %s" % ex)
+
     @staticmethod
     def register_authorizable(module: ApiModule, rules: List[List[str]], version: str):
         """Register Api methods as object in the auth module.
@@ -4292,20 +4805,19 @@ class ApiView(FlaskView):
         """
         subsystem = module.api_manager.app_subsytem
         objdef = ApiMethod.objdef
+        objects = {}
 
         def register_object(url: str):
             rule = f"/{version}/{url}"
             objid = SHA256.new(bytes(rule, encoding="utf-8")).hexdigest()
             # objid = hashlib.sha256(bytes(rule, encoding='utf-8')).hexdigest()
 
-            logger.debug(f"Register api object: {subsystem}:{objdef} {rule} {objid} - START")
-            # add object and permissions
-            module.api_manager.api_client.add_object(subsystem, objdef, objid, rule)
+            logger.debug(f"Register api object: {subsystem}:{objdef} {rule} {objid}")
+            objects[objid] = {"subsystem": subsystem, "type": objdef, "objid": objid, "desc": rule}
             try:
                 localAudit().set_objid(objid=objid, objdef=objdef, force=True)
             except Exception as ex:
                 logger.error(ex)
-            logger.debug(f"Register api object: {subsystem}:{objdef} {objid} - STOP")
 
         for rule in rules:
             url: str = rule[0]
@@ -4317,6 +4829,10 @@ class ApiView(FlaskView):
                 register_object(url)
                 pass
 
+        # add objects and permissions
+        if len(objects) > 0:
+            module.api_manager.api_client.add_objects(list(objects.values()))
+
     @staticmethod
     def register_api(module: ApiModule, rules: list, version: str = None, only_auth=False):
         """Register api as Flask route
@@ -4400,6 +4916,42 @@ class PaginatedRequestQuerySchema(Schema):
         missing="id",
         context="query",
     )
+    count_strategy = fields.String(
+        required=False,
+        validate=OneOf(PaginatedQueryGenerator.COUNT_STRATEGIES),
+        example="exact",
+        context="query",
+        description="strategy used to calculate total. exact: count query, cached: count query result cached for "
+        "some seconds, window: total read with the records, has_more: total is not calculated, response reports "
+        "only if other records follow the page",
+    )
+
+
+class CursorPaginatedRequestQuerySchema(PaginatedRequestQuerySchema):
+    # sorting fields that can be used with cursor. They must be columns of the listed entity table
+    cursor_fields = ["id", "uuid", "objid", "name"]
+
+    cursor = fields.String(
+        required=False,
+        context="query",
+        description="keyset pagination cursor returned as next_cursor by the previous page. Pass an empty cursor to "
+        "get the first page. When set page is ignored",
+    )
+
+    @validates("cursor")
+    def validate_cursor(self, value):
+        if value:
+            try:
+                PaginatedQueryGenerator.decode_cursor(value)
+            except QueryError:
+                raise ValidationError("Pagination cursor is not valid")
+
+    @validates_schema
+    def validate_cursor_field(self, data, **kwargs):
+        if "cursor" in data and data.get("field", "id") not in self.cursor_fields:
+            raise ValidationError(
+                "Field can be %s with pagination cursor" % ", ".join(self.cursor_fields), field_name="field"
+            )
 
 
 class GetApiObjectRequestSchema(Schema):
@@ -4509,6 +5061,23 @@ class PaginatedResponseSchema(Schema):
         description="total number of available query items",
     )
     sort = fields.Nested(PaginatedResponseSortSchema, required=True, description="query sort order")
+    next_cursor = fields.String(
+        required=False,
+        allow_none=True,
+        example="WyJ0ZXN0IiwgMTBd",
+        description="keyset pagination cursor of the next page. Null on the last page",
+    )
+    count_strategy = fields.String(
+        required=False,
+        example="exact",
+        description="strategy used to calculate total. With has_more total is a lower bound",
+    )
+    has_more = fields.Boolean(
+        required=False,
+        allow_none=True,
+        example=False,
+        description="with has_more count strategy true if other records follow the page",
+    )
 
 
 class CrudApiObjectSimpleResponseSchema(Schema):
@@ -4634,6 +5203,9 @@ class ApiClient(BeehiveApiClient):
         key=None,
         proxy=None,
         oauth2_grant_type="jwt",
+        pool_size=10,
+        pool_idle=30.0,
+        task_wait=0,
     ):
         BeehiveApiClient.__init__(
             self,
@@ -4648,6 +5220,9 @@ class ApiClient(BeehiveApiClient):
             proxy,
             prefixuri,
             oauth2_grant_type,
+            pool_size,
+            pool_idle,
+            task_wait,
         )
 
     def admin_request(
@@ -4764,7 +5339,7 @@ class ApiClient(BeehiveApiClient):
 
         return res
 
-    def admin_wait_task(self, subsystem, prefix, taskid, timeout=60, delta=3, maxtime=600, trace=None):
+    def admin_wait_task(self, subsystem, prefix, taskid, timeout=60, delta=3, maxtime=600, trace=None, wait=None):
         """Wait for running task
 
         :param subsystem: subsystem
@@ -4774,6 +5349,7 @@ class ApiClient(BeehiveApiClient):
         :param delta: loop delta time [default=3]
         :param maxtime: loop max time [default=600]
         :param trace: trace function [optional]
+        :param wait: max seconds a status request waits for task end. If None use api_client_task_wait [optional]
         :return: None
         """
         # propagate opernation.id to internal api call
@@ -4797,6 +5373,7 @@ class ApiClient(BeehiveApiClient):
                 maxtime=maxtime,
                 trace=trace,
                 other_headers=other_headers,
+                wait=wait,
             )
         except BeehiveApiClientError as ex:
             raise ApiManagerError(ex.value, code=ex.code)
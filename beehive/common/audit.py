@@ -3,9 +3,13 @@
 # (C) Copyright 2018-2024 CSI-Piemonte
 
 import logging
+from time import time
+from typing import Union
 from beecell.logger.helper import ExtendedLogger
 from elasticsearch import Elasticsearch
 from datetime import datetime
+from gevent import spawn
+from gevent.queue import Queue, Full, Empty
 from .data import operation
 
 # from typing import TYPE_CHECKING, Tuple
@@ -97,7 +101,43 @@ class Audit(CurrentLocal):
             self.user = user
         return self
 
-    def send_audit(self, elastic: Elasticsearch, **kwargs):
+    def get_audit_item(self, **kwargs) -> tuple:
+        """Get audit document and the daily index where it must be stored
+
+        :param kwargs: audit data
+        :return: (index, item)
+        """
+        if self.user == "":
+            if hasattr(operation, "user"):
+                u = getattr(operation, "user")
+                if hasattr(u, "__iter__") and len(u) >= 3:
+                    self.user = u[0]
+
+        now = datetime.now()
+        item = {
+            "http.request.id": self.request_id,
+            "url.path": self.api_method,
+            "http.request.method": self.req_method,
+            "input.type": self.subsystem,
+            "user.name": self.user,
+            "http.response.status_code": self.state,
+            "service.target.id": self.objid,
+            "service.target.type": self.objdef,
+            "event.original": str(kwargs),
+            "@timestamp": now,
+        }
+
+        prefix = "cmp-audit-log"
+        index = "%s-%s" % (prefix, now.date().strftime("%Y.%m.%d"))
+        return index, item
+
+    def send_audit(self, elastic: Union[Elasticsearch, "AuditShipper"], **kwargs):
+        """Send audit. When elastic is an AuditShipper the audit is queued and sent in background with the bulk api,
+        otherwise it is indexed synchronously.
+
+        :param elastic: elasticsearch client or AuditShipper instance
+        :param kwargs: audit data
+        """
         import os
 
         api_env = os.getenv("API_ENV", "<superunknown>")
@@ -110,30 +150,13 @@ class Audit(CurrentLocal):
             return
 
         try:
-            if self.user == "":
-                if hasattr(operation, "user"):
-                    u = getattr(operation, "user")
-                    if hasattr(u, "__iter__") and len(u) >= 3:
-                        self.user = u[0]
-
-            now = datetime.now()
-            item = {
-                "http.request.id": self.request_id,
-                "url.path": self.api_method,
-                "http.request.method": self.req_method,
-                "input.type": self.subsystem,
-                "user.name": self.user,
-                "http.response.status_code": self.state,
-                "service.target.id": self.objid,
-                "service.target.type": self.objdef,
-                "event.original": str(kwargs),
-                "@timestamp": now,
-            }
-
-            prefix = "cmp-audit-log"
-            index = "%s-%s" % (prefix, now.date().strftime("%Y.%m.%d"))
-            elastic.index(index=index, document=item)
-            logger.info("////////////////////send_audit////////////////////\n sent %s" % self)
+            index, item = self.get_audit_item(**kwargs)
+            if isinstance(elastic, AuditShipper):
+                elastic.put(index, item)
+                logger.debug("send_audit - queued %s" % self)
+            else:
+                elastic.index(index=index, document=item)
+                logger.info("////////////////////send_audit////////////////////\n sent %s" % self)
         except Exception as ex:
             logger.error(ex)
 
@@ -154,6 +177,188 @@ class Audit(CurrentLocal):
         )
 
 
+class AuditShipper(object):
+    """Background audit shipper. Audit documents are put in a bounded in memory queue drained by a greenlet that
+    send them to elasticsearch with the bulk api. A batch is sent when it reaches batch_size items or when its oldest
+    item is waiting from more than flush_interval seconds.
+
+    When the queue is full the drop policy is applied:
+
+    - drop_new: new audit is discarded
+    - drop_oldest: oldest queued audit is discarded to make room for the new one
+    - block: caller waits up to block_timeout seconds for a free slot, then the new audit is discarded
+
+    :param elastic: elasticsearch client
+    :param queue_size: max number of queued audit [default=10000]
+    :param batch_size: max number of audit sent with a single bulk request [default=500]
+    :param flush_interval: max seconds an audit waits in queue before it is sent [default=1.0]
+    :param drop_policy: queue full policy. Can be drop_new, drop_oldest, block [default=drop_new]
+    :param block_timeout: max seconds a caller waits when drop_policy is block [default=0.1]
+    """
+
+    DROP_POLICIES = ["drop_new", "drop_oldest", "block"]
+
+    def __init__(
+        self,
+        elastic: Elasticsearch,
+        queue_size: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        drop_policy: str = "drop_new",
+        block_timeout: float = 0.1,
+    ):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError("Audit drop policy %s is not supported" % drop_policy)
+
+        self.elastic = elastic
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+
+        self.__queue = Queue(maxsize=queue_size)
+        self.__worker = None
+        self.__running = False
+
+        # counters
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def __repr__(self):
+        return "<AuditShipper id=%s queue_size=%s batch_size=%s>" % (id(self), self.queue_size, self.batch_size)
+
+    def start(self):
+        """Start background worker"""
+        if self.__running is True:
+            return
+        self.__running = True
+        self.__worker = spawn(self.__run)
+        logger.info("Start audit shipper %s" % self)
+
+    def stop(self, timeout: float = 10.0):
+        """Stop background worker and flush queued audit
+
+        :param timeout: max seconds to wait for queue flush [default=10.0]
+        """
+        if self.__running is False:
+            return
+        self.__running = False
+        if self.__worker is not None:
+            # wake up worker waiting for new items
+            try:
+                self.__queue.put_nowait(None)
+            except Full:
+                pass
+            self.__worker.join(timeout=timeout)
+            self.__worker = None
+        logger.info("Stop audit shipper %s - %s" % (self, self.info()))
+
+    def put(self, index: str, item: dict):
+        """Queue audit document. Worker is started on the first call so it runs in the process that uses the shipper.
+
+        :param index: elasticsearch index
+        :param item: audit document
+        """
+        if self.__running is False:
+            self.start()
+
+        try:
+            if self.drop_policy == "block":
+                self.__queue.put((index, item), timeout=self.block_timeout)
+            else:
+                self.__queue.put_nowait((index, item))
+        except Full:
+            if self.drop_policy == "drop_oldest":
+                try:
+                    self.__queue.get_nowait()
+                    self.dropped += 1
+                    self.__queue.put_nowait((index, item))
+                except (Empty, Full):
+                    self.dropped += 1
+                    return
+            else:
+                self.dropped += 1
+                logger.warning("Audit queue is full. Audit for index %s was dropped" % index)
+                return
+        self.queued += 1
+
+    def __run(self):
+        batch = []
+        deadline = None
+        while self.__running is True or self.__queue.qsize() > 0:
+            if len(batch) == 0:
+                timeout = self.flush_interval
+            else:
+                timeout = max(deadline - time(), 0)
+            try:
+                if self.__running is False:
+                    item = self.__queue.get_nowait()
+                else:
+                    item = self.__queue.get(timeout=timeout)
+                if item is None:
+                    continue
+                if len(batch) == 0:
+                    deadline = time() + self.flush_interval
+                batch.append(item)
+            except Empty:
+                pass
+
+            if len(batch) >= self.batch_size or (len(batch) > 0 and time() >= deadline):
+                self.flush(batch)
+                batch = []
+
+        if len(batch) > 0:
+            self.flush(batch)
+
+    def flush(self, batch: list):
+        """Send audit documents with the elasticsearch bulk api
+
+        :param batch: list of (index, item)
+        """
+        operations = []
+        for index, item in batch:
+            operations.append({"index": {"_index": index}})
+            operations.append(item)
+
+        try:
+            res = self.elastic.bulk(operations=operations)
+            errors = 0
+            if res.get("errors", False) is True:
+                for item in res.get("items", []):
+                    if item.get("index", {}).get("error", None) is not None:
+                        errors += 1
+            self.sent += len(batch) - errors
+            self.failed += errors
+            self.batches += 1
+            logger.debug("Send audit batch - items: %s, errors: %s" % (len(batch), errors))
+        except Exception as ex:
+            self.failed += len(batch)
+            logger.error("Audit batch of %s items can not be sent: %s" % (len(batch), ex))
+
+    def info(self) -> dict:
+        """Get shipper statistics
+
+        :return: dict with queue_size, batch_size, flush_interval, drop_policy, pending, queued, sent, failed, dropped,
+            batches
+        """
+        return {
+            "queue_size": self.queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "drop_policy": self.drop_policy,
+            "pending": self.__queue.qsize(),
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
+
 _localaudit: Audit = None
 
 
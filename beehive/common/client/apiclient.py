@@ -11,6 +11,9 @@ from copy import deepcopy
 from time import time, sleep
 from logging import getLogger
 import binascii
+import select
+import socket
+from threading import Lock
 from beecell.remote import NotFoundException
 from beecell.types.type_string import truncate
 from beecell.crypto import check_vault, sign_data
@@ -38,6 +41,121 @@ class BeehiveApiClientError(Exception):
         return "%s, %s" % (self.value, self.code)
 
 
+class HttpConnectionPool(object):
+    """Pool of persistent http connections. Idle connections are kept by (proto, host, port) and reused by the next
+    requests to the same endpoint. A connection is used by a single request at a time, so the pool can be shared by
+    threads and gevent greenlets. When the process is forked the pool of the parent process is discarded.
+
+    An idle connection is discarded when it is idle from more than idle seconds or when its socket is readable, that
+    means the server closed it or sent unexpected data.
+
+    :param size: max number of idle connections kept for every endpoint [default=10]
+    :param idle: max seconds a connection can be idle [default=30.0]
+    """
+
+    def __init__(self, size=10, idle=30.0):
+        self.size = size
+        self.idle = idle
+
+        self.__pool: Dict[tuple, list] = {}
+        self.__lock = Lock()
+        self.__pid = current_process().ident
+
+        # counters
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.discarded = 0
+
+    def __repr__(self):
+        return "<HttpConnectionPool id=%s size=%s idle=%s>" % (id(self), self.size, self.idle)
+
+    def __check_pid(self):
+        if self.__pid != current_process().ident:
+            self.__pool = {}
+            self.__pid = current_process().ident
+
+    @staticmethod
+    def is_alive(conn) -> bool:
+        """Check idle connection can be reused
+
+        :param conn: http connection
+        :return: True if connection is open and the server did not close it
+        """
+        sock = getattr(conn, "sock", None)
+        if sock is None:
+            return False
+        try:
+            readable, writable, errors = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return len(readable) == 0
+
+    def get(self, key: tuple, timeout: float):
+        """Get an idle connection
+
+        :param key: (proto, host, port)
+        :param timeout: socket timeout to set on the connection
+        :return: http connection or None if there is no reusable idle connection
+        """
+        while True:
+            with self.__lock:
+                self.__check_pid()
+                conns = self.__pool.get(key, [])
+                if len(conns) == 0:
+                    return None
+                conn, last_used = conns.pop()
+
+            if time() - last_used > self.idle:
+                self.evicted += 1
+                conn.close()
+            elif self.is_alive(conn) is False:
+                self.discarded += 1
+                conn.close()
+            else:
+                self.reused += 1
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return conn
+
+    def put(self, key: tuple, conn):
+        """Put back a connection after its response was read
+
+        :param key: (proto, host, port)
+        :param conn: http connection
+        """
+        with self.__lock:
+            self.__check_pid()
+            conns = self.__pool.setdefault(key, [])
+            if conn.sock is not None and len(conns) < self.size:
+                conns.append((conn, time()))
+                return
+        conn.close()
+
+    def clear(self):
+        """Close all the idle connections"""
+        with self.__lock:
+            pool, self.__pool = self.__pool, {}
+        for conns in pool.values():
+            for conn, last_used in conns:
+                conn.close()
+
+    def info(self) -> dict:
+        """Get pool statistics
+
+        :return: dict with size, idle, connections, created, reused, evicted, discarded
+        """
+        return {
+            "size": self.size,
+            "idle": self.idle,
+            "connections": {"%s://%s:%s" % k: len(v) for k, v in self.__pool.items()},
+            "created": self.created,
+            "reused": self.reused,
+            "evicted": self.evicted,
+            "discarded": self.discarded,
+        }
+
+
 class BeehiveApiClient(object):
     """Beehive api client.
 
@@ -50,8 +168,16 @@ class BeehiveApiClient(object):
     :param proxy: http proxy server {'host': .., 'port': ..} [optional]
     :param prefixuri: custom prefix path to use in uri [default='']
     :param oauth2_grant_type: oauth2 grant type. Can be jwt or client [default=jwt]
+    :param pool_size: max number of idle keep-alive connections kept for every endpoint. Set 0 to open a new
+        connection for every request [default=10]
+    :param pool_idle: max seconds a keep-alive connection can be idle [default=30.0]
+    :param task_wait: max seconds a task status request made by wait_task waits for task end on the server. Set 0
+        to poll task status [default=0]
     """
 
+    # methods that can be sent again when a reused connection fails before the response is read
+    IDEMPOTENT_METHODS = ["GET", "HEAD", "DELETE"]
+
     def __init__(
         self,
         auth_endpoints,
@@ -65,6 +191,9 @@ class BeehiveApiClient(object):
         proxy=None,
         prefixuri="",
         oauth2_grant_type="jwt",
+        pool_size=10,
+        pool_idle=30.0,
+        task_wait=0,
     ):
         self.logger = getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
 
@@ -111,6 +240,14 @@ class BeehiveApiClient(object):
 
         self.prefixuri = prefixuri
 
+        # keep-alive connection pool
+        self.pool = None
+        if pool_size > 0:
+            self.pool = HttpConnectionPool(size=pool_size, idle=pool_idle)
+
+        # task status long poll
+        self.task_wait = task_wait
+
         # auth reference - http://10.102.160.240:6060
         for endpoint in auth_endpoints:
             self.endpoints["auth"].append([self.__parse_endpoint(endpoint), 0])
@@ -207,6 +344,52 @@ class BeehiveApiClient(object):
             self.logger.error(ex, exc_info=True)
             raise BeehiveApiClientError("Error signing data: %s" % data, code=401)
 
+    def __get_connection(self, proto, host, port, timeout):
+        """Open a new http connection
+
+        :param proto: Request proto. Ex. http, https
+        :param host: Request host. Ex. 10.102.90.30
+        :param port: Request port
+        :param timeout: Request timeout
+        :return: http connection
+        """
+        if proto == "http":
+            conn = http_client.HTTPConnection(host, port, timeout=timeout)
+            if self.proxy is not None and self.proxy.get("host") is not None:
+                conn.set_tunnel(self.proxy.get("host"), port=self.proxy.get("port"))
+        else:
+            try:
+                ssl._create_default_https_context = ssl._create_unverified_context
+            except Exception:
+                pass
+            if self.proxy is not None and self.proxy.get("host") is not None:
+                conn = http_client.HTTPSConnection(
+                    self.proxy.get("host"),
+                    port=self.proxy.get("port"),
+                    timeout=timeout,
+                )
+                conn.set_tunnel(host, port=port)
+            else:
+                conn = http_client.HTTPSConnection(host, port, timeout=timeout)
+        if self.pool is not None:
+            self.pool.created += 1
+        return conn
+
+    def __release_connection(self, key, conn, response):
+        """Put back connection in the pool or close it
+
+        :param key: (proto, host, port)
+        :param conn: http connection
+        :param response: http response
+        """
+        if self.pool is None or response.will_close is True:
+            conn.close()
+            return
+        # read unread body so the connection can be reused
+        if response.isclosed() is False:
+            response.read()
+        self.pool.put(key, conn)
+
     def http_client(
         self,
         proto,
@@ -222,6 +405,9 @@ class BeehiveApiClient(object):
     ):
         """Http client. Usage: res = http_client2('https', 'host1', '/api', 'POST', port=443, data='', headers={})
 
+        Keep-alive connections are reused from the connection pool. A request sent on a reused connection closed by
+        the server is sent again once on a new connection.
+
         :param proto: Request proto. Ex. http, https
         :param host: Request host. Ex. 10.102.90.30
         :param port: Request port. [default=80]
@@ -235,6 +421,7 @@ class BeehiveApiClient(object):
         :param silent: if True print curl request call
         :raise BeehiveApiClientError:
         """
+        conn = None
         try:
             # start time
             start = time()
@@ -281,28 +468,28 @@ class BeehiveApiClient(object):
                 curl_url.append("%s://%s:%s%s" % (proto, host, port, path))
                 self.logger.debug(" ".join(curl_url))
 
-            if proto == "http":
-                conn = http_client.HTTPConnection(host, port, timeout=timeout)
-                if self.proxy is not None and self.proxy.get("host") is not None:
-                    conn.set_tunnel(self.proxy.get("host"), port=self.proxy.get("port"))
-            else:
-                try:
-                    ssl._create_default_https_context = ssl._create_unverified_context
-                except Exception:
-                    pass
-                if self.proxy is not None and self.proxy.get("host") is not None:
-                    conn = http_client.HTTPSConnection(
-                        self.proxy.get("host"),
-                        port=self.proxy.get("port"),
-                        timeout=timeout,
-                    )
-                    conn.set_tunnel(host, port=port)
-                else:
-                    conn = http_client.HTTPSConnection(host, port, timeout=timeout)
+            # get a keep-alive connection from pool or open a new one
+            key = (proto, host, port)
+            if self.pool is not None:
+                conn = self.pool.get(key, timeout)
+            reused = conn is not None
+            if conn is None:
+                conn = self.__get_connection(proto, host, port, timeout)
 
             # get response
-            conn.request(method, path, data, headers)
+            try:
+                conn.request(method, path, data, headers)
+            except (ConnectionError, http_client.HTTPException):
+                # keep-alive connection was closed by server. Retry with a new connection
+                conn.close()
+                if reused is False:
+                    raise
+                conn = self.__get_connection(proto, host, port, timeout)
+                reused = False
+                conn.request(method, path, data, headers)
         except Exception as ex:
+            if conn is not None:
+                conn.close()
             self.logger.error(ex, exc_info=True)
             raise BeehiveApiClientError("Service Unavailable", code=503)
 
@@ -311,7 +498,17 @@ class BeehiveApiClient(object):
         content_type = ""
 
         try:
-            response = conn.getresponse()
+            try:
+                response = conn.getresponse()
+            except (ConnectionError, http_client.RemoteDisconnected):
+                # keep-alive connection was closed by server before request was read. Retry with a new connection
+                # only idempotent requests because server could have already executed the request
+                conn.close()
+                if reused is False or method not in self.IDEMPOTENT_METHODS:
+                    raise
+                conn = self.__get_connection(proto, host, port, timeout)
+                conn.request(method, path, data, headers)
+                response = conn.getresponse()
             content_type = response.getheader("content-type")
 
             if response.status in [
@@ -366,8 +563,9 @@ class BeehiveApiClient(object):
                 }
             else:
                 res = {"code": response.status, "message": res, "description": res}
-            conn.close()
+            self.__release_connection(key, conn, response)
         except Exception as ex:
+            conn.close()
             elapsed = time() - start
             self.logger.error(ex, exc_info=False)
             if silent is False:
@@ -390,7 +588,10 @@ class BeehiveApiClient(object):
                         "ELAPSED=%s" % (reqid, None, "Timeout", content_type, truncate(res), elapsed)
                     )
 
-            raise BeehiveApiClientError(str(ex), code=400)
+            code = 400
+            if isinstance(ex, socket.timeout):
+                code = 408
+            raise BeehiveApiClientError(str(ex), code=code)
 
         if response.status in [200, 201, 202]:
             elapsed = time() - start
@@ -603,6 +804,7 @@ class BeehiveApiClient(object):
         seckey=None,
         timeout=60,
         other_headers=None,
+        wait=0,
     ):
         """get task status
 
@@ -613,19 +815,28 @@ class BeehiveApiClient(object):
         :param seckey:
         :param timeout:
         :param other_headers: other headers
-        :return:
+        :param wait: max seconds the server waits for task end before returning the status [default=0]
+        :return: task status. UNKNOWN when the status request times out
         """
         if uid is None and self.uid is not None:
             uid = self.uid
             seckey = self.seckey
 
+        data = ""
+        if wait > 0:
+            data = {"wait": wait}
+            timeout = max(timeout, wait + 10)
+            # ask the server an api timeout longer than wait
+            other_headers = dict(other_headers or {})
+            other_headers["CSI-Nvl-Timeout"] = str(wait + 5)
+
         try:
             path = "/v2.0/%s/worker/tasks/%s/status" % (prefix, taskid)
             res = self.send_request(
                 subsystem,
                 path,
                 "get",
-                data="",
+                data=data,
                 uid=uid,
                 seckey=seckey,
                 timeout=timeout,
@@ -635,6 +846,12 @@ class BeehiveApiClient(object):
             task = res.get("task_instance")
             status = task.get("status")
             return status
+        except BeehiveApiClientError as ex:
+            if ex.code == 408:
+                # request timeout does not say anything about the task
+                self.logger.warning("Task %s status request timeout" % taskid)
+                return "UNKNOWN"
+            return "FAILURE"
         except (NotFoundException, Exception):
             return "FAILURE"
 
@@ -694,8 +911,10 @@ class BeehiveApiClient(object):
         maxtime=600,
         trace=None,
         other_headers=None,
+        wait=None,
     ):
-        """Wait for running task
+        """Wait for running task. When wait is greater than 0 every status request is held by the server until the
+        task ends or wait seconds are elapsed, otherwise status is polled every delta seconds.
 
         :param subsystem: subsystem
         :param prefix: api prefix like nws, nas, nrs
@@ -707,9 +926,13 @@ class BeehiveApiClient(object):
         :param maxtime: loop max time [default=600]
         :param trace: trace function [optional]
         :param other_headers: other headers
+        :param wait: max seconds a status request waits for task end. If None use task_wait of the client [optional]
         :return: None
         """
         self.logger.info("wait for task %s" % taskid)
+        if wait is None:
+            wait = self.task_wait
+        start = time()
         status = self.get_task_status(
             subsystem,
             prefix,
@@ -718,10 +941,12 @@ class BeehiveApiClient(object):
             seckey=seckey,
             timeout=timeout,
             other_headers=other_headers,
+            wait=wait,
         )
         elapsed = 0
         while status not in ["SUCCESS", "FAILURE", "TIMEOUT"]:
-            sleep(delta)
+            if wait == 0:
+                sleep(delta)
             status = self.get_task_status(
                 subsystem,
                 prefix,
@@ -730,11 +955,15 @@ class BeehiveApiClient(object):
                 seckey=seckey,
                 timeout=timeout,
                 other_headers=other_headers,
+                wait=wait,
             )
             self.logger.debug("%s task %s status: %s" % (subsystem, taskid, status))
             if trace is not None:
                 trace("%s task %s status: %s" % (subsystem, taskid, status))
-            elapsed += delta
+            if wait == 0:
+                elapsed += delta
+            else:
+                elapsed = time() - start
             if elapsed > maxtime:
                 status = "TIMEOUT"
 
@@ -1201,6 +1430,33 @@ class BeehiveApiClient(object):
             else:
                 raise
 
+    def add_objects(self, objects, chunk=500):
+        """Add authorization objects with all related permissions in bulk. Objects that already exist are skipped.
+        When auth server does not support bulk insert, objects are added one by one with add_object.
+
+        :param objects: list of dict like {'subsystem':.., 'type':.., 'objid':.., 'desc':..}
+        :param chunk: max number of objects sent with one request [default=500]
+        :return: list of new object ids
+        :raises BeehiveApiClientError: raise :class:`BeehiveApiClientError`
+        """
+        res = []
+        for i in range(0, len(objects), chunk):
+            items = objects[i : i + chunk]
+            data = {"objects": items, "skip_existing": True}
+            try:
+                obj = self.invoke("auth", "/v1.0/nas/objects", "POST", data, parse=True, silent=True)
+                res.extend(obj.get("ids", []))
+            except BeehiveApiClientError as ex:
+                if ex.code not in [400, 409]:
+                    raise
+                self.logger.warning("Bulk add objects is not supported: %s. Add objects one by one" % ex)
+                for item in items:
+                    obj = self.add_object(item["subsystem"], item["type"], item["objid"], item["desc"])
+                    if obj is not None:
+                        res.extend(obj.get("ids", []))
+        self.logger.debug("Add objects: %s" % len(objects))
+        return res
+
     def remove_object(self, objtype, objdef, objid, **kvargs):
         """Remove authorization object with all related permissions
 
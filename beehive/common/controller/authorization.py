@@ -240,6 +240,9 @@ class BaseAuthController(ApiController):
             # delete identity from identity user index
             self.module.redis_identity_manager.conn.lrem(self.prefix_index + user, 1, uid)
 
+            # delete identity permissions from local cache
+            self.api_manager.perms_cache.remove(uid)
+
             self.logger.debug("Remove identity %s from redis" % uid)
             return None
         except Exception as ex:
@@ -563,7 +566,14 @@ class BaseAuthController(ApiController):
         """
         authDbManager: AuthDbManager = self.auth_manager
         perms = authDbManager.get_login_permissions(dbuser)
-        compress_perms = binascii.b2a_base64(compress(json.dumps(perms).encode("utf-8")))
+        compress_perms = None
+        if self.api_manager.perms_snapshot is True:
+            try:
+                compress_perms = self.api_manager.set_perms_snapshot(perms)
+            except Exception as ex:
+                self.logger.warning("Permissions snapshot can not be stored. Store permissions in identity: %s" % ex)
+        if compress_perms is None:
+            compress_perms = binascii.b2a_base64(compress(json.dumps(perms).encode("utf-8")))
         user.set_perms(compress_perms)
 
     def __set_user_roles(self, dbuser, user):
@@ -15,6 +15,7 @@ from beecell.simple import import_class
 from beecell.simple import encrypt_data as simple_encrypt_data
 from beecell.simple import decrypt_data as simple_decrypt_data
 from beecell.db import TransactionError, QueryError, ModelError
+from beehive.common.metrics import metrics
 from typing import TYPE_CHECKING, Tuple
 
 if TYPE_CHECKING:
@@ -51,10 +52,12 @@ operation.id = None  #: operation id in uuid4
 operation.session: Session = None  #: current database session
 operation.user: Tuple[str] = None  #: logged user (username, userip, uid)
 operation.perms = None  #: logged user permission
+operation.perms_index = None  #: logged user compiled permission index
 operation.token_type = None  #: token type released
 operation.transaction = None  #: transaction id
 operation.encryption_key = None  #: _encryption_key used to encrypt and decrypt data
 operation.authorize: bool = True  #: enable or disable authorization check
+operation.timeout: float = None  #: timeout in seconds of the current api request
 operation.cache: bool = (
     True  #: if True check cache. If False execute function decorated by @cache() also if cache exists
 )
@@ -68,6 +71,29 @@ OK_Q_MSG = "%s.%s - %s - query - %s - %s - OK - %s"
 KO_Q_MSG = "%s.%s - %s - query - %s - %s - KO - %s"
 
 
+class LazyParams(object):
+    """Function params used in transaction and query log messages. Params are converted to string only when the log
+    message is really formatted, so nothing is rendered when the log level is disabled.
+
+    :param args: function positional arguments
+    :param kwargs: function keyword arguments
+    """
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        params = []
+        for item in self.args:
+            params.append(str(item))
+        for k, v in self.kwargs.items():
+            params.append("'%s':'%s'" % (k, v))
+        return truncate(params)
+
+
 #
 # encryption method
 #
@@ -99,6 +125,7 @@ def get_operation_params():
     return {
         "user": operation.user,
         "perms": operation.perms,
+        "perms_index": getattr(operation, "perms_index", None),
         "opid": operation.id,
         "transaction": operation.transaction,
         "encryption_key": operation.encryption_key,
@@ -116,6 +143,10 @@ def set_operation_params(param):
     if val != "--":
         operation.perms = val
 
+    val = param.get("perms_index", "--")
+    if val != "--":
+        operation.perms_index = val
+
     val = param.get("opid", "--")
     if val != "--":
         operation.opid = val
@@ -149,9 +180,9 @@ def core_transaction(fn, rollback_throwable, *args, **kwargs):
     if operation.transaction is None:
         operation.transaction = id_gen()
         commit = True
-        logger.debug2("Create transaction %s" % operation.transaction)
+        logger.debug2("Create transaction %s", operation.transaction)
     else:
-        logger.debug2("Use transaction %s" % operation.transaction)
+        logger.debug2("Use transaction %s", operation.transaction)
 
     # set distributed transaction id to 0 for single transaction
     try:
@@ -159,14 +190,10 @@ def core_transaction(fn, rollback_throwable, *args, **kwargs):
     except Exception:
         operation.id = str(uuid4())
 
-    try:
-        # format request params
-        params = []
-        for item in args:
-            params.append(str(item))
-        for k, v in kwargs.items():
-            params.append("'%s':'%s'" % (k, v))
+    # request params formatted only when logged
+    params = LazyParams(args, kwargs)
 
+    try:
         # call internal function
         res = fn(*args, **kwargs)
 
@@ -176,11 +203,11 @@ def core_transaction(fn, rollback_throwable, *args, **kwargs):
             operation.transaction = None
 
         elapsed = round(time() - start, 4)
-        logger.debug2(OK_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.debug2(OK_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         return res
     except ModelError as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         err = str(ex)
         if ex.code not in [409]:
             logger.error(err)
@@ -188,30 +215,31 @@ def core_transaction(fn, rollback_throwable, *args, **kwargs):
         raise TransactionError(err, code=ex.code)
     except ArgumentError as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         rollback_if_throwable(session, commit, rollback_throwable)
         raise TransactionError(ex, code=400)
     except IntegrityError as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         rollback_if_throwable(session, commit, rollback_throwable)
         raise TransactionError(ex, code=409)
     except DBAPIError as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         rollback_if_throwable(session, commit, rollback_throwable)
         raise TransactionError(ex, code=400)
     except TransactionError as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         rollback_if_throwable(session, commit, rollback_throwable)
         raise
     except Exception as ex:
         elapsed = round(time() - start, 4)
-        logger.error(KO_MSG % (operation.id, stmp_id, sessionid, fn.__name__, truncate(params), elapsed))
+        logger.error(KO_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
         rollback_if_throwable(session, commit, rollback_throwable)
         raise TransactionError(ex, code=400)
     finally:
+        metrics.observe("transaction.%s.%s" % (fn.__module__, fn.__qualname__), time() - start)
         if not rollback_throwable:
             if commit is True and operation.transaction is not None:
                 session.commit()
@@ -292,104 +320,42 @@ def query(fn):
         except Exception:
             operation.id = str(uuid4())
 
-        try:
-            # format request params
-            params = []
-            for item in args:
-                params.append(str(item))
-            for k, v in kwargs.items():
-                params.append("'%s':'%s'" % (k, v))
+        # request params formatted only when logged
+        params = LazyParams(args, kwargs)
 
+        try:
             # call internal function
             res = fn(*args, **kwargs)
             elapsed = round(time() - start, 4)
-            logger.debug2(
-                OK_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.debug2(OK_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             return res
         except ModelError as ex:
             elapsed = round(time() - start, 4)
-            logger.error(
-                KO_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.error(KO_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             logger.error(str(ex))
             raise QueryError(str(ex), code=ex.code)
         except ArgumentError as ex:
             elapsed = round(time() - start, 4)
-            logger.error(
-                KO_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.error(KO_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             logger.error(str(ex))
             raise QueryError(str(ex), code=400)
         except DBAPIError as ex:
             elapsed = round(time() - start, 4)
-            logger.error(
-                KO_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.error(KO_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             logger.error(str(ex))
             raise QueryError(str(ex), code=400)
         except TypeError as ex:
             elapsed = round(time() - start, 4)
-            logger.error(
-                KO_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.error(KO_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             logger.error(str(ex))
             raise QueryError(str(ex), code=400)
         except Exception as ex:
             elapsed = round(time() - start, 4)
-            logger.error(
-                KO_Q_MSG
-                % (
-                    operation.id,
-                    stmp_id,
-                    sessionid,
-                    fn.__name__,
-                    truncate(params),
-                    elapsed,
-                )
-            )
+            logger.error(KO_Q_MSG, operation.id, stmp_id, sessionid, fn.__name__, params, elapsed)
             logger.error(str(ex))
             raise QueryError(str(ex), code=400)
+        finally:
+            metrics.observe("query.%s.%s" % (fn.__module__, fn.__qualname__), time() - start)
 
     return query_wrap
 
@@ -6,6 +6,8 @@ import json
 import time
 import logging
 from datetime import datetime
+from queue import Queue as LocalQueue, Full, Empty
+from threading import Thread
 import redis
 import gevent
 from six import ensure_text
@@ -19,7 +21,7 @@ from kombu import Connection, exceptions
 from signal import *
 import pprint
 from beecell.db.manager import RedisManager
-from beecell.simple import jsonDumps
+from beehive.common.serializer import dumps as serializer_dumps
 
 
 class ComplexEncoder(json.JSONEncoder):
@@ -34,7 +36,7 @@ class ComplexEncoder(json.JSONEncoder):
 
 
 def _dumps(s):
-    return json.dumps(s, cls=ComplexEncoder)
+    return serializer_dumps(s)
 
 
 """Register a custom encoder/decoder for JSON serialization."""
@@ -137,7 +139,7 @@ class Event(object):
         :return: json string
         """
         msg = self.dict()
-        return jsonDumps(msg)
+        return serializer_dumps(msg)
 
     @staticmethod
     def get_from_elastic(env, elasticsearch, *args, **kvargs):
@@ -243,21 +245,66 @@ class EventHandler(object):
 
 class EventProducer(object):
     def __init__(self):
-        """Abstract event producer."""
+        """Abstract event producer.
+
+        By default events are published synchronously by send. When buffered mode is enabled with set_buffered, send
+        put events in a bounded local queue and a dedicated worker publishes them in batches.
+        """
         self.logger = logging.getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
 
+        # buffered mode
+        self.buffered = False
+        self.queue_size = None
+        self.batch_size = None
+        self.max_latency = None
+        self.__queue = None
+        self.__worker = None
+        self.__running = False
+
+        # buffered mode counters
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def set_buffered(self, queue_size=10000, batch_size=100, max_latency=0.5):
+        """Enable buffered mode. Worker is started when the first event is sent so it runs in the process that use
+        the producer.
+
+        :param queue_size: max number of queued events [default=10000]
+        :param batch_size: max number of events published in a batch [default=100]
+        :param max_latency: max seconds an event waits in queue before it is published [default=0.5]
+        """
+        self.buffered = True
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.__queue = LocalQueue(maxsize=queue_size)
+
     def _send(self, event_type, data, source, dest):
         raise NotImplementedError()
 
+    def _send_events(self, events):
+        """Publish a batch of events. Subclasses can override it to publish all the events over a single connection.
+
+        :param events: list of Event
+        """
+        for event in events:
+            self._send(event.type, event.data, event.source, event.dest)
+
     def send(self, event_type, data, source, dest):
-        """Send new event.
+        """Send new event. In buffered mode event is queued and published in background.
 
         :param event_type: type of event to send
         :param str data: data to send
         :param source: event source
         :param dest: event destination
         """
-        self._send(event_type, data, source, dest)
+        if self.buffered is True:
+            self.__put(Event(event_type, data, source, dest))
+        else:
+            self._send(event_type, data, source, dest)
         # gevent.spawn(self._send, event_type, data, source, dest)
 
     def send_sync(self, event_type, data, source, dest):
@@ -270,6 +317,105 @@ class EventProducer(object):
         """
         self._send(event_type, data, source, dest)
 
+    def __put(self, event):
+        if self.__running is False:
+            self.start()
+        try:
+            self.__queue.put_nowait(event)
+            self.queued += 1
+        except Full:
+            self.dropped += 1
+            self.logger.warning("Event queue is full. Event %s was dropped" % event.id)
+
+    def start(self):
+        """Start buffered mode worker"""
+        if self.buffered is False or self.__running is True:
+            return
+        self.__running = True
+        self.__worker = Thread(target=self.__run, name="event-producer")
+        self.__worker.daemon = True
+        self.__worker.start()
+        self.logger.info("Start buffered event producer %s" % self)
+
+    def stop(self, timeout=10.0):
+        """Stop buffered mode worker and publish queued events
+
+        :param timeout: max seconds to wait for queue flush [default=10.0]
+        """
+        if self.__running is False:
+            return
+        self.__running = False
+        if self.__worker is not None:
+            # wake up worker waiting for new events
+            try:
+                self.__queue.put_nowait(None)
+            except Full:
+                pass
+            self.__worker.join(timeout=timeout)
+            self.__worker = None
+        self.logger.info("Stop buffered event producer %s - %s" % (self, self.info()))
+
+    def __run(self):
+        batch = []
+        deadline = None
+        while self.__running is True or self.__queue.qsize() > 0:
+            if len(batch) == 0:
+                timeout = self.max_latency
+            else:
+                timeout = max(deadline - time.time(), 0)
+            try:
+                if self.__running is False:
+                    event = self.__queue.get_nowait()
+                else:
+                    event = self.__queue.get(timeout=timeout)
+                if event is None:
+                    continue
+                if len(batch) == 0:
+                    deadline = time.time() + self.max_latency
+                batch.append(event)
+            except Empty:
+                pass
+
+            if len(batch) >= self.batch_size or (len(batch) > 0 and time.time() >= deadline):
+                self.flush(batch)
+                batch = []
+
+        if len(batch) > 0:
+            self.flush(batch)
+
+    def flush(self, events):
+        """Publish a batch of events
+
+        :param events: list of Event
+        """
+        try:
+            self._send_events(events)
+            self.sent += len(events)
+            self.batches += 1
+            self.logger.debug2("Send batch of %s events" % len(events))
+        except Exception as ex:
+            self.failed += len(events)
+            self.logger.error("Batch of %s events can not be send: %s" % (len(events), ex))
+
+    def info(self):
+        """Get buffered mode statistics
+
+        :return: dict with buffered, queue_size, batch_size, max_latency, pending, queued, sent, failed, dropped,
+            batches
+        """
+        return {
+            "buffered": self.buffered,
+            "queue_size": self.queue_size,
+            "batch_size": self.batch_size,
+            "max_latency": self.max_latency,
+            "pending": self.__queue.qsize() if self.__queue is not None else 0,
+            "queued": self.queued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
+
 
 class EventProducerRedis(EventProducer):
     def __init__(self, broker_uri, broker_exchange, framework="komb"):
@@ -312,21 +458,34 @@ class EventProducerRedis(EventProducer):
         elif self.framework == "simple":
             return self._send_simple(event_type, data, source, dest)
 
+    def _send_events(self, events):
+        if self.framework == "komb":
+            with producers[self.conn].acquire(block=True) as producer:
+                for event in events:
+                    self.__publish_kombu(producer, event)
+        elif self.framework == "simple":
+            pipe = self.redis_manager.pipeline()
+            for event in events:
+                pipe.publish(self.broker_exchange, event.json())
+            pipe.execute()
+
+    def __publish_kombu(self, producer, event):
+        producer.publish(
+            event.dict(),
+            serializer="json",
+            compression="bzip2",
+            exchange=self.exchange,
+            declare=[self.exchange],
+            routing_key=self.routing_key,
+            expiration=60,
+            delivery_mode=1,
+        )
+
     def _send_kombu(self, event_type, data, source, dest):
         try:
             event = Event(event_type, data, source, dest)
             with producers[self.conn].acquire() as producer:
-                msg = event.dict()
-                producer.publish(
-                    msg,
-                    serializer="json",
-                    compression="bzip2",
-                    exchange=self.exchange,
-                    declare=[self.exchange],
-                    routing_key=self.routing_key,
-                    expiration=60,
-                    delivery_mode=1,
-                )
+                self.__publish_kombu(producer, event)
                 # self.logger.debug('Send event : %s' % msg['id'])
         except exceptions.ConnectionLimitExceeded as ex:
             self.logger.error("Event can not be send: %s" % str(ex))
@@ -375,24 +534,32 @@ class EventProducerKombu(EventProducer):
     def _send(self, event_type, data, source, dest):
         return self._send_kombu(event_type, data, source, dest)
 
+    def _send_events(self, events):
+        with producers[self.conn].acquire(block=True) as producer:
+            for event in events:
+                self.__publish_kombu(producer, event)
+
+    def __publish_kombu(self, producer, event):
+        msg = event.dict()
+        producer.publish(
+            msg,
+            serializer="json",
+            compression="bzip2",
+            exchange=self.exchange,
+            declare=[self.exchange],
+            routing_key=self.routing_key,
+            # expiration=60,
+            # delivery_mode=1
+        )
+        self.logger.debug2(
+            "Send event to exchange %s with routing key %s: %s" % (self.exchange, self.routing_key, msg["id"])
+        )
+
     def _send_kombu(self, event_type, data, source, dest):
         try:
             event = Event(event_type, data, source, dest)
             with producers[self.conn].acquire() as producer:
-                msg = event.dict()
-                producer.publish(
-                    msg,
-                    serializer="json",
-                    compression="bzip2",
-                    exchange=self.exchange,
-                    declare=[self.exchange],
-                    routing_key=self.routing_key,
-                    # expiration=60,
-                    # delivery_mode=1
-                )
-                self.logger.debug2(
-                    "Send event to exchange %s with routing key %s: %s" % (self.exchange, self.routing_key, msg["id"])
-                )
+                self.__publish_kombu(producer, event)
         except exceptions.ConnectionLimitExceeded as ex:
             self.logger.error("Event can not be send: %s" % str(ex))
         except Exception as ex:
@@ -350,6 +350,7 @@ class BeehiveHelper(object):
                     config_db_manager.add(config["api_system"], "api", "catalog", catalog["name"])
 
             # add endpoint
+            new_endpoints = []
             for endpoint in catalog.get("endpoints", []):
                 # check if endpoint already exist
                 try:
@@ -357,19 +358,17 @@ class BeehiveHelper(object):
                     self.logger.warning("Endpoint %s already exist" % (endpoint["name"]))
                     msgs.append("Endpoint %s already exist" % (endpoint["name"]))
                 except Exception:
-                    # create new endpoint
-                    cat = controller.get_catalog(catalog["name"])
-                    res = cat.add_endpoint(
-                        name=endpoint["name"],
-                        desc=endpoint["desc"],
-                        service=endpoint["service"],
-                        uri=endpoint["uri"],
-                        active=True,
-                    )
+                    new_endpoints.append(endpoint)
+
+            # create new endpoints and register them in bulk
+            if len(new_endpoints) > 0:
+                cat = controller.get_catalog(catalog["name"])
+                res = cat.add_endpoints(new_endpoints)
+                for endpoint, uuid in zip(new_endpoints, res):
                     self.logger.info(
-                        "Add endpoint name:%s service:%s : %s" % (endpoint["name"], endpoint["service"], res)
+                        "Add endpoint name:%s service:%s : %s" % (endpoint["name"], endpoint["service"], uuid)
                     )
-                    msgs.append("Add endpoint name:%s service:%s : %s" % (endpoint["name"], endpoint["service"], res))
+                    msgs.append("Add endpoint name:%s service:%s : %s" % (endpoint["name"], endpoint["service"], uuid))
 
         return msgs
 
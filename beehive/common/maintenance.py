@@ -0,0 +1,76 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+from logging import getLogger
+from time import time
+from typing import Union
+
+logger = getLogger(__name__)
+
+
+class MaintenanceCache(object):
+    """In-process cache of the maintenance flags set with the StatusAPI maintenance api. Flags are stored in redis
+    with key cmp.<module>.<http method>. A flag read from redis is reused for ttl seconds, so every process reacts to
+    a change made by another process within ttl seconds, while the process that changes a flag invalidates it at once.
+
+    :param ttl: flag time to live in seconds. Use 0 to read flag from redis on every request [default=1.0]
+    """
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self.__items = {}
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<MaintenanceCache id=%s ttl=%s>" % (id(self), self.ttl)
+
+    @staticmethod
+    def get_key(module_name: str, http_method: str) -> str:
+        """Get maintenance flag key
+
+        :param module_name: module name
+        :param http_method: http method in lower case. Ex. get, post
+        :return: key
+        """
+        return "cmp.%s.%s" % (module_name, http_method)
+
+    def get(self, redis_manager, key: str) -> Union[bytes, None]:
+        """Get maintenance flag
+
+        :param redis_manager: redis manager used to read the flag when it is not cached or expired
+        :param key: flag key
+        :return: flag value as stored in redis or None
+        """
+        now = time()
+        item = self.__items.get(key, None)
+        if item is not None and item[1] > now:
+            self.hits += 1
+            return item[0]
+
+        self.misses += 1
+        value = redis_manager.get(key)
+        if self.ttl > 0:
+            self.__items[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, key: str = None):
+        """Invalidate cached flags
+
+        :param key: flag key. If None invalidate all the flags [optional]
+        """
+        if key is None:
+            self.__items.clear()
+        else:
+            self.__items.pop(key, None)
+        logger.debug("Invalidate maintenance flag %s" % (key or "*"))
+
+    def info(self) -> dict:
+        """Get cache statistics
+
+        :return: dict with ttl, items, hits, misses
+        """
+        return {"ttl": self.ttl, "items": len(self.__items), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,223 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+from bisect import bisect_left
+from threading import RLock
+from time import time
+from typing import Dict, Sequence
+
+#: default histogram buckets upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    """In-process histogram of timings. Values are counted in fixed buckets so memory usage does not depend on the
+    number of observations. Percentiles are estimated using the bucket upper bounds.
+
+    :param name: histogram name
+    :param buckets: sorted list of bucket upper bounds [default=DEFAULT_BUCKETS]
+    """
+
+    def __init__(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(buckets)
+        self.__lock = RLock()
+        self.reset()
+
+    def __repr__(self):
+        return "<Histogram name=%s count=%s>" % (self.name, self.count)
+
+    def reset(self):
+        """Reset histogram"""
+        with self.__lock:
+            # last counter is for values greater than the last bucket
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.min = None
+            self.max = None
+
+    def observe(self, value: float):
+        """Add value to histogram
+
+        :param value: value to add. Ex. elapsed time in seconds
+        """
+        pos = bisect_left(self.buckets, value)
+        with self.__lock:
+            self.counts[pos] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, perc: float) -> float:
+        """Estimate percentile from buckets
+
+        :param perc: percentile between 0 and 100
+        :return: upper bound of the bucket that contains the percentile or max value for the last bucket
+        """
+        if self.count == 0:
+            return None
+        rank = self.count * perc / 100.0
+        total = 0
+        for pos, count in enumerate(self.counts):
+            total += count
+            if total >= rank and count > 0:
+                if pos < len(self.buckets):
+                    return min(self.buckets[pos], self.max)
+                return self.max
+        return self.max
+
+    def info(self) -> dict:
+        """Get histogram data
+
+        :return: dict with count, sum, min, max, avg, p50, p95, p99 and cumulative buckets counters
+        """
+        with self.__lock:
+            buckets = {}
+            total = 0
+            for pos, bound in enumerate(self.buckets):
+                total += self.counts[pos]
+                buckets[str(bound)] = total
+            buckets["+Inf"] = self.count
+            avg = None
+            if self.count > 0:
+                avg = round(self.sum / self.count, 6)
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 6),
+                "min": self.min,
+                "max": self.max,
+                "avg": avg,
+                "p50": self.percentile(50),
+                "p95": self.percentile(95),
+                "p99": self.percentile(99),
+                "buckets": buckets,
+            }
+
+
+class MetricsRegistry(object):
+    """Registry of in-process histograms. Histograms are created the first time a value is observed.
+
+    :param buckets: histograms buckets upper bounds [default=DEFAULT_BUCKETS]
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enabled = True
+        self.__histograms: Dict[str, Histogram] = {}
+        self.__lock = RLock()
+
+    def __repr__(self):
+        return "<MetricsRegistry id=%s histograms=%s>" % (id(self), len(self.__histograms))
+
+    def histogram(self, name: str) -> Histogram:
+        """Get histogram. Create it if it does not exist
+
+        :param name: histogram name
+        :return: Histogram instance
+        """
+        hist = self.__histograms.get(name, None)
+        if hist is None:
+            with self.__lock:
+                hist = self.__histograms.get(name, None)
+                if hist is None:
+                    hist = Histogram(name, buckets=self.buckets)
+                    self.__histograms[name] = hist
+        return hist
+
+    def observe(self, name: str, value: float):
+        """Add value to histogram. Do nothing if registry is disabled
+
+        :param name: histogram name
+        :param value: value to add
+        """
+        if self.enabled is True:
+            self.histogram(name).observe(value)
+
+    def info(self, prefix: str = None) -> Dict[str, dict]:
+        """Get data of all the histograms
+
+        :param prefix: return only histograms whose name starts with prefix [optional]
+        :return: dict like {<histogram name>: <histogram data>}
+        """
+        res = {}
+        for name, hist in list(self.__histograms.items()):
+            if prefix is None or name.startswith(prefix):
+                res[name] = hist.info()
+        return res
+
+    def reset(self):
+        """Remove all the histograms"""
+        with self.__lock:
+            self.__histograms.clear()
+
+
+#: process wide metrics registry
+metrics = MetricsRegistry()
+
+
+class PhaseTimer(object):
+    """Collect elapsed time of the phases of an operation. Each call to mark assigns the time elapsed from the previous
+    mark to a phase. Time that must not be assigned to any phase is discarded with skip.
+
+    Example::
+
+        timer = PhaseTimer("api")
+        ...
+        timer.mark("auth")
+        ...
+        timer.mark("handler")
+        timer.observe()
+
+    :param prefix: histograms name prefix
+    :param registry: metrics registry [default=metrics]
+    """
+
+    def __init__(self, prefix: str, registry: MetricsRegistry = None):
+        self.prefix = prefix
+        self.registry = registry if registry is not None else metrics
+        self.start = time()
+        self.last = self.start
+        self.phases: Dict[str, float] = {}
+
+    def __repr__(self):
+        return "<PhaseTimer prefix=%s phases=%s>" % (self.prefix, self.phases)
+
+    def skip(self):
+        """Discard time elapsed from the last mark"""
+        self.last = time()
+
+    def mark(self, phase: str):
+        """Assign time elapsed from the last mark to phase
+
+        :param phase: phase name
+        """
+        now = time()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+    def elapsed(self) -> float:
+        """Get time elapsed from timer creation
+
+        :return: elapsed time in seconds
+        """
+        return time() - self.start
+
+    def observe(self, name: str = None):
+        """Add phases elapsed time to registry histograms. Histograms are named <prefix>.phase.<phase>. Total elapsed
+        time is added to <prefix>.total and to <prefix>.<name> when name is specified.
+
+        :param name: operation name. Ex. GET /v1.0/server/ping [optional]
+        """
+        if self.registry.enabled is False:
+            return
+        for phase, elapsed in self.phases.items():
+            self.registry.observe("%s.phase.%s" % (self.prefix, phase), elapsed)
+        total = self.elapsed()
+        self.registry.observe("%s.total" % self.prefix, total)
+        if name is not None:
+            self.registry.observe("%s.%s" % (self.prefix, name), total)
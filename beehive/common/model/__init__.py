@@ -2,7 +2,9 @@
 #
 # (C) Copyright 2018-2024 CSI-Piemonte
 
+import json
 import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from time import time
 from six import b, ensure_binary, ensure_text
 from sqlalchemy import exc
@@ -280,7 +282,10 @@ class SchedulerTask(Base):
     """
 
     __tablename__ = "scheduler_task"
-    __table_args__ = {"mysql_engine": "InnoDB"}
+    __table_args__ = (
+        Index("idx_scheduler_task_name_start_time", "name", "start_time"),
+        {"mysql_engine": "InnoDB"},
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(50), unique=True, index=True)
@@ -329,7 +334,10 @@ class SchedulerStep(Base):
     """
 
     __tablename__ = "scheduler_step"
-    __table_args__ = {"mysql_engine": "InnoDB"}
+    __table_args__ = (
+        Index("idx_scheduler_step_task_id_start_time", "task_id", "start_time"),
+        {"mysql_engine": "InnoDB"},
+    )
 
     id = Column(Integer, primary_key=True)
     uuid = Column(String(50), unique=True, index=True)
@@ -365,14 +373,17 @@ class SchedulerTrace(Base):
     """
 
     __tablename__ = "scheduler_trace"
-    __table_args__ = {"mysql_engine": "InnoDB"}
+    __table_args__ = (
+        Index("idx_scheduler_trace_task_id_date", "task_id", "date"),
+        {"mysql_engine": "InnoDB"},
+    )
 
     id = Column(Integer, primary_key=True)
     task_id = Column(String(50), index=True)
     step_id = Column(String(50), index=True)
     message = Column(Text())
     level = Column(String(10), index=True)
-    date = Column(mysql.DATETIME(fsp=6))
+    date = Column(mysql.DATETIME(fsp=6), index=True)
 
     def __init__(self, task_id, step_id, message, level):
         self.task_id = task_id
@@ -385,6 +396,21 @@ class SchedulerTrace(Base):
         return "<SchedulerTrace(%s, %s, %s)>" % (self.task_id, self.step_id, self.level)
 
 
+class QueryTotal(int):
+    """Total records of a paginated query. It is an int that also reports how it was calculated
+
+    :param value: total records. With has_more strategy it is a lower bound
+    :param strategy: count strategy used. Can be exact, cached, window, has_more [default=exact]
+    :param has_more: with has_more strategy True if other records follow the page [optional]
+    """
+
+    def __new__(cls, value, strategy="exact", has_more=None):
+        obj = int.__new__(cls, value)
+        obj.strategy = strategy
+        obj.has_more = has_more
+        return obj
+
+
 class PaginatedQueryGenerator(object):
     """Use this class to generate and configure query with pagination and filtering based on tagged entity.
     Base table : perm_tag t1, perm_tag_entity t2, {entitytable} t3
@@ -396,6 +422,10 @@ class PaginatedQueryGenerator(object):
     :param with_perm_tag: check permission tags [optional]
     """
 
+    #: exact: count query, cached: count query result cached in redis, window: total read with the records using
+    #: a window function, has_more: no count, check only if other records follow the page
+    COUNT_STRATEGIES = ["exact", "cached", "window", "has_more"]
+
     def __init__(
         self,
         entity: Type[ENTITY],
@@ -423,6 +453,13 @@ class PaginatedQueryGenerator(object):
         self.field: str = None
         self.start: str = None
         self.end: str = None
+        self.stream_chunk: int = 100
+        self.cursor_mode: bool = False
+        self.cursor: list = None
+        self.count_strategy: str = "exact"
+        self.count_cache = None
+        self.count_cache_ttl: int = 30
+        self.tag_ids: List[int] = None
 
     def set_pagination(self, page: int = 0, size: int = 10, order: str = "DESC", field: str = "id"):
         """Set pagiantion params
@@ -442,6 +479,215 @@ class PaginatedQueryGenerator(object):
         self.start: str = str(size * page)
         self.end: str = str(size * (page + 1))
 
+    @staticmethod
+    def encode_cursor(value: Any, oid: int) -> str:
+        """Encode keyset pagination cursor
+
+        :param value: sort field value of the last record of the page
+        :param oid: id of the last record of the page
+        :return: opaque cursor
+        """
+        data = json.dumps([value, oid], default=str)
+        return ensure_text(urlsafe_b64encode(ensure_binary(data)))
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> list:
+        """Decode keyset pagination cursor
+
+        :param cursor: opaque cursor
+        :return: [sort field value, id]
+        :raises QueryError: raise :class:`QueryError` if cursor is not valid
+        """
+        try:
+            value, oid = json.loads(urlsafe_b64decode(ensure_binary(cursor)))
+            return [value, int(oid)]
+        except Exception:
+            raise QueryError("Pagination cursor %s is not valid" % cursor)
+
+    def set_cursor(self, cursor: str = None):
+        """Enable keyset pagination. Records are sorted by field and id and the page starts after the record identified
+        by the cursor, instead of skipping the previous pages with LIMIT start,size. So every page costs like the first
+        one. Page number is ignored.
+
+        :param cursor: cursor of the last record of the previous page. Use None or empty string to get the first page
+        :raises QueryError: raise :class:`QueryError` if cursor is not valid
+        """
+        self.cursor_mode = True
+        self.cursor = None
+        if cursor:
+            self.cursor = self.decode_cursor(cursor)
+
+    def set_tag_ids(self, tag_ids: List[int] = None):
+        """Filter entities by permission tag ids instead of permission tag values. Query binds the ids directly against
+        perm_tag_entity.tag and does not join perm_tag
+
+        :param tag_ids: list of perm_tag ids. None to filter by permission tag values [optional]
+        """
+        if tag_ids is not None and len(tag_ids) == 0:
+            # no tag. Query must return no entity
+            tag_ids = [-1]
+        self.tag_ids = tag_ids
+
+    def get_cursor_filter(self) -> str:
+        """Get keyset pagination filter
+
+        :return: sql filter like 'AND (t3.name < :cursor_value OR (t3.name = :cursor_value AND t3.id < :cursor_id))'
+        """
+        op = "<"
+        if self.order.upper() == "ASC":
+            op = ">"
+        if self.field == "t3.id":
+            return "AND t3.id %s :cursor_id" % op
+        return "AND ({field} {op} :cursor_value OR ({field} = :cursor_value AND t3.id {op} :cursor_id))".format(
+            field=self.field, op=op
+        )
+
+    def get_cursor_params(self) -> dict:
+        """Get keyset pagination query params
+
+        :return: dict with cursor_value and cursor_id
+        """
+        if self.cursor is None:
+            return {}
+        return {"cursor_value": self.cursor[0], "cursor_id": self.cursor[1]}
+
+    def get_order_by(self) -> str:
+        """Get order by clause. With keyset pagination id is used to sort records with the same field value
+
+        :return: order by clause
+        """
+        order_by = "ORDER BY {field} {order}"
+        if self.cursor_mode is True and self.field != "t3.id":
+            order_by += ", t3.id {order}"
+        return order_by
+
+    def get_limit(self, limit: int = 1000) -> str:
+        """Get limit clause
+
+        :param limit: max returned records when size is 0 [default=1000]
+        :return: limit clause
+        """
+        if self.size > 0:
+            # read one more record to know if other records follow the page
+            size = self.size
+            if self.count_strategy == "has_more":
+                size += 1
+            if self.cursor_mode is True:
+                return "LIMIT %s" % size
+            return "LIMIT %s,%s" % (self.start, size)
+        elif self.size == -1:
+            return ""
+        return "LIMIT %s" % limit  # num rows
+
+    def set_count_strategy(self, strategy: str = None, cache=None, cache_ttl: int = None, stream: bool = False):
+        """Set the strategy used to calculate the total records. Strategies that can not be applied to the query fall
+        back to exact
+
+        :param strategy: count strategy. Can be exact, cached, window, has_more [default=exact]
+        :param cache: cache client used by cached strategy [optional]
+        :param cache_ttl: cached total time to live in seconds [optional]
+        :param stream: True if records are streamed [default=False]
+        :raises QueryError: raise :class:`QueryError` if strategy is not supported
+        """
+        if strategy is None:
+            strategy = "exact"
+        if strategy not in self.COUNT_STRATEGIES:
+            raise QueryError("Count strategy %s is not supported" % strategy)
+        self.count_cache = cache
+        if cache_ttl is not None:
+            self.count_cache_ttl = cache_ttl
+
+        if self.size <= 0:
+            # total is the number of records read
+            strategy = "exact"
+        elif strategy == "cached" and cache is None:
+            strategy = "exact"
+        elif strategy == "window" and (stream is True or self.cursor is not None):
+            strategy = "exact"
+        elif strategy == "has_more" and stream is True:
+            strategy = "exact"
+        self.count_strategy = strategy
+
+    def get_count_key(self, stmp: TextClause, tags: List[str], kvargs: dict) -> str:
+        """Get cache key of the total records
+
+        :param stmp: count statement
+        :param tags: list of permission tags
+        :param kvargs: query params
+        :return: cache key
+        """
+        params = sorted((k, str(v)) for k, v in kvargs.items())
+        data = "%s|%s|%s" % (stmp, sorted(tags), params)
+        return "query.count.%s.%s" % (self.entity.__tablename__, hashlib.sha256(ensure_binary(data)).hexdigest())
+
+    def count(self, stmp: TextClause, tags: List[str], kvargs: dict) -> int:
+        """Get total records with count query. With cached strategy total is read from cache when it exists
+
+        :param stmp: count statement
+        :param tags: list of permission tags
+        :param kvargs: query params
+        :return: total records
+        """
+        key = None
+        if self.count_strategy == "cached":
+            key = self.get_count_key(stmp, tags, kvargs)
+            try:
+                total = self.count_cache.get(key)
+            except Exception as ex:
+                total = None
+                self.logger.warning("Count %s can not be read from cache: %s" % (key, ex))
+            if isinstance(total, int):
+                self.logger.debug2("+++++ SQL - Get cached count %s: %s" % (key, total))
+                return total
+
+        query_count = self.session.query(Column("count")).from_statement(stmp).params(tags=tags, **kvargs)
+        self.logger.debug2("+++++ SQL - count stmp: %s" % query_count.statement.compile(dialect=mysql.dialect()))
+        total = query_count.first()[0]
+
+        if key is not None:
+            try:
+                self.count_cache.set(key, total, ttl=self.count_cache_ttl)
+            except Exception as ex:
+                self.logger.warning("Count %s can not be saved in cache: %s" % (key, ex))
+        return total
+
+    def get_total(self, res: list, stmp: TextClause, tags: List[str], kvargs: dict, total: int = None) -> tuple:
+        """Get total records of the page read with window or has_more strategy
+
+        :param res: records read
+        :param stmp: count statement used when total can not be read from records
+        :param tags: list of permission tags
+        :param kvargs: query params
+        :param total: total calculated with exact or cached strategy [optional]
+        :return: (records, QueryTotal)
+        """
+        if self.size == 0 or self.size == -1:
+            return res, QueryTotal(len(res))
+
+        if self.count_strategy == "window":
+            if len(res) == 0:
+                # page after the last one
+                if self.page > 0:
+                    self.count_strategy = "exact"
+                    return res, QueryTotal(self.count(stmp, tags, kvargs))
+                return res, QueryTotal(0, strategy="window")
+            total = res[0][-1]
+            if len(res[0]) > 2:
+                res = [row[:-1] for row in res]
+            else:
+                res = [row[0] for row in res]
+            return res, QueryTotal(total, strategy="window")
+
+        if self.count_strategy == "has_more":
+            has_more = len(res) > self.size
+            res = res[: self.size]
+            start = 0
+            if self.cursor_mode is False:
+                start = int(self.start)
+            return res, QueryTotal(start + len(res) + int(has_more), strategy="has_more", has_more=has_more)
+
+        return res, QueryTotal(total, strategy=self.count_strategy)
+
     def add_table(self, table: str, alias: str):
         """Append table to query
 
@@ -582,9 +828,13 @@ class PaginatedQueryGenerator(object):
         fields = ", ".join(self.select_fields)
         if count is True:
             fields = "count(distinct {field}) as count".format(field=self.field)
+        elif self.count_strategy == "window":
+            fields += ", count(*) over() as query_total"
 
         sql = ["SELECT {fields}", "FROM {table} t3"]
-        if self.with_perm_tag is True:
+        if self.with_perm_tag is True and self.tag_ids is not None:
+            sql.extend([", perm_tag_entity t2 "])
+        elif self.with_perm_tag is True:
             sql.extend([", perm_tag t1, perm_tag_entity t2 "])
 
         # append other tables
@@ -593,7 +843,9 @@ class PaginatedQueryGenerator(object):
 
         sql.extend(["WHERE 1=1"])
         # set base where
-        if self.with_perm_tag is True:
+        if self.with_perm_tag is True and self.tag_ids is not None:
+            sql.extend(["AND t3.id=t2.entity", "AND t2.tag IN :tag_ids "])
+        elif self.with_perm_tag is True:
             sql.extend(["AND t3.id=t2.entity AND t2.tag=t1.id", "AND t1.value IN :tags "])
 
         # add filters
@@ -602,18 +854,15 @@ class PaginatedQueryGenerator(object):
 
             # set group by and limit
         if count is False:
+            if self.cursor is not None:
+                sql.append(self.get_cursor_filter())
             if not hasattr(self.entity, "__view__") and self.with_perm_tag is True:
-                sql.extend(["GROUP BY {field}", "ORDER BY {field} {order}"])
+                sql.extend(["GROUP BY {field}", self.get_order_by()])
             elif self.group_by is True:
-                sql.extend(["GROUP BY {field}", "ORDER BY {field} {order}"])
-            else:
-                sql.extend(["ORDER BY {field} {order}"])
-            if self.size > 0:
-                sql.append("LIMIT {start},{size}")
-            elif self.size == -1:
-                sql.append("")
+                sql.extend(["GROUP BY {field}", self.get_order_by()])
             else:
-                sql.append("LIMIT 1000")  # num rows
+                sql.extend([self.get_order_by()])
+            sql.append(self.get_limit())
 
         # format query
         stmp: str = " ".join(sql)
@@ -641,10 +890,31 @@ class PaginatedQueryGenerator(object):
         :param list tags: list of permission tags
         :param args: custom args
         :param kvargs: custom kvargs
+        :param kvargs.stream: if True return an iterator that fetches records in chunks [default=False]
+        :param kvargs.cursor: keyset pagination cursor. See set_cursor [optional]
+        :param kvargs.count_strategy: strategy used to calculate total. See set_count_strategy [default=exact]
+        :param kvargs.count_cache: cache client used by cached count strategy [optional]
+        :param kvargs.count_cache_ttl: cached total time to live in seconds [optional]
+        :param kvargs.tag_ids: list of perm_tag ids used in place of tags. See set_tag_ids [optional]
+        :return: (list of records, QueryTotal)
         """
         start = time()
 
         self.group_by = kvargs.pop("group_by", False)
+        stream = kvargs.pop("stream", False)
+        if "cursor" in kvargs:
+            self.set_cursor(kvargs.pop("cursor"))
+        self.set_tag_ids(kvargs.pop("tag_ids", None))
+        self.set_count_strategy(
+            strategy=kvargs.pop("count_strategy", None),
+            cache=kvargs.pop("count_cache", None),
+            cache_ttl=kvargs.pop("count_cache_ttl", None),
+            stream=stream,
+        )
+        # without group by records are not distinct and window count is not exact
+        grouped = self.group_by is True or (not hasattr(self.entity, "__view__") and self.with_perm_tag is True)
+        if self.count_strategy == "window" and self.with_perm_tag is True and grouped is False:
+            self.count_strategy = "exact"
 
         if self.with_perm_tag is True:
             self.logger.debug2("Authorization with permission tags ENABLED")
@@ -653,29 +923,37 @@ class PaginatedQueryGenerator(object):
 
         if tags is None or len(tags) == 0:
             tags = [""]
+        if self.tag_ids is not None:
+            kvargs["tag_ids"] = self.tag_ids
 
         # make query
-        if self.size > 0:
+        total = None
+        count_stmp = self.base_stmp(count=True)
+        if (self.size > 0 or stream is True) and self.count_strategy in ["exact", "cached"]:
             # count all records
-            stmp = self.base_stmp(count=True)
-            query_count = self.session.query(Column("count")).from_statement(stmp).params(tags=tags, **kvargs)
-            self.logger.debug2("+++++ SQL - count stmp: %s" % query_count.statement.compile(dialect=mysql.dialect()))
-            total = query_count.first()[0]
+            total = self.count(count_stmp, tags, kvargs)
 
         stmp = self.base_stmp()
 
         # set query entities
         entities = [self.entity]
         entities.extend(self.other_entities)
+        if self.count_strategy == "window":
+            entities.append(Column("query_total"))
 
-        query = self.session.query(*entities).from_statement(stmp).params(tags=tags, **kvargs)
+        params = dict(kvargs, **self.get_cursor_params())
+        query = self.session.query(*entities).from_statement(stmp).params(tags=tags, **params)
         self.logger.debug2("+++++ SQL - stmp: %s" % query.statement.compile(dialect=mysql.dialect()))
         self.logger.debug2("+++++ SQL - kvargs: %s" % truncate(kvargs, size=2000))
         self.logger.debug2("+++++ SQL - tags: %s" % truncate(tags))
-        res = query.all()
+        if stream is True:
+            if self.size == 0:
+                total = min(total, 1000)
+            self.logger.debug2("+++++ SQL - Stream %ss (total:%s)" % (self.entity.__tablename__, total))
+            return query.yield_per(self.stream_chunk), QueryTotal(total, strategy=self.count_strategy)
 
-        if self.size == 0 or self.size == -1:
-            total = len(res)
+        res = query.all()
+        res, total = self.get_total(res, count_stmp, tags, kvargs, total=total)
 
         elapsed = round(time() - start, 3)
         self.logger.debug2(
@@ -692,9 +970,13 @@ class PaginatedQueryGenerator(object):
         fields = ", ".join(self.select_fields)
         if count is True:
             fields = "count(distinct {field}) as count".format(field=self.field)
+        elif self.count_strategy == "window":
+            fields += ", count(*) over() as query_total"
 
         sql = ["SELECT distinct {fields}", "FROM {table} t3"]
-        if self.with_perm_tag is True:
+        if self.with_perm_tag is True and self.tag_ids is not None:
+            sql.extend(["inner join perm_tag_entity t2 on  t3.id=t2.entity"])
+        elif self.with_perm_tag is True:
             sql.extend(
                 [
                     "inner join perm_tag_entity t2 on  t3.id=t2.entity",
@@ -709,7 +991,9 @@ class PaginatedQueryGenerator(object):
         sql.extend(["WHERE 1=1"])
 
         # set base where
-        if self.with_perm_tag is True:
+        if self.with_perm_tag is True and self.tag_ids is not None:
+            sql.extend(["AND t2.tag IN :tag_ids "])
+        elif self.with_perm_tag is True:
             sql.extend(["AND t1.value IN :tags "])
 
         # add filters
@@ -718,14 +1002,10 @@ class PaginatedQueryGenerator(object):
 
         # set group by and limit
         if count is False:
-            sql.extend(["ORDER BY {field} {order}"])
-
-            if self.size > 0:
-                sql.append("LIMIT {start},{size}")
-            elif self.size == -1:
-                sql.append("")
-            else:
-                sql.append("LIMIT %s" % limit)  # num rows
+            if self.cursor is not None:
+                sql.append(self.get_cursor_filter())
+            sql.extend([self.get_order_by()])
+            sql.append(self.get_limit(limit=limit))
 
         # format query
         stmp = " ".join(sql)
@@ -757,9 +1037,30 @@ class PaginatedQueryGenerator(object):
         :param list tags: list of permission tags
         :param args: custom args
         :param kvargs: custom kvargs
+        :param kvargs.stream: if True return an iterator that fetches records in chunks [default=False]
+        :param kvargs.cursor: keyset pagination cursor. See set_cursor [optional]
+        :param kvargs.count_strategy: strategy used to calculate total. See set_count_strategy [default=exact]
+        :param kvargs.count_cache: cache client used by cached count strategy [optional]
+        :param kvargs.count_cache_ttl: cached total time to live in seconds [optional]
+        :param kvargs.tag_ids: list of perm_tag ids used in place of tags. See set_tag_ids [optional]
+        :return: (list of records, QueryTotal)
         """
         start = time()
 
+        stream = kvargs.pop("stream", False)
+        if "cursor" in kvargs:
+            self.set_cursor(kvargs.pop("cursor"))
+        self.set_tag_ids(kvargs.pop("tag_ids", None))
+        self.set_count_strategy(
+            strategy=kvargs.pop("count_strategy", None),
+            cache=kvargs.pop("count_cache", None),
+            cache_ttl=kvargs.pop("count_cache_ttl", None),
+            stream=stream,
+        )
+        # window count is calculated before distinct. It is not exact when joins can duplicate records
+        if self.count_strategy == "window" and (self.with_perm_tag is True or len(self.joins) > 0):
+            self.count_strategy = "exact"
+
         if self.with_perm_tag is True:
             self.logger.debug2("Authorization with permission tags ENABLED")
         else:
@@ -767,27 +1068,37 @@ class PaginatedQueryGenerator(object):
 
         if tags is None or len(tags) == 0:
             tags = [""]
+        if self.tag_ids is not None:
+            kvargs["tag_ids"] = self.tag_ids
 
         # make query
-        if self.size > 0:
+        total = None
+        count_stmp = self.base_stmp2(count=True)
+        if (self.size > 0 or stream is True) and self.count_strategy in ["exact", "cached"]:
             # count all records
-            stmp = self.base_stmp2(count=True)
-            total = self.session.query(Column("count")).from_statement(stmp).params(tags=tags, **kvargs).first()[0]
+            total = self.count(count_stmp, tags, kvargs)
 
         stmp = self.base_stmp2()
 
         # set query entities
         entities = [self.entity]
         entities.extend(self.other_entities)
+        if self.count_strategy == "window":
+            entities.append(Column("query_total"))
 
-        query = self.session.query(*entities).from_statement(stmp).params(tags=tags, **kvargs)
+        params = dict(kvargs, **self.get_cursor_params())
+        query = self.session.query(*entities).from_statement(stmp).params(tags=tags, **params)
         self.logger.debug2("+++++ run2 stmp: %s" % query.statement.compile(dialect=mysql.dialect()))
         self.logger.debug2("+++++ run2 kvargs: %s" % truncate(kvargs))
         self.logger.debug2("+++++ run2 tags: %s" % truncate(tags))
-        res: List[ENTITY] = query.all()
+        if stream is True:
+            if self.size == 0:
+                total = min(total, 1000)
+            self.logger.debug2("Stream %ss (total:%s)" % (self.entity.__tablename__, total))
+            return query.yield_per(self.stream_chunk), QueryTotal(total, strategy=self.count_strategy)
 
-        if self.size == 0 or self.size == -1:
-            total: int = len(res)
+        res: List[ENTITY] = query.all()
+        res, total = self.get_total(res, count_stmp, tags, kvargs, total=total)
 
         elapsed = round(time() - start, 3)
         self.logger.debug2("Get %ss (total:%s): %s [%s]" % (self.entity.__tablename__, total, truncate(res), elapsed))
@@ -800,6 +1111,9 @@ class AbstractDbManager(object):
     :param session: sqlalchemy session
     """
 
+    #: if True unused permission tags are not deleted, so perm_tag ids cached by the list queries stay valid
+    keep_perm_tags = False
+
     def __init__(self, session=None, cache_manager=None, ttl=600):
         self.logger = logging.getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
 
@@ -1483,6 +1797,24 @@ class AbstractDbManager(object):
         self.logger.debug2("Query permtags: %s" % res)
         return res
 
+    @query
+    def get_perm_tag_ids(self, values: List[str], *args, **kvargs) -> Dict[str, int]:
+        """Get ids of the existing permission tags
+
+        :param values: list of tag values
+        :return: dict like {value: id}. Values without a permission tag are not in the dict
+        :raises QueryError: raise :class:`QueryError`
+        """
+        session = self.get_session()
+
+        res = {}
+        for i in range(0, len(values), 1000):
+            query = session.query(PermTag.id, PermTag.value).filter(PermTag.value.in_(values[i : i + 1000]))
+            res.update({value: oid for oid, value in query.all()})
+
+        self.logger.debug2("Query permtag ids: %s of %s" % (len(res), len(values)))
+        return res
+
     @transaction
     def __add_perm_tag(self, tag, explain, *args, **kvargs):
         """Add permission tag and entity association.
@@ -1573,6 +1905,47 @@ class AbstractDbManager(object):
 
         return tagrecord
 
+    @transaction
+    def add_perm_tags(self, items: List[Tuple[str, str, int, str]], *args, **kvargs) -> int:
+        """Add permission tags and entity associations in bulk. Missing tags and associations are inserted with
+        set-based statements in a single transaction, existing ones are skipped.
+
+        :param items: list of (tag, explain, entity, type)
+        :return: number of new entity associations
+        :raises TransactionError: raise :class:`TransactionError`
+        """
+        session = self.get_session()
+
+        # create missing permtags. Insert ignore protects from permtags created concurrently
+        explains = {}
+        for tag, explain, entity, etype in items:
+            explains.setdefault(tag, explain)
+        tag_ids = self.get_perm_tag_ids(list(explains))
+        now = datetime.today()
+        new_tags = [{"value": k, "explain": v, "creation_date": now} for k, v in explains.items() if k not in tag_ids]
+        if len(new_tags) > 0:
+            stmp = PermTag.__table__.insert().prefix_with("IGNORE", dialect="mysql")
+            session.execute(stmp.prefix_with("OR IGNORE", dialect="sqlite"), new_tags)
+            tag_ids.update(self.get_perm_tag_ids([t["value"] for t in new_tags]))
+        self.logger.debug2("Add permtags: %s of %s" % (len(new_tags), len(explains)))
+
+        # create missing tag entity associations. Insert ignore protects from associations created concurrently
+        entities = list({item[2] for item in items})
+        existing = set()
+        for i in range(0, len(entities), 1000):
+            query = session.query(PermTagEntity.tag, PermTagEntity.entity)
+            existing.update(query.filter(PermTagEntity.entity.in_(entities[i : i + 1000])).all())
+        new_records = {}
+        for tag, explain, entity, etype in items:
+            key = (tag_ids[tag], entity)
+            if key not in existing:
+                new_records[key] = {"tag": key[0], "entity": entity, "type": etype}
+        if len(new_records) > 0:
+            stmp = PermTagEntity.__table__.insert().prefix_with("IGNORE", dialect="mysql")
+            session.execute(stmp.prefix_with("OR IGNORE", dialect="sqlite"), list(new_records.values()))
+        self.logger.debug2("Add permtag entity associations: %s of %s" % (len(new_records), len(items)))
+        return len(new_records)
+
     @transaction
     def delete_perm_tag(self, entity, etype, tags):
         """Remove permission tag entity association.
@@ -1593,6 +1966,10 @@ class AbstractDbManager(object):
         session.flush()
         self.logger.debug2("Delete tag entity %s.%s association" % (entity, etype))
 
+        # keep unused tag. A new association with the same tag reuses its id
+        if self.keep_perm_tags is True:
+            return True
+
         # remove unused tag
         for tag in tags:
             tagrecord = session.query(PermTag).filter_by(value=tag).first()
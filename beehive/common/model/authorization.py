@@ -14,17 +14,18 @@ from sqlalchemy.orm import relationship, backref
 from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import func
-from sqlalchemy.sql import text
+from sqlalchemy.sql import text, select, union, or_, bindparam
 from beecell.simple import truncate, id_gen, random_password, is_encrypted
 from beecell.db import ModelError, QueryError
 from beehive.common.data import query, transaction, decrypt_data
 from sqlalchemy.dialects import mysql
-from typing import List
+from typing import List, Tuple, Dict
 from re import match
 
 Base = declarative_base()
 
 from beehive.common.model import AbstractDbManager, BaseEntity, PaginatedQueryGenerator
+from beehive.common.perms import RolePermissionCache
 
 
 logger = logging.getLogger(__name__)
@@ -436,6 +437,9 @@ class AuthDbManager(AbstractAuthDbManager, AbstractDbManager):
     :param session: sqlalchemy session
     """
 
+    #: role permissions cache shared by the managers of the process
+    role_perms_cache = RolePermissionCache()
+
     def __init__(self, session=None):
         AbstractDbManager.__init__(self, session)
         AbstractAuthDbManager.__init__(self, session)
@@ -811,6 +815,45 @@ class AuthDbManager(AbstractAuthDbManager, AbstractDbManager):
         session.add_all(items)
         return items
 
+    @transaction
+    def add_objects(self, objs, actions):
+        """Add system objects in bulk. Objects that already exist are skipped instead of raising an error. Existing
+        objects are found with one query for every object type.
+
+        :param objs: list of (SysObjectType, objid, desc) tuple
+        :param actions: list of SysObjectAction
+        :return: list of new SysObject
+        :raises TransactionError: raise :class:`TransactionError`
+        """
+        session = self.get_session()
+
+        objids = {}
+        for obj in objs:
+            objids.setdefault(obj[0], set()).add(obj[1])
+        existing = set()
+        for obj_type, values in objids.items():
+            values = list(values)
+            for i in range(0, len(values), 1000):
+                query = session.query(SysObject.objid).filter_by(type_id=obj_type.id)
+                existing.update((obj_type.id, r[0]) for r in query.filter(SysObject.objid.in_(values[i : i + 1000])))
+
+        res = []
+        items = []
+        for obj in objs:
+            key = (obj[0].id, obj[1])
+            if key in existing:
+                continue
+            existing.add(key)
+
+            sysobj = SysObject(obj[0], obj[1], desc=obj[2])
+            res.append(sysobj)
+            items.append(sysobj)
+            items.extend(SysObjectPermission(sysobj, action) for action in actions)
+        session.add_all(items)
+        session.flush()
+        self.logger.debug("Add system objects: %s of %s" % (len(res), len(objs)))
+        return res
+
     @transaction
     def update_object(self, new_objid, oid=None, objid=None, objtype=None):
         """Delete system object filtering by id, by name or by type.
@@ -839,6 +882,8 @@ class AuthDbManager(AbstractAuthDbManager, AbstractDbManager):
             query = session.query(SysObject).filter_by(objtype=objtype)
 
         query.update(data)
+        # updated objid can be in the cached permissions of any role
+        self.role_perms_cache.remove()
         self.logger.debug("Update objects: %s" % data)
         return True
 
@@ -894,6 +939,8 @@ class AuthDbManager(AbstractAuthDbManager, AbstractDbManager):
 
             # remove object
             session.delete(item)
+        # removed permissions can belong to any role
+        self.role_perms_cache.remove()
         self.logger.debug("Remove objects: %s %s %s" % (oid, objid, objtype))
         return True
 
@@ -1635,6 +1682,7 @@ WHERE
                 append_perms.append(perm.id)
             else:
                 self.logger.warn("Permission %s already exists in role %s" % (perm, role))
+        self.role_perms_cache.remove(role.id)
 
         self.logger.debug("Append permissions %s to role %s" % (append_perms, role))
         return append_perms
@@ -1656,6 +1704,7 @@ WHERE
             if perm in role.permission:
                 role.permission.remove(perm)
                 remove_perms.append(perm.id)
+        self.role_perms_cache.remove(role.id)
 
         self.logger.debug("Remove from role %s permissions: %s" % (role, perms))
         return remove_perms
@@ -2134,17 +2183,8 @@ WHERE
         if user is None:
             raise ModelError("User is not correct or does not exist")
 
-        # get user roles
-        roles = []
-        user_roles = session.query(Role).join(RoleUser).filter(RoleUser.user_id == user.id).all()
-        for role in user_roles:
-            roles.append(role.name)
-
-        # get user roles from user groups
-        for group in user.group:
-            group_roles = session.query(Role).join(RoleGroup).filter(RoleGroup.group_id == group.id).all()
-            for role in group_roles:
-                roles.append(role.name)
+        # get user roles and user groups roles
+        roles = [name for oid, name in self.get_user_all_roles(user)]
 
         if len(roles) == 0:
             self.logger.warn("User %s has no roles associated" % user.id)
@@ -2156,43 +2196,40 @@ WHERE
         return perms, total
 
     @query
-    def get_login_permissions(self, user: User, *args, **kvargs):
-        """Get login user permissions.
+    def get_user_all_roles(self, user: User) -> List[Tuple[int, str]]:
+        """Get not expired roles of a user and of the groups the user belongs to with a single query.
 
         :param user: Orm User instance
-        :return: Pandas Series of SysObjectPermission
-        :rtype: pands.Series
+        :return: list of (role id, role name)
         :raises QueryError: raise :class:`QueryError`
         """
         session = self.get_session()
+        now = datetime.today()
+
+        user_roles = select(RoleUser.role_id).where(RoleUser.user_id == user.id)
+        user_roles = user_roles.where(or_(RoleUser.expiry_date.is_(None), RoleUser.expiry_date > now))
+        group_roles = select(RoleGroup.role_id).join(group_user, group_user.c.group_id == RoleGroup.group_id)
+        group_roles = group_roles.where(group_user.c.user_id == user.id)
+        group_roles = group_roles.where(or_(RoleGroup.expiry_date.is_(None), RoleGroup.expiry_date > now))
+        role_ids = union(user_roles, group_roles).subquery()
+
+        query = session.query(Role.id, Role.name).filter(Role.id.in_(select(role_ids.c.role_id)))
+        res = [(r[0], r[1]) for r in query.all()]
+        self.logger.debug("Get user %s roles: %s" % (user, truncate(res)))
+        return res
 
-        if user is None:
-            raise ModelError("User is not correct or does not exist")
+    @query
+    def get_roles_login_permissions(self, role_ids: List[int]) -> Dict[int, list]:
+        """Get permissions of many roles with a single query.
 
-        # get all user roles
-        roles: List[Role] = []
-        user_roles = session.query(Role).join(RoleUser).filter(RoleUser.user_id == user.id).all()
-        for role in user_roles:
-            roles.append(role.name)
-        for group in user.group:
-            group_roles = session.query(Role).join(RoleGroup).filter(RoleGroup.group_id == group.id).all()
-            for role in group_roles:
-                roles.append(role.name)
-
-        perms = []
-
-        self.logger.debug("Get user %s perms - roles: %s" % (user, roles))
-        if len(roles) > 0:
-            # get user permissions from user roles
-            # sql = [
-            #     "SELECT t4.id as id, t1.id as oid, t2.objtype as objtype, t2.objdef as objdef, t1.objid as objid, ",
-            #     "t3.id as aid, t3.value as action",
-            #     "FROM sysobject t1, sysobject_type t2, sysobject_action t3, sysobject_permission t4,",
-            #     "role t5, role_permission t6",
-            #     "WHERE t4.obj_id=t1.id and t4.action_id=t3.id and t1.type_id=t2.id and t6.role_id = t5.id and",
-            #     "t6.permission_id=t4.id and t5.name IN :role_name",
-            # ]
-            sqlstmnt = """SELECT
+        :param role_ids: list of role id
+        :return: dict like {role_id: [(id, oid, objtype, objdef, objid, aid, action),..]}
+        :raises QueryError: raise :class:`QueryError`
+        """
+        session = self.get_session()
+
+        sqlstmnt = """SELECT
+                rp.role_id as role_id,
                 pe.id as id,
                 so.id as oid,
                 ty.objtype as objtype,
@@ -2206,32 +2243,46 @@ WHERE
                 inner join sysobject_type ty on so.type_id=ty.id
                 inner join sysobject_action ac on pe.action_id=ac.id
                 inner join role_permission rp on rp.permission_id=pe.id
-                inner join `role` ro on rp.role_id = ro.id
             WHERE
-                ro.name IN :role_name"""
-            # columns = [text('id'), text('oid'), text('objtype'), text('objdef'), text('objid'), text('aid'),
-            #           text('action')]
-            columns = [
-                Column("id"),
-                Column("oid"),
-                Column("objtype"),
-                Column("objdef"),
-                Column("objid"),
-                Column("aid"),
-                Column("action"),
-            ]
-            query = (
-                session.query(*columns)
-                # .from_statement(text(" ".join(sql)))
-                .from_statement(text(sqlstmnt)).params(role_name=roles)
-            )
-            self.print_query(
-                self.get_login_permissions,
-                query,
-                inspect.getargvalues(inspect.currentframe()),
-            )
-            perms = query.all()
-            res = [[p[0], p[1], p[2], p[3], p[4], p[5], p[6]] for p in perms]
+                rp.role_id IN :role_ids"""
+        stmnt = text(sqlstmnt).bindparams(bindparam("role_ids", expanding=True))
+
+        res = {role_id: [] for role_id in role_ids}
+        for row in session.execute(stmnt, {"role_ids": role_ids}):
+            res[row[0]].append(tuple(row[1:]))
+        self.logger.debug("Get roles %s perms: %s" % (role_ids, sum(len(p) for p in res.values())))
+        return res
+
+    @query
+    def get_login_permissions(self, user: User, *args, **kvargs):
+        """Get login user permissions. Roles of the user and of the user groups are read with a single query, while
+        role permissions are read from the role permissions cache and only the missing ones from the database.
+
+        :param user: Orm User instance
+        :return: list of [id, oid, objtype, objdef, objid, aid, action]
+        :raises QueryError: raise :class:`QueryError`
+        """
+        if user is None:
+            raise ModelError("User is not correct or does not exist")
+
+        # get all user roles
+        role_ids = [oid for oid, name in self.get_user_all_roles(user)]
+        self.logger.debug("Get user %s perms - roles: %s" % (user, role_ids))
+
+        # get roles permissions
+        role_perms, misses = self.role_perms_cache.get(role_ids)
+        if len(misses) > 0:
+            perms = self.get_roles_login_permissions(misses)
+            self.role_perms_cache.set(perms)
+            role_perms.update(perms)
+
+        res = []
+        pids = set()
+        for perms in role_perms.values():
+            for perm in perms:
+                if perm[0] not in pids:
+                    pids.add(perm[0])
+                    res.append(list(perm))
         self.logger.debug("Get user %s perms: %s" % (user, truncate(res)))
         return res
 
@@ -0,0 +1,438 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+from collections import OrderedDict
+from hashlib import md5
+from logging import getLogger
+from threading import RLock
+from time import time
+from typing import Callable, Dict, FrozenSet, List, Tuple, Union
+from zlib import compress, decompress
+from six import ensure_binary, ensure_text
+from beecell.auth import extract
+from beehive.common.data import operation
+from beehive.common.serializer import dumps as serializer_dumps, loads as serializer_loads
+
+logger = getLogger(__name__)
+
+#: prefix of the identity permissions that reference a shared permissions snapshot
+SNAPSHOT_PREFIX = "snapshot:"
+
+
+class PermissionIndex(object):
+    """Compiled index of the identity permissions. It is built once when permissions are decoded and it replace the
+    linear scan of operation.perms made by ApiController.can.
+
+    Permissions are grouped by objtype, objdef and action. Compacted objids list, objids set and permission tags are
+    computed lazily the first time a (action, objtype, objdef) tuple is required and then reused for all the following
+    checks of the same identity.
+
+    :param perms: list of permissions like (0-pid, 1-oid, 2-type, 3-definition, 4-objid, 5-aid, 6-action)
+    """
+
+    def __init__(self, perms):
+        self.perms = perms
+        self.size = len(perms)
+
+        # {objtype: {objdef: {action: [objid, ..]}}}
+        self.__index: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+
+        # compiled items
+        self.__can = {}
+        self.__objsets = {}
+        self.__tags = {}
+        self.__tag_ids = {}
+
+        for perm in perms:
+            objtype_index = self.__index.setdefault(perm[2], {})
+            objdef_index = objtype_index.setdefault(perm[3].lower(), {})
+            objdef_index.setdefault(perm[6], []).append(perm[4])
+
+    def __repr__(self):
+        return "<PermissionIndex id=%s perms=%s>" % (id(self), self.size)
+
+    def is_valid_for(self, perms) -> bool:
+        """Check if index was built from permissions list
+
+        :param perms: permissions list
+        :return: True if index can be used for perms
+        """
+        return self.perms is perms and self.size == len(perms)
+
+    @staticmethod
+    def __get_objids(objdef_index, action):
+        objids = []
+        objids.extend(objdef_index.get("*", []))
+        if action != "*":
+            objids.extend(objdef_index.get(action, []))
+        return objids
+
+    def __compile(self, action, objtype, definition):
+        res = {}
+        if definition is not None:
+            objdef_index = self.__index.get(objtype, {}).get(definition, None)
+            if objdef_index is not None:
+                objids = self.__get_objids(objdef_index, action)
+                if len(objids) > 0:
+                    res[definition] = objids
+        elif objtype is not None:
+            for objdef, objdef_index in self.__index.get(objtype, {}).items():
+                objids = self.__get_objids(objdef_index, action)
+                if len(objids) > 0:
+                    res[objdef] = objids
+        else:
+            for objtype_index in self.__index.values():
+                for objdef, objdef_index in objtype_index.items():
+                    objids = self.__get_objids(objdef_index, action)
+                    if len(objids) > 0:
+                        res.setdefault(objdef, []).extend(objids)
+
+        # compact objids
+        for objdef, objids in res.items():
+            res[objdef] = extract(objids)
+        return res
+
+    def can(self, action, objtype=None, definition=None) -> Dict[str, List[str]]:
+        """Get objids that identity can use with action over a certain object type.
+
+        :param action: object action. Es. *, view, insert, update, delete, use
+        :param objtype: object type. Es. 'resource', 'service' [optional]
+        :param definition: object definition. Es. 'container.org.group.vm' [optional]
+        :return: dict like {objdef1: [objid1, objid2, ..], objdef2: [objid3, objid4, ..]}. Dict is empty when there are
+            no permissions. Objids lists are shared with the index and must not be modified.
+        """
+        if definition is not None:
+            definition = definition.lower()
+        key = (action, objtype, definition)
+        res = self.__can.get(key, None)
+        if res is None:
+            res = self.__compile(action, objtype, definition)
+            self.__can[key] = res
+        return dict(res)
+
+    def get_objset(self, action, objtype, definition) -> FrozenSet[str]:
+        """Get set of objids that identity can use with action over object definition
+
+        :param action: object action. Es. *, view, insert, update, delete, use
+        :param objtype: object type. Es. 'resource', 'service'
+        :param definition: object definition. Es. 'container.org.group.vm'
+        :return: frozenset of objids
+        """
+        definition = definition.lower()
+        key = (action, objtype, definition)
+        res = self.__objsets.get(key, None)
+        if res is None:
+            res = frozenset(self.can(action, objtype, definition).get(definition, []))
+            self.__objsets[key] = res
+        return res
+
+    def has_needs(self, action, objtype, definition, needs) -> bool:
+        """Verify if permissions overlap needs. Needs are the objid with all the wildcard prefixes so a single set
+        membership check per level is enough.
+
+        :param action: object action. Es. *, view, insert, update, delete, use
+        :param objtype: object type. Es. 'resource', 'service'
+        :param definition: object definition. Es. 'container.org.group.vm'
+        :param needs: object needs as iterable
+        :return: True if overlap
+        """
+        objset = self.get_objset(action, objtype, definition)
+        for need in needs:
+            if need in objset:
+                return True
+        return False
+
+    def get_tags(self, action, objtype, definition, hash_from_permission: Callable) -> List[str]:
+        """Get permission tags used to filter list queries
+
+        :param action: object action. Es. *, view, insert, update, delete, use
+        :param objtype: object type. Es. 'resource', 'service'
+        :param definition: object definition. Es. 'container.org.group.vm'
+        :param hash_from_permission: function used to hash (objdef, objid)
+        :return: list of permission tags
+        """
+        key = (action, objtype, definition.lower())
+        res = self.__tags.get(key, None)
+        if res is None:
+            objids = self.can(action, objtype, definition).get(definition.lower(), [])
+            res = [hash_from_permission(definition, objid) for objid in objids]
+            self.__tags[key] = res
+        return list(res)
+
+    def get_tag_ids(
+        self,
+        action,
+        objtype,
+        definition,
+        hash_from_permission: Callable,
+        resolve: Callable,
+        miss_ttl: float = 0.0,
+    ) -> List[int]:
+        """Get ids of the permission tags used to filter list queries. Tags are resolved to perm_tag ids the first time
+        and then reused. Tags without a perm_tag record, because no entity was tagged with them yet, are resolved again
+        when they are older than miss_ttl.
+
+        :param action: object action. Es. *, view, insert, update, delete, use
+        :param objtype: object type. Es. 'resource', 'service'
+        :param definition: object definition. Es. 'container.org.group.vm'
+        :param hash_from_permission: function used to hash (objdef, objid)
+        :param resolve: function that get the ids of the existing tags. Signature: def resolve(tags) -> {tag: id}
+        :param miss_ttl: seconds after which missing tags are resolved again [default=0.0]
+        :return: sorted list of perm_tag ids
+        """
+        key = (action, objtype, definition.lower())
+        item = self.__tag_ids.get(key, None)
+        now = time()
+        if item is None:
+            tags = self.get_tags(action, objtype, definition, hash_from_permission)
+            found = resolve(tags) if len(tags) > 0 else {}
+            item = (sorted(set(found.values())), [tag for tag in tags if tag not in found], now)
+            self.__tag_ids[key] = item
+        elif len(item[1]) > 0 and item[2] + miss_ttl <= now:
+            found = resolve(item[1])
+            ids = item[0]
+            if len(found) > 0:
+                ids = sorted(set(ids).union(found.values()))
+            item = (ids, [tag for tag in item[1] if tag not in found], now)
+            self.__tag_ids[key] = item
+        return list(item[0])
+
+
+class PermissionCache(object):
+    """Bounded in-process LRU cache of decoded and indexed identity permissions. Items are keyed by identity uid and
+    by the digest of the compressed permissions blob, so a change of the identity permissions in redis produce a new
+    key. Items older than ttl are considered expired like the identity they belong to.
+
+    :param size: max number of cached identities [default=1000]
+    :param ttl: item time to live in seconds [default=3600]
+    """
+
+    def __init__(self, size=1000, ttl=3600):
+        self.size = size
+        self.ttl = ttl
+        self.__items = OrderedDict()
+        self.__lock = RLock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "<PermissionCache id=%s size=%s ttl=%s>" % (id(self), self.size, self.ttl)
+
+    @staticmethod
+    def digest(compress_perms: Union[str, bytes]) -> str:
+        """Get digest of the compressed permissions blob
+
+        :param compress_perms: compressed and base64 encoded permissions
+        :return: digest
+        """
+        return md5(ensure_binary(compress_perms)).hexdigest()
+
+    def get(self, uid: str, digest: str) -> Union[PermissionIndex, None]:
+        """Get cached permission index
+
+        :param uid: identity id
+        :param digest: permissions blob digest
+        :return: PermissionIndex instance or None
+        """
+        with self.__lock:
+            item = self.__items.get(uid, None)
+            if item is None or item[0] != digest or item[1] < time():
+                if item is not None:
+                    self.__items.pop(uid, None)
+                self.misses += 1
+                return None
+            self.__items.move_to_end(uid)
+            self.hits += 1
+            return item[2]
+
+    def set(self, uid: str, digest: str, index: PermissionIndex):
+        """Add permission index to cache
+
+        :param uid: identity id
+        :param digest: permissions blob digest
+        :param index: PermissionIndex instance
+        """
+        if self.size <= 0:
+            return
+        with self.__lock:
+            self.__items[uid] = (digest, time() + self.ttl, index)
+            self.__items.move_to_end(uid)
+            while len(self.__items) > self.size:
+                self.__items.popitem(last=False)
+                self.evictions += 1
+
+    def remove(self, uid: str):
+        """Remove identity from cache
+
+        :param uid: identity id
+        """
+        with self.__lock:
+            self.__items.pop(uid, None)
+
+    def clear(self):
+        """Remove all the cached items"""
+        with self.__lock:
+            self.__items.clear()
+
+    def info(self) -> dict:
+        """Get cache statistics
+
+        :return: dict with size, items, hits, misses, evictions
+        """
+        return {
+            "size": self.size,
+            "ttl": self.ttl,
+            "items": len(self.__items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RolePermissionCache(object):
+    """Bounded in-process LRU cache of role permissions used to build the identity permissions at login. Items are
+    removed by the process that changes the role permissions, while the other processes read the change when the item
+    expires.
+
+    :param size: max number of cached roles [default=1000]
+    :param ttl: item time to live in seconds. Use 0 to disable the cache [default=60]
+    """
+
+    def __init__(self, size=1000, ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self.__items = OrderedDict()
+        self.__lock = RLock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return "<RolePermissionCache id=%s size=%s ttl=%s>" % (id(self), self.size, self.ttl)
+
+    def get(self, role_ids: List[int]) -> Tuple[Dict[int, list], List[int]]:
+        """Get cached role permissions
+
+        :param role_ids: list of role id
+        :return: tuple with dict like {role_id: perms} of the cached roles and list of the missing role ids
+        """
+        res = {}
+        misses = []
+        now = time()
+        with self.__lock:
+            for role_id in role_ids:
+                item = self.__items.get(role_id, None)
+                if item is None or item[0] < now:
+                    misses.append(role_id)
+                    continue
+                self.__items.move_to_end(role_id)
+                res[role_id] = item[1]
+            self.hits += len(res)
+            self.misses += len(misses)
+        return res, misses
+
+    def set(self, perms: Dict[int, list]):
+        """Add role permissions to cache
+
+        :param perms: dict like {role_id: perms}
+        """
+        if self.size <= 0 or self.ttl <= 0:
+            return
+        expire = time() + self.ttl
+        with self.__lock:
+            for role_id, role_perms in perms.items():
+                self.__items[role_id] = (expire, role_perms)
+                self.__items.move_to_end(role_id)
+            while len(self.__items) > self.size:
+                self.__items.popitem(last=False)
+
+    def remove(self, role_id: int = None):
+        """Remove role permissions from cache
+
+        :param role_id: role id. If None remove all the roles [optional]
+        """
+        with self.__lock:
+            if role_id is None:
+                self.__items.clear()
+            else:
+                self.__items.pop(role_id, None)
+        logger.debug("Remove role %s permissions from cache" % (role_id or "*"))
+
+    def info(self) -> dict:
+        """Get cache statistics
+
+        :return: dict with size, ttl, items, hits, misses
+        """
+        return {
+            "size": self.size,
+            "ttl": self.ttl,
+            "items": len(self.__items),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def encode_perms(perms: List[list]) -> bytes:
+    """Encode permissions in the compact columnar form of the permissions snapshots. Permissions are sorted by id and
+    objtype, objdef and action columns are stored as indexes of the list of their distinct values.
+
+    :param perms: list of [id, oid, objtype, objdef, objid, aid, action]
+    :return: zlib compressed json
+    """
+    values = ({}, {}, {})
+    columns = ([], [], [], [], [], [], [])
+    for perm in sorted(perms, key=lambda p: p[0]):
+        columns[0].append(perm[0])
+        columns[1].append(perm[1])
+        columns[2].append(values[0].setdefault(perm[2], len(values[0])))
+        columns[3].append(values[1].setdefault(perm[3], len(values[1])))
+        columns[4].append(perm[4])
+        columns[5].append(perm[5])
+        columns[6].append(values[2].setdefault(perm[6], len(values[2])))
+    data = {"version": 1, "values": [list(v) for v in values], "columns": columns}
+    return compress(ensure_binary(serializer_dumps(data)))
+
+
+def decode_perms(data: bytes) -> List[list]:
+    """Decode permissions encoded with encode_perms
+
+    :param data: zlib compressed json
+    :return: list of [id, oid, objtype, objdef, objid, aid, action]
+    """
+    data = serializer_loads(decompress(data))
+    objtypes, objdefs, actions = data["values"]
+    return [
+        [pid, oid, objtypes[objtype], objdefs[objdef], objid, aid, actions[action]]
+        for pid, oid, objtype, objdef, objid, aid, action in zip(*data["columns"])
+    ]
+
+
+def is_perms_snapshot(perms: Union[str, bytes]) -> bool:
+    """Check identity permissions reference a permissions snapshot. Legacy compressed permissions are base64 encoded
+    and never contain a colon.
+
+    :param perms: identity permissions
+    :return: True or False
+    """
+    return ensure_text(perms).startswith(SNAPSHOT_PREFIX)
+
+
+def get_perms_index() -> PermissionIndex:
+    """Get permission index of the current operation. Index is rebuilt when operation.perms was changed after the
+    index creation.
+
+    :return: PermissionIndex instance
+    """
+    perms = operation.perms
+    if perms is None:
+        perms = []
+    index: PermissionIndex = getattr(operation, "perms_index", None)
+    if index is None or not index.is_valid_for(perms):
+        index = PermissionIndex(perms)
+        operation.perms_index = index
+    return index
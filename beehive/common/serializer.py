@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import json
+import re
+from logging import getLogger
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = getLogger(__name__)
+
+
+def default(obj: Any) -> Any:
+    """Convert objects not supported by json. Like ComplexEncoder, Decimal, datetime and every other object are
+    converted to string.
+
+    :param obj: object to convert
+    :return: converted object
+    """
+    return str(obj)
+
+
+class JsonSerializer(object):
+    """Json serializer based on python json module"""
+
+    name = "json"
+
+    def dumps(self, data: Any) -> str:
+        """Serialize data
+
+        :param data: data to serialize
+        :return: json string
+        """
+        return json.dumps(data, default=default)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Deserialize data
+
+        :param data: json string or bytes
+        :return: deserialized data
+        :raises ValueError: if data is not a valid json
+        """
+        return json.loads(data)
+
+
+class OrjsonSerializer(JsonSerializer):
+    """Json serializer based on orjson. Datetime are passed to default so they are rendered like with the python json
+    module. Data that orjson can not serialize, like integers bigger than 64 bit, are serialized with the python json
+    module. Orjson parses integers bigger than 64 bit as float, so data that contains a number of 19 or more digits is
+    deserialized with the python json module.
+    """
+
+    name = "orjson"
+
+    # numbers that can overflow a 64 bit integer
+    big_number = re.compile(r"\d{19}")
+    big_number_bytes = re.compile(rb"\d{19}")
+
+    def __init__(self):
+        self.option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, data: Any) -> str:
+        try:
+            return orjson.dumps(data, default=default, option=self.option).decode("utf-8")
+        except orjson.JSONEncodeError:
+            return JsonSerializer.dumps(self, data)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        pattern = self.big_number_bytes if isinstance(data, (bytes, bytearray)) else self.big_number
+        if pattern.search(data) is not None:
+            return JsonSerializer.loads(self, data)
+        return orjson.loads(data)
+
+
+def get_serializer(name: str = "auto") -> JsonSerializer:
+    """Get serializer instance
+
+    :param name: serializer name. Can be auto, orjson, json. With auto orjson is used when installed [default=auto]
+    :return: JsonSerializer instance
+    """
+    if name in ["auto", "orjson"] and orjson is not None:
+        return OrjsonSerializer()
+    if name == "orjson":
+        logger.warning("orjson is not installed. Use json serializer")
+    return JsonSerializer()
+
+
+#: current serializer
+serializer: JsonSerializer = get_serializer()
+
+
+def set_serializer(name: str = "auto") -> JsonSerializer:
+    """Set the serializer used by dumps and loads
+
+    :param name: serializer name. Can be auto, orjson, json [default=auto]
+    :return: JsonSerializer instance
+    """
+    global serializer
+    serializer = get_serializer(name)
+    logger.info("Use json serializer: %s" % serializer.name)
+    return serializer
+
+
+def dumps(data: Any) -> str:
+    """Serialize data with the current serializer
+
+    :param data: data to serialize
+    :return: json string
+    """
+    return serializer.dumps(data)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Deserialize data with the current serializer
+
+    :param data: json string or bytes
+    :return: deserialized data
+    :raises ValueError: if data is not a valid json
+    """
+    return serializer.loads(data)
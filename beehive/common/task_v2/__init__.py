@@ -419,7 +419,7 @@ class BaseTask(Task):
         except ApiManagerError as ex:
             raise TaskError(ex.value)
 
-    def wait_task(self, subsystem, prefix, taskid, timeout=60, delta=3, maxtime=600, trace=None):
+    def wait_task(self, subsystem, prefix, taskid, timeout=60, delta=3, maxtime=600, trace=None, wait=None):
         try:
             if self.controller.api_client is not None:
                 self.controller.api_client.admin_wait_task(
@@ -430,6 +430,7 @@ class BaseTask(Task):
                     delta=delta,
                     maxtime=maxtime,
                     trace=trace,
+                    wait=wait,
                 )
             else:
                 self.logger.warning("Api client is not configured")
@@ -12,15 +12,76 @@ from beehive.common.model import (
     SchedulerStep,
 )
 from datetime import datetime, timedelta
+from time import time
+from typing import Dict
+import ujson as json
 from celery.utils.log import get_task_logger
 from celery.signals import task_prerun
 
 
 logger = get_task_logger(__name__)
 
+#: prefix of the redis list that contains task progress traces when they are not stored in database
+TRACE_PREFIX = "celery-task-trace-"
+
+#: prefix of the redis list where task end status is pushed for the clients waiting for it
+TASK_END_PREFIX = "celery-task-end-"
+
+#: prefix of the redis hash that mirrors task status read by the task status api
+TASK_STATUS_PREFIX = "celery-task-status-"
+
+
+class TaskBuffer(object):
+    """Write-behind buffer of a running task. Coalesces task and step run_time updates and collects the traces to
+    insert.
+
+    :param task_id: task id
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.run_time = None
+        self.step_run_times = {}
+        self.traces = []
+        self.flush_time = time()
+
+    def __repr__(self):
+        return "<TaskBuffer task=%s steps=%s traces=%s>" % (self.task_id, len(self.step_run_times), len(self.traces))
+
+    def add_trace(self, step_id, message, level):
+        """Add a trace
+
+        :param step_id: step id
+        :param message: trace message
+        :param level: trace level
+        """
+        self.traces.append(
+            {
+                "task_id": self.task_id,
+                "step_id": step_id,
+                "message": message,
+                "level": level,
+                "date": datetime.today(),
+            }
+        )
+
+    def is_empty(self) -> bool:
+        return self.run_time is None and len(self.step_run_times) == 0 and len(self.traces) == 0
+
+    def is_full(self, size: int, interval: float) -> bool:
+        """Check buffer must be flushed
+
+        :param size: max number of traces
+        :param interval: max seconds from the last flush
+        :return: True if buffer must be flushed
+        """
+        return len(self.traces) >= size or time() - self.flush_time >= interval
+
 
 class TaskResult(object):
-    """Utility class used to manage task, step and trace in database"""
+    """Utility class used to manage task, step and trace in database. Step progress is kept in a write-behind buffer
+    and written at step boundaries, on failure, at task end or when the buffer is full.
+    """
 
     def __init__(self, task):
         self.manager = AbstractDbManager()
@@ -30,6 +91,30 @@ class TaskResult(object):
         self.stop_time = 0
         self.start_time = 0
 
+        # write-behind buffers by task id and names of the running steps
+        self.buffers: Dict[str, TaskBuffer] = {}
+        self.step_names: Dict[str, str] = {}
+
+    @property
+    def api_manager(self):
+        return getattr(getattr(self.task, "app", None), "api_manager", None)
+
+    @property
+    def buffer_size(self) -> int:
+        return getattr(self.api_manager, "task_trace_buffer_size", 50)
+
+    @property
+    def flush_interval(self) -> float:
+        return getattr(self.api_manager, "task_trace_flush_interval", 5.0)
+
+    @property
+    def progress_trace(self) -> str:
+        return getattr(self.api_manager, "task_progress_trace", "db")
+
+    @property
+    def expire(self) -> int:
+        return int(float(self.api_manager.params.get("expire", 86400)))
+
     def elapsed(self):
         if isinstance(self.start_time, datetime) and isinstance(self.stop_time, datetime):
             return round(
@@ -100,6 +185,63 @@ class TaskResult(object):
         entity = self.manager.add_entity(SchedulerTrace, task_id, step_id, message, level)
         # logger.debug2('add new db task trace %s record' % entity)
 
+    @transaction
+    def flush(self, task_id):
+        """Write buffered run_time updates and traces of a task in a single transaction
+
+        :param task_id: task id
+        :return:
+        """
+        buffer = self.buffers.pop(task_id, None)
+        if buffer is None or buffer.is_empty():
+            return
+
+        if len(buffer.traces) > 0:
+            self.manager.get_session().execute(SchedulerTrace.__table__.insert(), buffer.traces)
+        for step_id, run_time in buffer.step_run_times.items():
+            self.manager.update_entity(SchedulerStep, uuid=step_id, run_time=run_time)
+        if buffer.run_time is not None:
+            self.manager.update_entity(SchedulerTask, uuid=task_id, run_time=buffer.run_time)
+        logger.debug2("flush task buffer %s" % buffer)
+
+    def trace_redis(self, task_id, step_id, message, level):
+        """Add a task trace in redis
+
+        :param task_id: task id
+        :param step_id: step id
+        :param message: trace message
+        :param level: trace level
+        :return:
+        """
+        trace = {
+            "step": step_id,
+            "step_name": self.step_names.get(step_id, None),
+            "message": message,
+            "level": level,
+            "date": datetime.today().isoformat(),
+        }
+        key = TRACE_PREFIX + task_id
+        self.task.redis.pipeline().rpush(key, json.dumps(trace)).expire(key, self.expire).execute()
+
+    def set_status(self, task_id, status):
+        """Mirror task status in a redis hash read by the task status api. When task is ended status is also pushed
+        in the task end list to wake up the clients waiting for the task.
+
+        :param task_id: task id
+        :param status: task status
+        :return:
+        """
+        key = TASK_STATUS_PREFIX + task_id
+        try:
+            pipe = self.task.redis.pipeline()
+            pipe.hset(key, mapping={"status": status, "time": time()}).expire(key, self.expire)
+            if status in [SchedulerState.SUCCESS, SchedulerState.FAILURE]:
+                end_key = TASK_END_PREFIX + task_id
+                pipe.rpush(end_key, status).expire(end_key, self.expire)
+            pipe.execute()
+        except Exception as ex:
+            logger.warning("Task %s status can not be set in redis: %s" % (task_id, ex))
+
     @transaction
     def step_add(self, task_id, name):
         """Add a step
@@ -108,15 +250,16 @@ class TaskResult(object):
         :param name: step name
         :return:
         """
+        self.flush(task_id)
         entity = self.manager.add_entity(SchedulerStep, task_id, name)
+        self.step_names[entity.uuid] = name
         logger.debug2("add new db task step %s record" % entity)
         logger.info("add new step %s.%s" % (name, entity.uuid))
         self.trace_add(task_id, entity.uuid, "start step", "INFO")
         return entity.uuid
 
-    @transaction
     def step_progress(self, task_id, step_id, msg=None):
-        """Update a step
+        """Update a step. Step and task run_time and progress trace are buffered
 
         :param task_id: task id
         :param step_id: step id
@@ -124,18 +267,33 @@ class TaskResult(object):
         :return:
         """
         run_time = datetime.today()
-        step = self.manager.get_entity(SchedulerStep, step_id)
+        buffer = self.buffers.get(task_id, None)
+        if buffer is None:
+            buffer = self.buffers[task_id] = TaskBuffer(task_id)
+        buffer.run_time = run_time
+        buffer.step_run_times[step_id] = run_time
 
-        entity = self.manager.update_entity(SchedulerStep, uuid=step_id, run_time=run_time)
-        logger.debug2("update task step %s record" % entity)
+        logger.info("step %s.%s progress: %s" % (self.step_names.get(step_id, None), step_id, msg))
 
-        entity = self.manager.update_entity(SchedulerTask, uuid=task_id, run_time=run_time)
-        logger.debug2("update db task %s record" % entity)
+        if msg is not None:
+            if self.progress_trace == "redis":
+                self.trace_redis(task_id, step_id, msg, "INFO")
+            else:
+                buffer.add_trace(step_id, msg, "INFO")
 
-        logger.info("step %s.%s progress: %s" % (step.name, step_id, msg))
+        if buffer.is_full(self.buffer_size, self.flush_interval):
+            self.flush(task_id)
 
-        if msg is not None:
-            self.trace_add(task_id, step_id, msg, "INFO")
+    def get_step_name(self, step_id):
+        """Get name of a running step
+
+        :param step_id: step id
+        :return: step name
+        """
+        name = self.step_names.pop(step_id, None)
+        if name is None:
+            name = self.manager.get_entity(SchedulerStep, step_id).name
+        return name
 
     @transaction
     def step_success(self, task_id, step_id, result):
@@ -146,9 +304,10 @@ class TaskResult(object):
         :param result: step result
         :return:
         """
+        self.flush(task_id)
         stop_time = datetime.today()
         self.stop_time = stop_time
-        entity = self.manager.get_entity(SchedulerStep, step_id)
+        step_name = self.get_step_name(step_id)
         entity_id = self.manager.update_entity(
             SchedulerStep,
             uuid=step_id,
@@ -158,9 +317,8 @@ class TaskResult(object):
             run_time=stop_time,
         )
         logger.debug2("update task step %s record" % entity_id)
-        logger.info("step %s.%s success" % (entity.name, step_id))
+        logger.info("step %s.%s success" % (step_name, step_id))
         self.trace_add(task_id, step_id, "end step with result: %s" % result, "INFO")
-        step_name = entity.name
         self.send_event(step_name, "STEP", self.elapsed(), ex=None)
 
     @transaction
@@ -172,9 +330,10 @@ class TaskResult(object):
         :param error: step error
         :return:
         """
+        self.flush(task_id)
         stop_time = datetime.today()
         self.stop_time = stop_time
-        entity = self.manager.get_entity(SchedulerStep, step_id)
+        step_name = self.get_step_name(step_id)
         entity_id = self.manager.update_entity(
             SchedulerStep,
             uuid=step_id,
@@ -183,9 +342,8 @@ class TaskResult(object):
             result=False,
         )
         logger.debug2("update task step %s record" % entity_id)
-        logger.error("step %s.%s error: %s" % (entity.name, step_id, error), exc_info=True)
+        logger.error("step %s.%s error: %s" % (step_name, step_id, error), exc_info=True)
         self.trace_add(task_id, step_id, "step error: %s" % error, "ERROR")
-        step_name = entity.name
         self.send_event(step_name, "STEP", self.elapsed(), ex=error)
 
     @query
@@ -202,13 +360,17 @@ class TaskResult(object):
         return False
         # raise Exception('task %s already exists' % task_id)
 
-    @transaction
     def task_prerun(self, **args):
-        """Dispatched when a task pre run.
+        """Dispatched when a task pre run. Task status is mirrored when task record is committed.
 
         :param args.task: celery task
         :param args.task_id: celery task id
         """
+        self.__task_prerun(**args)
+        self.set_status(args.get("task_id"), SchedulerState.PENDING)
+
+    @transaction
+    def __task_prerun(self, **args):
         task = args.get("task")
         task_id = args.get("task_id")
 
@@ -235,12 +397,16 @@ class TaskResult(object):
             )
             logger.debug2("update db task %s record" % entity)
 
-    @transaction
     def task_start(self, task):
-        """Dispatched when a task start.
+        """Dispatched when a task start. Task status is mirrored when task record is committed.
 
         :param task: celery task
         """
+        self.__task_start(task)
+        self.set_status(task.request.id, SchedulerState.STARTED)
+
+    @transaction
+    def __task_start(self, task):
         task_id = task.request.id
         vargs = task.argsrepr
         kwargs = task.kwargsrepr
@@ -271,14 +437,19 @@ class TaskResult(object):
         self.trace_add(task_id, None, "start task", "INFO")
         self.send_event(self.task.name, "STARTED", 0, ex=None)
 
-    @transaction
     def task_success(self, task, result):
-        """Dispatched when a task success.
+        """Dispatched when a task success. Task end is notified when task record is committed.
 
         :param task: celery task
         :param result: task result
         """
+        self.__task_success(task, result)
+        self.set_status(task.request.id, SchedulerState.SUCCESS)
+
+    @transaction
+    def __task_success(self, task, result):
         task_id = task.request.id
+        self.flush(task_id)
 
         # set status
         status = SchedulerState.SUCCESS
@@ -301,14 +472,19 @@ class TaskResult(object):
         self.trace_add(task_id, None, "end task with result: %s" % result, "INFO")
         self.send_event(self.task.name, "SUCCESS", self.elapsed(), ex=None)
 
-    @transaction
     def task_failure(self, task, err):
-        """Dispatched when a task fails.
+        """Dispatched when a task fails. Task end is notified when task record is committed.
 
         :param task: celery task
         :param err: error message
         """
+        self.__task_failure(task, err)
+        self.set_status(task.request.id, SchedulerState.FAILURE)
+
+    @transaction
+    def __task_failure(self, task, err):
         task_id = task.request.id
+        self.flush(task_id)
 
         # set status
         status = SchedulerState.FAILURE
@@ -362,6 +538,6 @@ def task_prerun(**args):
         if open_new_session is True:
             task.get_session()
         operation.transaction = None
-        TaskResult(None).task_prerun(**args)
+        TaskResult(task).task_prerun(**args)
         if open_new_session is True:
             task.release_session()
@@ -0,0 +1,23 @@
+/*
+  SPDX-License-Identifier: EUPL-1.2
+
+  (C) Copyright 2018-2024 CSI-Piemonte
+*/
+
+/* indexes used by task retention purge and by task steps and trace queries */
+CREATE INDEX idx_scheduler_task_name_start_time ON scheduler_task (name, start_time);
+CREATE INDEX idx_scheduler_step_task_id_start_time ON scheduler_step (task_id, start_time);
+CREATE INDEX idx_scheduler_trace_task_id_date ON scheduler_trace (task_id, date);
+CREATE INDEX ix_scheduler_trace_date ON scheduler_trace (date);
+
+/*
+  scheduler_trace can be partitioned by month on date. Partition column must be part of every unique key, so primary
+  key must be extended with date before partitioning. Expired partitions can then be dropped instead of purged.
+
+ALTER TABLE scheduler_trace DROP PRIMARY KEY, ADD PRIMARY KEY (id, date);
+ALTER TABLE scheduler_trace PARTITION BY RANGE COLUMNS(date) (
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+*/
@@ -306,10 +306,11 @@ class Objects(AuthObject):
             return [], 0
 
     @trace(op="insert")
-    def add_objects(self, objs):
+    def add_objects(self, objs, skip_existing=False):
         """Add a list of system objects with all the permission related to available action.
 
         :param objs: list of dict like {'subsystem':.., 'type':.., 'objid':.., 'desc':..}
+        :param skip_existing: if True skip objects that already exist, otherwise raise an error [default=False]
         :return: list of uuid
         :rtype: bool
         :raises ApiManagerError: raise :class:`ApiManagerError`
@@ -323,11 +324,17 @@ class Objects(AuthObject):
 
             # create objects
             data = []
+            obj_types = {}
             for obj in objs:
-                obj_type, total = self.manager.get_object_type(objtype=obj["subsystem"], objdef=obj["type"])
-                data.append((obj_type[0], obj["objid"], obj["desc"]))
+                key = (obj["subsystem"], obj["type"])
+                if key not in obj_types:
+                    obj_types[key] = self.manager.get_object_type(objtype=key[0], objdef=key[1])[0][0]
+                data.append((obj_types[key], obj["objid"], obj["desc"]))
 
-            res = self.manager.add_object(data, actions)
+            if skip_existing is True:
+                res = self.manager.add_objects(data, actions)
+            else:
+                res = self.manager.add_object(data, actions)
             self.logger.debug("Add objects: %s" % objs)
             return [i.id for i in res]
         except (QueryError, TransactionError) as ex:
@@ -3,12 +3,16 @@
 # (C) Copyright 2018-2024 CSI-Piemonte
 
 from re import match
+from binascii import b2a_base64
 from datetime import datetime, timedelta
+from zlib import compress
+import ujson as json
 from beecell.simple import get_value, str2bool, AttribException, format_date
 from beehive.common.apimanager import (
     ApiView,
     ApiManagerError,
     PaginatedRequestQuerySchema,
+    CursorPaginatedRequestQuerySchema,
     PaginatedResponseSchema,
     ApiObjectResponseSchema,
     SwaggerApiView,
@@ -25,6 +29,7 @@ from typing import TYPE_CHECKING
 
 from beehive.module.auth.controller import AuthController
 from beecell.auth import IdentityMgr, identity_mgr_factory, AuthError
+from beehive.common.perms import is_perms_snapshot
 from beehive.module.auth.controller.user import User
 
 
@@ -230,7 +235,7 @@ class DeleteToken(SwaggerApiView):
         return resp, 204
 
 
-class ListUsersRequestSchema(PaginatedRequestQuerySchema):
+class ListUsersRequestSchema(CursorPaginatedRequestQuerySchema):
     group = fields.String(context="query")
     role = fields.String(context="query")
     active = fields.Boolean(context="query")
@@ -250,6 +255,12 @@ class ListUsersRequestSchema(PaginatedRequestQuerySchema):
         data_key="perms.N",
         description="permissions list",
     )
+    stream = fields.Boolean(
+        required=False,
+        missing=False,
+        context="query",
+        description="if True users are streamed to the client while they are read from db. Use with large pages",
+    )
 
 
 class ListUnitResponseDateSchema(ApiObjectResponseDateSchema):
@@ -281,6 +292,8 @@ class ListUsers(SwaggerApiView):
 
     def get(self, controller: AuthController, data, *args, **kwargs):
         objs, total = controller.get_users(**data)
+        if data.get("stream") is True:
+            return self.stream_paginated_response(controller, objs, "users", total, **data)
 
         # res = [r.info() for r in objs]
         res = []
@@ -288,7 +301,7 @@ class ListUsers(SwaggerApiView):
             user: User = r
             res.append(user.info())
 
-        return self.format_paginated_response(res, "users", total, **data)
+        return self.format_paginated_response(res, "users", total, objs=objs, **data)
 
 
 class GetUserParamsResponseSchema(ApiObjectResponseSchema):
@@ -765,6 +778,11 @@ class UseRole(SwaggerApiView):
             raise ApiManagerError("Role not found", code=404)
         perms = controller.manager.get_role_permissions_by_role_id(role.oid)
         try:
+            # identity manager compares role permissions with the compressed identity permissions
+            user = idmgr.identity["user"]
+            if is_perms_snapshot(user["perms"]):
+                api_manager = controller.api_manager
+                user["perms"] = b2a_base64(compress(json.dumps(api_manager.get_perms(user["perms"])).encode("utf-8")))
             if len(perms) > 0:
                 idmgr.set_perms(perms, store=True)
                 return {"done": True}
@@ -1309,6 +1327,11 @@ class CreateObjectParamRequestSchema(Schema):
 
 class CreateObjectRequestSchema(Schema):
     objects = fields.Nested(CreateObjectParamRequestSchema, many=True)
+    skip_existing = fields.Boolean(
+        required=False,
+        missing=False,
+        description="if true skip objects that already exist instead of returning an error",
+    )
 
 
 class CreateObjectBodyRequestSchema(Schema):
@@ -1334,7 +1357,7 @@ class CreateObject(SwaggerApiView):
         Create object
         Call this api to create a object
         """
-        resp = controller.objects.add_objects(data.get("objects"))
+        resp = controller.objects.add_objects(data.get("objects"), skip_existing=data.get("skip_existing"))
         return {"ids": resp}, 201
 
 
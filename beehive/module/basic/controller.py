@@ -38,6 +38,9 @@ class BasicController(BaseAuthController):
                 "id": self.module.api_manager.app_id,
                 "hostname": self.module.api_manager.server_name,
                 "uri": self.module.api_manager.app_uri,
+                "perms_cache": self.module.api_manager.perms_cache.info(),
+                "audit_shipper": self.module.api_manager.get_audit_shipper_info(),
+                "event_producer": self.module.api_manager.get_event_producer_info(),
             }
             self.logger.debug("Ping server: %s" % truncate(res))
             return res
@@ -55,6 +58,9 @@ class BasicController(BaseAuthController):
                 "name": self.module.api_manager.app_name,
                 "id": self.module.api_manager.app_id,
                 "modules": {k: v.info() for k, v in self.module.api_manager.modules.items()},
+                "perms_cache": self.module.api_manager.perms_cache.info(),
+                "audit_shipper": self.module.api_manager.get_audit_shipper_info(),
+                "event_producer": self.module.api_manager.get_event_producer_info(),
             }
             self.logger.debug("Get server info: %s" % truncate(res))
             return res
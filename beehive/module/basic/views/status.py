@@ -8,6 +8,41 @@ from marshmallow import fields
 from marshmallow.schema import Schema
 
 
+class ServerPermsCacheResponseSchema(Schema):
+    size = fields.Integer(required=True, example=1000, description="max number of cached identities")
+    ttl = fields.Integer(required=True, example=3600, description="cached item time to live")
+    items = fields.Integer(required=True, example=10, description="number of cached identities")
+    hits = fields.Integer(required=True, example=100, description="cache hits")
+    misses = fields.Integer(required=True, example=10, description="cache misses")
+    evictions = fields.Integer(required=True, example=0, description="cache evictions")
+
+
+class ServerAuditShipperResponseSchema(Schema):
+    queue_size = fields.Integer(required=True, example=10000, description="max number of queued audit")
+    batch_size = fields.Integer(required=True, example=500, description="max number of audit sent in a bulk request")
+    flush_interval = fields.Float(required=True, example=1.0, description="max seconds an audit waits in queue")
+    drop_policy = fields.String(required=True, example="drop_new", description="queue full policy")
+    pending = fields.Integer(required=True, example=0, description="number of audit waiting in queue")
+    queued = fields.Integer(required=True, example=100, description="number of queued audit")
+    sent = fields.Integer(required=True, example=100, description="number of sent audit")
+    failed = fields.Integer(required=True, example=0, description="number of audit rejected by elasticsearch")
+    dropped = fields.Integer(required=True, example=0, description="number of audit dropped with queue full")
+    batches = fields.Integer(required=True, example=1, description="number of sent bulk requests")
+
+
+class ServerEventProducerResponseSchema(Schema):
+    buffered = fields.Boolean(required=True, example=True, description="if True events are published in batches")
+    queue_size = fields.Integer(required=True, allow_none=True, example=10000, description="max queued events")
+    batch_size = fields.Integer(required=True, allow_none=True, example=100, description="max events in batch")
+    max_latency = fields.Float(required=True, allow_none=True, example=0.5, description="max seconds an event waits")
+    pending = fields.Integer(required=True, example=0, description="number of events waiting in queue")
+    queued = fields.Integer(required=True, example=100, description="number of queued events")
+    sent = fields.Integer(required=True, example=100, description="number of published events")
+    failed = fields.Integer(required=True, example=0, description="number of events that can not be published")
+    dropped = fields.Integer(required=True, example=0, description="number of events dropped with queue full")
+    batches = fields.Integer(required=True, example=1, description="number of published batches")
+
+
 class ServerPingResponseSchema(Schema):
     name = fields.String(required=True, example="beehive", description="server instance name")
     id = fields.String(required=True, example="auth", description="server instance id")
@@ -17,6 +52,21 @@ class ServerPingResponseSchema(Schema):
         example="http://localhost:6060",
         description="server instance uri",
     )
+    perms_cache = fields.Nested(
+        ServerPermsCacheResponseSchema, required=False, description="identity permissions cache statistics"
+    )
+    audit_shipper = fields.Nested(
+        ServerAuditShipperResponseSchema,
+        required=False,
+        allow_none=True,
+        description="background audit shipper statistics",
+    )
+    event_producer = fields.Nested(
+        ServerEventProducerResponseSchema,
+        required=False,
+        allow_none=True,
+        description="event producer statistics",
+    )
 
 
 class ServerPing(SwaggerApiView):
@@ -37,6 +87,21 @@ class ServerInfoResponseSchema(Schema):
     name = fields.String(required=True, example="beehive", description="server instance name")
     id = fields.String(required=True, example="auth", description="server instance id")
     modules = fields.Dict(required=True, example={}, description="server modules")
+    perms_cache = fields.Nested(
+        ServerPermsCacheResponseSchema, required=False, description="identity permissions cache statistics"
+    )
+    audit_shipper = fields.Nested(
+        ServerAuditShipperResponseSchema,
+        required=False,
+        allow_none=True,
+        description="background audit shipper statistics",
+    )
+    event_producer = fields.Nested(
+        ServerEventProducerResponseSchema,
+        required=False,
+        allow_none=True,
+        description="event producer statistics",
+    )
 
 
 class ServerInfo(SwaggerApiView):
@@ -53,6 +118,43 @@ class ServerInfo(SwaggerApiView):
         return resp
 
 
+class ServerMetricsRequestSchema(Schema):
+    prefix = fields.String(
+        required=False,
+        example="api.phase.",
+        context="query",
+        description="return only histograms whose name starts with prefix. Ex. api., transaction., query.",
+    )
+
+
+class ServerMetricsResponseSchema(Schema):
+    name = fields.String(required=True, example="beehive", description="server instance name")
+    id = fields.String(required=True, example="auth", description="server instance id")
+    hostname = fields.String(required=True, example="tst-beehive", description="server instance host name")
+    histograms = fields.Dict(
+        required=True,
+        example={"api.phase.handler": {"count": 10, "sum": 0.5, "p50": 0.05, "buckets": {"0.05": 6, "+Inf": 10}}},
+        description="timing histograms by name",
+    )
+
+
+class ServerMetrics(SwaggerApiView):
+    summary = "Server metrics api"
+    description = "Server in-process timing histograms of api request phases, transactions and queries"
+    tags = ["base"]
+    definitions = {
+        "ServerMetricsRequestSchema": ServerMetricsRequestSchema,
+        "ServerMetricsResponseSchema": ServerMetricsResponseSchema,
+    }
+    parameters = SwaggerHelper().get_parameters(ServerMetricsRequestSchema)
+    parameters_schema = ServerMetricsRequestSchema
+    responses = SwaggerApiView.setResponses({200: {"description": "success", "schema": ServerMetricsResponseSchema}})
+
+    def get(self, controller, data, *args, **kwargs):
+        resp = controller.get_metrics(prefix=data.get("prefix", None))
+        return resp
+
+
 class ServerVersionResponseSchema(Schema):
     name = fields.String(required=True, example="beehive", description="package name")
     version = fields.String(required=True, example="auth", description="package version")
@@ -174,6 +276,7 @@ class MaintenanceSet(SwaggerApiView):
 
         key = "cmp.%s.%s" % (controller.module.name, http_method)
         controller.module.redis_manager.set(key, enabled)
+        controller.module.api_manager.maintenance_cache.invalidate(key)
 
         return {"MaintenanceSetResponse": {"__xmlns": self.xmlns, "ok": True}}
 
@@ -194,6 +297,7 @@ class StatusAPI(ApiView):
                 {"secure": False},
             ),
             ("%s/versions" % module.base_path, "GET", ServerVersion, {"secure": False}),
+            ("%s/metrics" % module.base_path, "GET", ServerMetrics, {}),
             ("%s%s" % (module.base_path, StatusAPI.MAINTENANCE_URI), "GET", MaintenanceList, {"secure": False}),
             ("%s%s" % (module.base_path, StatusAPI.MAINTENANCE_URI), "POST", MaintenanceSet, {}),
         ]
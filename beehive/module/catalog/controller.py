@@ -254,6 +254,46 @@ class Catalog(AuthObject):
             self.logger.error(ex, exc_info=1)
             raise ApiManagerError(ex, code=ex.code)
 
+    @trace(op="insert")
+    def add_endpoints(self, endpoints):
+        """Add many endpoints. Authorization objects and permission tags of all the endpoints are registered in bulk.
+
+        :param endpoints: list of dict like {'name':.., 'desc':.., 'service':.., 'uri':.., 'active':..}
+        :return: list of endpoint uuid
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        :raises ApiAuthorizationError: raise :class:`ApiAuthorizationError`
+        """
+        # check authorization
+        self.controller.check_authorization(CatalogEndpoint.objtype, CatalogEndpoint.objdef, self.objid, "insert")
+
+        try:
+            res = []
+            objs = []
+            for endpoint in endpoints:
+                # create catalog endpoint reference
+                objid = "%s//%s" % (self.objid, id_gen())
+                desc = endpoint.get("desc")
+                record = self.manager.add_endpoint(
+                    objid,
+                    endpoint.get("name"),
+                    endpoint.get("service"),
+                    desc,
+                    self.oid,
+                    endpoint.get("uri"),
+                    endpoint.get("active", True),
+                )
+                objs.append((CatalogEndpoint, objid.split("//"), record.id, desc))
+                res.append(record.uuid)
+
+            # create objects and permissions
+            self.controller.register_objects(objs)
+
+            self.logger.debug("Add catalog endpoints: %s" % truncate(res))
+            return res
+        except (QueryError, TransactionError, ModelError) as ex:
+            self.logger.error(ex, exc_info=1)
+            raise ApiManagerError(ex, code=ex.code)
+
 
 class CatalogEndpoint(AuthObject):
     """Catalog endpoint class"""
@@ -3,7 +3,9 @@
 # (C) Copyright 2018-2024 CSI-Piemonte
 
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
+from beehive.common.data import transaction
 from beehive.common.task_v2.manager import task_manager
 from beehive.common.task_v2 import BaseTask, task_step
 from beehive.module.catalog.controller import Catalog
@@ -16,8 +18,13 @@ class RefreshCatalogTask(BaseTask):
     entity_class = Catalog
 
     """Refresh catalog task
+
+    :param ping_workers: max number of endpoints pinged concurrently [default=20]
     """
 
+    #: max number of endpoints pinged concurrently
+    ping_workers = 20
+
     def __init__(self, *args, **kwargs):
         super(RefreshCatalogTask, self).__init__(*args, **kwargs)
 
@@ -50,6 +57,20 @@ class RefreshCatalogTask(BaseTask):
         logger.debug("Ping endpoint %s: %s" % (uri, res))
         return res
 
+    def ping_endpoints(self, endpoints, workers=None):
+        """Ping endpoints concurrently
+
+        :param endpoints: list of CatalogEndpoint instance
+        :param workers: max number of concurrent pings. If None use ping_workers [optional]
+        :return: list of ping result, one for every endpoint
+        """
+        if len(endpoints) == 0:
+            return []
+        if workers is None:
+            workers = self.ping_workers
+        with ThreadPoolExecutor(max_workers=min(workers, len(endpoints))) as executor:
+            return list(executor.map(self.ping_endpoint, endpoints))
+
     def remove_endpoint(self, endpoint):
         """Remove endpoint
 
@@ -59,6 +80,15 @@ class RefreshCatalogTask(BaseTask):
         logger.debug("Delete endpoint: %s" % endpoint.uuid)
         return res
 
+    @transaction
+    def remove_endpoints(self, endpoints):
+        """Remove endpoints in one transaction
+
+        :param endpoints: list of CatalogEndpoint instance
+        """
+        for endpoint in endpoints:
+            self.remove_endpoint(endpoint)
+
     @staticmethod
     @task_step()
     def check_endpoints_step(task, step_id, params, *args, **kvargs):
@@ -71,29 +101,17 @@ class RefreshCatalogTask(BaseTask):
         """
         endpoints = task.get_endpoints()
 
-        for endpoint in endpoints:
-            RefreshCatalogTask.check_endpoint_step(task, step_id, params, endpoint)
+        pings = task.ping_endpoints(endpoints, workers=params.get("ping_workers"))
+        dead = [endpoint for endpoint, ping in zip(endpoints, pings) if ping is False]
+        if len(dead) > 0:
+            task.remove_endpoints(dead)
+        task.progress(
+            step_id,
+            msg="ping %s endpoints - remove %s dead endpoints: %s"
+            % (len(endpoints), len(dead), ", ".join([e.name for e in dead])),
+        )
 
         return True, params
 
-    @staticmethod
-    @task_step()
-    def check_endpoint_step(task, step_id, params, endpoint, *args, **kvargs):
-        """Check endpoint step
-
-        :param task: parent celery task
-        :param dict params: step params
-        :param str step_id: step id
-        :param str endpoint: endpoint instance
-        :return: res, params
-        """
-        ping = task.ping_endpoint(endpoint)
-        task.progress(step_id, msg="ping endpoint %s" % endpoint.name)
-        if ping is False:
-            task.remove_endpoint(endpoint)
-            task.progress(step_id, msg="remove endpoint %s" % endpoint.name)
-
-        return ping, params
-
 
 task_manager.tasks.register(RefreshCatalogTask())
@@ -255,6 +255,7 @@ class BaseEvent(object):
         self.logger = logging.getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
 
         self.event = event
+        self.model = event
 
     def info(self):
         """Get event info"""
@@ -3,6 +3,7 @@
 # (C) Copyright 2018-2024 CSI-Piemonte
 
 import logging
+from time import time, sleep
 from datetime import datetime
 from copy import deepcopy
 from re import match
@@ -34,6 +35,128 @@ class EventConsumerError(Exception):
     pass
 
 
+class LogstashSender(object):
+    """Long lived logstash sender. Connection is opened on the first send and reused for the next ones. When a send
+    fails connection is closed and a new connection is not attempted before the backoff is elapsed. Backoff doubles
+    at every consecutive failure up to max_backoff and is reset by a successful send.
+
+    :param host: logstash host
+    :param port: logstash port
+    :param keyfile: client private key file
+    :param certfile: client certificate file
+    :param ca_certs: ca certificate file
+    :param timeout: socket timeout [default=30]
+    :param backoff: first reconnect backoff in seconds [default=1.0]
+    :param max_backoff: max reconnect backoff in seconds [default=60.0]
+    """
+
+    def __init__(self, host, port, keyfile, certfile, ca_certs, timeout=30, backoff=1.0, max_backoff=60.0):
+        self.logger = logging.getLogger(self.__class__.__module__ + "." + self.__class__.__name__)
+
+        self.host = host
+        self.port = port
+        self.keyfile = keyfile
+        self.certfile = certfile
+        self.ca_certs = ca_certs
+        self.timeout = timeout
+        self.min_backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.client = None
+        self.backoff = 0
+        self.retry_time = 0
+
+        # counters
+        self.connects = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.sent = 0
+        self.batches = 0
+
+    def __repr__(self):
+        return "<LogstashSender id=%s host=%s:%s>" % (id(self), self.host, self.port)
+
+    def connect(self):
+        """Open connection if it is not already open
+
+        :raise EventConsumerError: if connection can not be opened or reconnect backoff is not elapsed
+        """
+        if self.client is not None:
+            return
+        if time() < self.retry_time:
+            raise EventConsumerError("Logstash reconnect backoff is not elapsed")
+
+        try:
+            client = PyLogBeatClient(
+                self.host,
+                self.port,
+                timeout=self.timeout,
+                ssl_enable=True,
+                ssl_verify=False,
+                keyfile=self.keyfile,
+                certfile=self.certfile,
+                ca_certs=self.ca_certs,
+            )
+            client.connect()
+        except Exception as ex:
+            self.__fail()
+            raise EventConsumerError(ex)
+
+        self.client = client
+        if self.connects > 0:
+            self.reconnects += 1
+        self.connects += 1
+        self.logger.debug("Open logstash connection %s" % self)
+
+    def close(self):
+        """Close connection"""
+        if self.client is None:
+            return
+        try:
+            self.client.close()
+        except Exception as ex:
+            self.logger.warning("Logstash connection %s can not be closed: %s" % (self, ex))
+        self.client = None
+
+    def __fail(self):
+        self.close()
+        self.failures += 1
+        self.backoff = min(max(self.backoff * 2, self.min_backoff), self.max_backoff)
+        self.retry_time = time() + self.backoff
+
+    def send(self, msgs):
+        """Send messages in a single beats frame
+
+        :param msgs: list of messages
+        :raise EventConsumerError:
+        """
+        self.connect()
+        try:
+            self.client.send(msgs)
+        except Exception as ex:
+            self.__fail()
+            raise EventConsumerError(ex)
+
+        self.backoff = 0
+        self.sent += len(msgs)
+        self.batches += 1
+
+    def info(self) -> dict:
+        """Get sender statistics
+
+        :return: dict with connected, backoff, connects, reconnects, failures, sent, batches
+        """
+        return {
+            "connected": self.client is not None,
+            "backoff": self.backoff,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "sent": self.sent,
+            "batches": self.batches,
+        }
+
+
 class EventConsumer(ConsumerMixin):
     """Event consumer from redis queue
 
@@ -41,6 +164,17 @@ class EventConsumer(ConsumerMixin):
     :param api_manager: ApiManager instance
     :param event_handlers: list of event handlers used when event is received. An event handler is a class that extend
         EventHandler and define a callback method.
+
+    When event_bulk_size is greater than 0, events are accumulated and written with the elastic search bulk api or
+    in a single logstash beats frame when bulk_size events are pending or when the oldest pending event is waiting from
+    more than event_bulk_interval seconds. Messages are acked only after the events are stored. event_prefetch_count
+    sets the max number of unacked messages delivered to the consumer [default=2*event_bulk_size].
+
+    Events that can not be sent to logstash or written in elastic search are kept and sent again when the backoff is
+    elapsed. Backoff starts from event_elastic_backoff [default=1.0] for elastic search and doubles at every consecutive
+    failure up to event_elastic_max_backoff [default=60.0]. Pending events are bounded by event_bulk_buffer_size
+    [default=10*event_bulk_size], further events are requeued. Without bulk, the consumer waits the logstash reconnect
+    backoff before sending the next event and requeues the events that can not be sent.
     """
 
     def __init__(self, connection, api_manager: ApiManager, event_handlers=None):
@@ -59,9 +193,34 @@ class EventConsumer(ConsumerMixin):
         self.elasticsearch = api_manager.elasticsearch
         self.logstash = api_manager.logstash
         self.__load_logstash_cert()
+        self.logstash_sender = None
+        if self.logstash is not None:
+            self.logstash_sender = LogstashSender(
+                self.logstash.get("host"),
+                self.logstash.get("port"),
+                self.logstash["pkey_file"].name,
+                self.logstash["cert_file"].name,
+                self.logstash["ca_file"].name,
+                backoff=float(api_manager.params.get("event_logstash_backoff", 1.0)),
+                max_backoff=float(api_manager.params.get("event_logstash_max_backoff", 60.0)),
+            )
 
         self.index = "cmp-event-%s" % api_manager.app_env
 
+        # elastic search bulk indexing
+        self.bulk_size = int(api_manager.params.get("event_bulk_size", 0))
+        self.bulk_interval = float(api_manager.params.get("event_bulk_interval", 1.0))
+        self.prefetch_count = int(api_manager.params.get("event_prefetch_count", 2 * self.bulk_size))
+        self.bulk_buffer_size = int(api_manager.params.get("event_bulk_buffer_size", 10 * self.bulk_size))
+        self.bulk_mode = self.bulk_size > 0 and (self.logstash is not None or self.elasticsearch is not None)
+        self.bulk = []
+        self.bulk_deadline = None
+        self.bulk_stats = {"sent": 0, "failed": 0, "requeued": 0, "batches": 0}
+        self.elastic_min_backoff = float(api_manager.params.get("event_elastic_backoff", 1.0))
+        self.elastic_max_backoff = float(api_manager.params.get("event_elastic_max_backoff", 60.0))
+        self.elastic_backoff = 0
+        self.elastic_retry_time = 0
+
         self.event_handlers = []
         if event_handlers is None:
             event_handlers = []
@@ -104,15 +263,45 @@ class EventConsumer(ConsumerMixin):
         :param channel: kombu channel
         :return:
         """
+        prefetch_count = None
+        if self.prefetch_count > 0:
+            prefetch_count = self.prefetch_count
         return [
             Consumer(
                 queues=self.queue,
                 accept=["pickle", "json"],
                 callbacks=[self.callback],
                 on_decode_error=self.decode_error,
+                prefetch_count=prefetch_count,
             )
         ]
 
+    def on_iteration(self):
+        """Flush pending bulk events when the bulk interval and the backoff are elapsed"""
+        if len(self.bulk) > 0 and time() >= max(self.bulk_deadline, self.get_retry_time()):
+            self.flush_bulk()
+
+    def on_consume_end(self, connection, channel):
+        """Flush pending bulk events before the channel is closed
+
+        :param connection: kombu connection
+        :param channel: kombu channel
+        """
+        self.flush_bulk()
+        if self.logstash_sender is not None:
+            self.logstash_sender.close()
+        self.logger.info("Event consumer statistics: %s" % self.info())
+
+    def info(self) -> dict:
+        """Get consumer statistics
+
+        :return: dict with bulk and logstash sender statistics
+        """
+        res = {"bulk": self.bulk_stats, "pending": len(self.bulk), "backoff": self.elastic_backoff, "logstash": None}
+        if self.logstash_sender is not None:
+            res["logstash"] = self.logstash_sender.info()
+        return res
+
     def decode_error(self, message, exc):
         """Decode error
 
@@ -140,15 +329,51 @@ class EventConsumer(ConsumerMixin):
                 event_handler.callback(event, message)
         except EventConsumerError as ex:
             self.logger.warning(ex, exc_info=True)
+            # message of a pending bulk event is acked when the event is stored
+            if self.is_pending(message) is False:
+                self.ack(message)
+
+    def is_pending(self, message):
+        """Check if message belongs to an event pending in the bulk
+
+        :param message: message received
+        :return: True or False
+        """
+        return any(pending is message for index, msg, pending in self.bulk)
+
+    def ack(self, message):
+        """Ack message if it was not already acked, rejected or requeued
+
+        :param message: message received
+        """
+        if message.acknowledged is False:
+            message.ack()
+
+    def reject(self, message):
+        """Reject message if it was not already acked, rejected or requeued
+
+        :param message: message received
+        """
+        if message.acknowledged is False:
+            message.reject()
+
+    def requeue(self, message):
+        """Requeue message if it was not already acked, rejected or requeued
+
+        :param message: message received
+        """
+        if message.acknowledged is False:
+            message.requeue()
 
     def log_event(self, event, message):
-        """Log received event
+        """Log received event. In bulk mode and with logstash message is acked when event is stored
 
         :param event: event received
         :param message: message received
         :raise EventConsumerError:
         """
-        message.ack()
+        if self.bulk_mode is False and self.logstash is None:
+            message.ack()
         self.logger.info("Consume event : %s" % truncate(event))
         # self.logger.warning('Consume event : %s' % event)
         # todo: remove warning
@@ -160,7 +385,9 @@ class EventConsumer(ConsumerMixin):
         :param message: message received
         :raise EventConsumerError:
         """
-        if self.logstash is not None:
+        if self.bulk_mode is True:
+            self._store_event_bulk(event, message)
+        elif self.logstash is not None:
             self._store_event_logstash(event, message)
         elif self.elasticsearch is not None:
             self._store_event_elastic(event, message)
@@ -168,6 +395,34 @@ class EventConsumer(ConsumerMixin):
         # else:
         #     self._store_event_db(event, message)
 
+    def __get_elastic_msg(self, event):
+        """Get elastic search document of an event
+
+        :param event: event received
+        :return: (index, document) or None if event must not be stored
+        """
+        # get event type
+        etype = event["type"]
+
+        # for job events save only those with status 'STARTED', 'FAILURE' and 'SUCCESS'
+        if etype == ApiObject.ASYNC_OPERATION:
+            status = event["data"]["response"][0]
+            if status not in ["STARTED", "FAILURE", "SUCCESS", "STEP"]:
+                return None
+
+        msg = {
+            "event_id": event["id"],
+            "type": etype,
+            "dest": event["dest"],
+            "source": event["source"],
+            "date": datetime.fromtimestamp(event["creation"]),
+            "data": event["data"],
+        }
+
+        date = datetime.now()
+        index = "%s-%s" % (self.index, date.strftime("%Y.%m.%d"))
+        return index, msg
+
     def _store_event_elastic(self, event, message):
         """Store event in elastic search.
 
@@ -176,29 +431,11 @@ class EventConsumer(ConsumerMixin):
         :raise EventConsumerError:
         """
         try:
-            # clone event
-            # sevent = deepcopy(event)
-
-            # get event type
-            etype = event["type"]
-
-            # for job events save only those with status 'STARTED', 'FAILURE' and 'SUCCESS'
-            if etype == ApiObject.ASYNC_OPERATION:
-                status = event["data"]["response"][0]
-                if status not in ["STARTED", "FAILURE", "SUCCESS", "STEP"]:
-                    return None
+            res = self.__get_elastic_msg(event)
+            if res is None:
+                return None
+            index, msg = res
 
-            msg = {
-                "event_id": event["id"],
-                "type": etype,
-                "dest": event["dest"],
-                "source": event["source"],
-                "date": datetime.fromtimestamp(event["creation"]),
-                "data": event["data"],
-            }
-
-            date = datetime.now()
-            index = "%s-%s" % (self.index, date.strftime("%Y.%m.%d"))
             # self.elasticsearch.index(index=index, body=msg, request_timeout=30, doc_type="doc")
             self.elasticsearch._request_timeout = 30
             self.elasticsearch.index(index=index, body=msg)
@@ -208,67 +445,197 @@ class EventConsumer(ConsumerMixin):
             self.logger.error("Error storing event in elastic: %s" % ex)
             raise EventConsumerError(ex)
 
-    def _store_event_logstash(self, event, message):
-        """Store event in elastic using logstash.
+    def _store_event_bulk(self, event, message):
+        """Add event to the pending bulk. Bulk is written when it reaches bulk_size events.
 
         :param event: event received
         :param message: message received
         :raise EventConsumerError:
         """
         try:
-            # get event type
-            etype = event["type"]
+            if self.logstash is not None:
+                res = self.__get_logstash_msg(event)
+            else:
+                res = self.__get_elastic_msg(event)
+        except Exception as ex:
+            self.logger.error("Error storing event in elastic: %s" % ex)
+            raise EventConsumerError(ex)
 
-            # for job events save only those with status 'STARTED', 'FAILURE' and 'SUCCESS'
-            if etype == ApiObject.ASYNC_OPERATION:
-                status = event["data"]["response"][0]
-                if status not in ["STARTED", "FAILURE", "SUCCESS", "STEP"]:
-                    return None
+        if res is None:
+            self.ack(message)
+            return None
 
-            timestamp = datetime.fromtimestamp(event["creation"])
-            msg = {
-                "@timestamp": format_date(timestamp),
-                "@version": "1",
-                "tags": [],
-                "@metadata": {
-                    "version": "2.0.0",
-                    "beat": "pylogbeat",
-                    "id": self.id,
-                    "name": self.api_manager.pod,
-                    "hostname": self.api_manager.server_name,
-                    "index": self.index,
-                },
-                "agent": {
-                    "version": "2.0.0",
-                    "type": "pylogbeat",
-                    "id": self.id,
-                    "pod": self.api_manager.pod,
-                    "hostname": self.api_manager.server_name,
-                    "env": self.api_manager.app_env,
-                },
-                "event_id": event["id"],
-                "type": etype,
-                "dest": event["dest"],
-                "source": event["source"],
-                "data": event["data"],
-            }
-
-            with PyLogBeatClient(
-                self.logstash.get("host"),
-                self.logstash.get("port"),
-                ssl_enable=True,
-                ssl_verify=False,
-                keyfile=self.logstash["pkey_file"].name,
-                certfile=self.logstash["cert_file"].name,
-                ca_certs=self.logstash["ca_file"].name,
-            ) as client:
-                client.send([msg])
+        if len(self.bulk) >= self.bulk_buffer_size:
+            self.logger.warning("Event bulk buffer is full. Event %s is requeued" % event["id"])
+            self.bulk_stats["requeued"] += 1
+            self.requeue(message)
+            return None
+
+        if len(self.bulk) == 0:
+            self.bulk_deadline = time() + self.bulk_interval
+        self.bulk.append((res[0], res[1], message))
+        if len(self.bulk) >= self.bulk_size and time() >= self.get_retry_time():
+            self.flush_bulk()
 
-            self.logger.debug("Store event in logstash: %s" % truncate(msg))
+    def get_retry_time(self):
+        """Get time before which the logstash sender does not attempt to reconnect or the elastic search bulk is not
+        written again
+
+        :return: timestamp
+        """
+        if self.logstash_sender is not None:
+            return self.logstash_sender.retry_time
+        return self.elastic_retry_time
+
+    def flush_bulk(self):
+        """Write pending events"""
+        if len(self.bulk) == 0:
+            return
+        if self.logstash is not None:
+            self.__flush_logstash()
+        else:
+            self.__flush_elastic()
+
+    def __flush_logstash(self):
+        """Send pending events to logstash in beats frames of bulk_size events. Messages of sent events are acked. When
+        send fails events are kept and sent again when the reconnect backoff is elapsed.
+        """
+        while len(self.bulk) > 0:
+            bulk = self.bulk[: self.bulk_size]
+            try:
+                self.logstash_sender.send([msg for index, msg, message in bulk])
+            except EventConsumerError as ex:
+                self.logger.error("Error storing %s events in logstash: %s" % (len(self.bulk), ex))
+                self.bulk_deadline = max(time() + self.bulk_interval, self.get_retry_time())
+                return
+
+            self.bulk = self.bulk[self.bulk_size :]
+            for index, msg, message in bulk:
+                self.ack(message)
+            self.bulk_stats["sent"] += len(bulk)
+            self.bulk_stats["batches"] += 1
+            self.logger.debug("Store %s events in logstash" % len(bulk))
+
+    def __flush_elastic(self):
+        """Write pending events with the elastic search bulk api. Messages of stored events are acked and messages of
+        events rejected by elastic search are rejected. When bulk request fails events are kept and written again when
+        the backoff is elapsed.
+        """
+        bulk, self.bulk = self.bulk, []
+
+        operations = []
+        for index, msg, message in bulk:
+            operations.append({"index": {"_index": index}})
+            operations.append(msg)
+
+        try:
+            self.elasticsearch._request_timeout = 30
+            res = self.elasticsearch.bulk(operations=operations)
+        except Exception as ex:
+            self.logger.error("Error storing %s events in elastic: %s" % (len(bulk), ex))
+            self.bulk = bulk + self.bulk
+            backoff = max(self.elastic_backoff * 2, self.elastic_min_backoff)
+            self.elastic_backoff = min(backoff, self.elastic_max_backoff)
+            self.elastic_retry_time = time() + self.elastic_backoff
+            self.bulk_deadline = max(time() + self.bulk_interval, self.elastic_retry_time)
+            return
+
+        self.elastic_backoff = 0
+
+        items = res.get("items", [])
+        errors = 0
+        for pos, (index, msg, message) in enumerate(bulk):
+            error = None
+            if res.get("errors", False) is True and pos < len(items):
+                error = items[pos].get("index", {}).get("error", None)
+            if error is not None:
+                errors += 1
+                self.logger.error("Error storing event %s in elastic: %s" % (msg["event_id"], error))
+                self.reject(message)
+            else:
+                self.ack(message)
+        self.bulk_stats["sent"] += len(bulk) - errors
+        self.bulk_stats["failed"] += errors
+        self.bulk_stats["batches"] += 1
+        self.logger.debug("Store %s events in elastic - errors: %s" % (len(bulk), errors))
+
+    def __get_logstash_msg(self, event):
+        """Get logstash message of an event
+
+        :param event: event received
+        :return: (index, message) or None if event must not be stored
+        """
+        # get event type
+        etype = event["type"]
+
+        # for job events save only those with status 'STARTED', 'FAILURE' and 'SUCCESS'
+        if etype == ApiObject.ASYNC_OPERATION:
+            status = event["data"]["response"][0]
+            if status not in ["STARTED", "FAILURE", "SUCCESS", "STEP"]:
+                return None
+
+        timestamp = datetime.fromtimestamp(event["creation"])
+        msg = {
+            "@timestamp": format_date(timestamp),
+            "@version": "1",
+            "tags": [],
+            "@metadata": {
+                "version": "2.0.0",
+                "beat": "pylogbeat",
+                "id": self.id,
+                "name": self.api_manager.pod,
+                "hostname": self.api_manager.server_name,
+                "index": self.index,
+            },
+            "agent": {
+                "version": "2.0.0",
+                "type": "pylogbeat",
+                "id": self.id,
+                "pod": self.api_manager.pod,
+                "hostname": self.api_manager.server_name,
+                "env": self.api_manager.app_env,
+            },
+            "event_id": event["id"],
+            "type": etype,
+            "dest": event["dest"],
+            "source": event["source"],
+            "data": event["data"],
+        }
+        return self.index, msg
+
+    def _store_event_logstash(self, event, message):
+        """Store event in elastic using logstash. Logstash connection is kept open between events. If the reconnect
+        backoff is pending wait until it is elapsed. Message is acked when event is sent and requeued when send fails.
+
+        :param event: event received
+        :param message: message received
+        :raise EventConsumerError:
+        """
+        try:
+            res = self.__get_logstash_msg(event)
         except Exception as ex:
             self.logger.error("Error storing event in elastic: %s" % ex)
             raise EventConsumerError(ex)
 
+        if res is None:
+            self.ack(message)
+            return None
+        msg = res[1]
+
+        wait = self.get_retry_time() - time()
+        if wait > 0:
+            sleep(wait)
+
+        try:
+            self.logstash_sender.send([msg])
+        except EventConsumerError as ex:
+            self.logger.error("Error storing event in logstash: %s. Event %s is requeued" % (ex, event["id"]))
+            self.requeue(message)
+            raise
+
+        self.ack(message)
+        self.logger.debug("Store event in logstash: %s" % truncate(msg))
+
     def _store_event_db(self, event, message):
         """Store event in db.
 
@@ -5,6 +5,7 @@
 from beehive.common.apimanager import (
     ApiView,
     PaginatedRequestQuerySchema,
+    CursorPaginatedRequestQuerySchema,
     PaginatedResponseSchema,
     SwaggerApiView,
     GetApiObjectRequestSchema,
@@ -18,7 +19,9 @@ from beecell.swagger import SwaggerHelper
 #
 # event
 #
-class ListEventsRequestSchema(PaginatedRequestQuerySchema):
+class ListEventsRequestSchema(CursorPaginatedRequestQuerySchema):
+    cursor_fields = ["id", "objid"]
+
     type = fields.String(default="API", context="query", description="event type")
     objid = fields.String(
         default="3638282dh82//dhedhw7d8we",
@@ -83,7 +86,7 @@ class ListEvents(SwaggerApiView):
             raise ApiManagerError("objdef filter param require also objtype")
         events, total = controller.get_events(**data)
         res = [r.info() for r in events]
-        return self.format_paginated_response(res, "events", total, **data)
+        return self.format_paginated_response(res, "events", total, objs=events, **data)
 
 
 class GetEventResponseSchema(Schema):
@@ -3,10 +3,13 @@
 #
 # (C) Copyright 2018-2024 CSI-Piemonte
 
+import os
+import gzip
 from uuid import uuid4
+from six import ensure_text
 
 import ujson as json
-from datetime import datetime
+from datetime import datetime, timedelta
 from celery.result import AsyncResult
 from beecell.db.util import QueryError
 from beecell.simple import truncate, import_class, format_date
@@ -16,6 +19,7 @@ from beehive.common.task_v2 import run_async
 from beehive.module.scheduler_v2.redis_scheduler import RedisScheduler
 from beehive.common.data import trace, operation
 from beehive.common.task_v2.canvas import signature
+from beehive.common.task_v2.handler import TRACE_PREFIX, TASK_END_PREFIX, TASK_STATUS_PREFIX
 from beehive.module.scheduler_v2.model import SchedulerDbManager
 
 
@@ -189,6 +193,12 @@ class TaskManager(ApiObject):
     objdef = "Manager"
     objdesc = "Task Manager"
 
+    # task status that does not change anymore
+    END_STATUS = ["SUCCESS", "FAILURE", "REVOKED"]
+
+    # seconds reserved to the response of a task status request waiting for task end
+    WAIT_MARGIN = 2
+
     def __init__(self, controller):
         ApiObject.__init__(self, controller, oid="", name="", desc="", active="")
 
@@ -336,11 +346,13 @@ class TaskManager(ApiObject):
         :param size: number of users to show in list per page [default=0]
         :param order: sort order [default=DESC]
         :param field: sort field [default=id]
+        :param include_steps: if True load steps, trace count and last trace of all the tasks [default=False]
         :return: List of :class:`Task`
         :raises ApiManagerError: raise :class:`ApiManagerError`
         """
         res = []
         tags = []
+        include_steps = kvargs.pop("include_steps", False)
 
         objdef = None
         objtype = None
@@ -397,12 +409,41 @@ class TaskManager(ApiObject):
                 )
                 res.append(obj)
 
+            if include_steps is True:
+                self.load_steps(res)
+
             self.logger.info("Get tasks (total:%s): %s" % (total, truncate(res)))
             return res, total
         except QueryError as ex:
             self.logger.warn(ex, exc_info=1)
             return [], 0
 
+    def load_steps(self, tasks, traces=True):
+        """Load steps of a list of tasks with one query, and optionally trace count and last trace with another one
+
+        :param tasks: list of :class:`Task`
+        :param traces: if True load also trace count and last trace [default=True]
+        :return: list of :class:`Task`
+        """
+        if len(tasks) == 0:
+            return tasks
+
+        manager: SchedulerDbManager = self.manager
+        task_ids = [t.uuid for t in tasks]
+        steps = {task_id: [] for task_id in task_ids}
+        for step in manager.get_tasks_steps(task_ids):
+            steps[step.task_id].append(step)
+        summary = {}
+        if traces is True:
+            summary = manager.get_tasks_trace_summary(task_ids)
+
+        for task in tasks:
+            task.set_steps(steps[task.uuid])
+            if traces is True:
+                count, last = summary.get(task.uuid, (0, None))
+                task.set_trace_summary(count, last)
+        return tasks
+
     @trace(op="view")
     def get_task(self, task_id, entity_class_name=None):
         """Get task
@@ -418,30 +459,252 @@ class TaskManager(ApiObject):
         return tasks[0]
 
     @trace(op="view")
-    def get_task_status(self, task_id, entity_class_name=None):
+    def get_task_status(self, task_id, entity_class_name=None, wait=0):
         """Get task
 
         :param entity_class_name: entity_class owner of the tasks to query
         :param task_id: task id
+        :param wait: max seconds to wait for task end when task is not ended [default=0]
         :return: :class:`Task` instance
         :raises ApiManagerError: raise :class:`ApiManagerError`
         """
+        # get task status mirrored in redis by the worker
+        status = None
+        if self.api_manager.task_status_cache is True:
+            self.check_task_status_authorization(entity_class_name)
+            status = self.get_cached_task_status(task_id)
 
         # when celery task is removed from celery backend for key elapsed use task from db
-        tasks, tot = self.get_tasks(entity_class=entity_class_name, task_id=task_id)
-        if tot == 1:
-            task = tasks[0]
-            status = task.status
-            self.logger.debug("get task from database: %s - status: %s" % (task, status))
-        else:
-            # get first task status from celery task stored in celery backend
-            asyncResult = AsyncResult(task_id, app=self.task_manager)
-            status = asyncResult.status
-            self.logger.debug("get task from celery: %s - status: %s" % (asyncResult, status))
+        if status is None:
+            tasks, tot = self.get_tasks(entity_class=entity_class_name, task_id=task_id)
+            if tot == 1:
+                task = tasks[0]
+                status = task.status
+                self.logger.debug("get task from database: %s - status: %s" % (task, status))
+            else:
+                # get first task status from celery task stored in celery backend
+                asyncResult = AsyncResult(task_id, app=self.task_manager)
+                status = asyncResult.status
+                self.logger.debug("get task from celery: %s - status: %s" % (asyncResult, status))
+
+        if wait > 0 and status not in self.END_STATUS:
+            wait = self.get_max_wait(wait)
+            if wait > 0:
+                status = self.wait_task_end(task_id, wait) or status
 
         res = {"uuid": task_id, "status": status}
         return res
 
+    def check_task_status_authorization(self, entity_class_name=None):
+        """Check user can view the status of the tasks of an entity class. Checks are the same of get_tasks.
+
+        :param entity_class_name: entity_class owner of the tasks to query
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        if operation.authorize is False or self.controller.is_admin_service():
+            return
+
+        # check subsystem resource
+        if self.controller.module.api_manager.app_subsytem == "resource":
+            raise ApiManagerError("You are not SuperAdmin")
+
+        entity_class = TaskManager
+        if entity_class_name is not None:
+            entity_class = import_class(entity_class_name)
+        self.controller.can("view", objtype=entity_class.objtype, definition=entity_class.objdef)
+
+    def get_cached_task_status(self, task_id):
+        """Get task status mirrored in redis by the worker
+
+        :param task_id: task id
+        :return: task status or None if task status is not in redis
+        """
+        try:
+            status = self.controller.redis_taskmanager.conn.hget(TASK_STATUS_PREFIX + task_id, "status")
+        except Exception as ex:
+            self.logger.warning("Task %s status can not be read from redis: %s" % (task_id, ex))
+            return None
+        if status is None:
+            return None
+        status = ensure_text(status)
+        self.logger.debug("get task from redis: %s - status: %s" % (task_id, status))
+        return status
+
+    def get_max_wait(self, wait):
+        """Limit the wait for task end so that the status request ends before the api request timeout
+
+        :param wait: required seconds to wait
+        :return: seconds to wait. 0 when there is no time left to wait
+        """
+        timeout = getattr(operation, "timeout", None) or self.api_manager.api_timeout
+        return max(0, int(min(wait, timeout - self.WAIT_MARGIN)))
+
+    def wait_task_end(self, task_id, wait):
+        """Wait for task end notified by the worker in redis. Database session is released before waiting, so every
+        waiting request holds only one redis connection of the task manager pool: concurrent waiters are limited by
+        the size of that pool. Database session is reopened after waiting.
+
+        :param task_id: task id
+        :param wait: max seconds to wait
+        :return: task end status or None if task is not ended
+        """
+        key = TASK_END_PREFIX + task_id
+        self.api_manager.release_session()
+        try:
+            conn = self.controller.redis_taskmanager.conn
+            res = conn.blpop(key, timeout=wait)
+            if res is None:
+                return None
+            status = ensure_text(res[1])
+
+            # push back status for the other clients waiting for the same task
+            expire = int(float(self.api_manager.params.get("expire", 86400)))
+            conn.pipeline().lpush(key, status).expire(key, expire).execute()
+            self.logger.debug("get task end from redis: %s - status: %s" % (task_id, status))
+            return status
+        except Exception as ex:
+            self.logger.warning("Task %s end can not be read from redis: %s" % (task_id, ex))
+            return None
+        finally:
+            # reopen database session for the rest of the request
+            self.api_manager.get_session()
+
+    @trace(op="delete")
+    def purge_tasks(self, retention=None, retention_days=None, archive_path=None, chunk=None):
+        """Purge tasks older than their retention with their steps and traces. Only tasks in an end status are purged,
+        pending and running tasks are kept whatever their age. Task age is measured from start time or, for tasks
+        never started, from stop time. Tasks are deleted in chunks, every chunk in its own transaction. When archive
+        path is set, tasks are first exported in a gzip compressed jsonl file, one task with its steps and traces per
+        line.
+
+        :param retention: dict with retention days per task name. If None use task_retention [optional]
+        :param retention_days: retention days of the tasks not in retention. If None use task_retention_days [optional]
+        :param archive_path: directory where archive file is written. If None use task_archive_path [optional]
+        :param chunk: number of tasks deleted per transaction. If None use task_purge_chunk [optional]
+        :return: dict with number of purged tasks, steps and traces and archive file name
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        # verify permissions
+        self.controller.check_authorization(self.objtype, self.objdef, None, "delete")
+
+        if retention is None:
+            retention = self.api_manager.task_retention
+        if retention_days is None:
+            retention_days = self.api_manager.task_retention_days
+        if archive_path is None:
+            archive_path = self.api_manager.task_archive_path
+        if chunk is None:
+            chunk = self.api_manager.task_purge_chunk
+
+        res = {"tasks": 0, "steps": 0, "traces": 0, "archive": None}
+        archive = None
+        if archive_path is not None:
+            res["archive"] = os.path.join(
+                archive_path, "scheduler-tasks-%s.jsonl.gz" % datetime.today().strftime("%Y%m%d%H%M%S")
+            )
+            archive = gzip.open(res["archive"], "at")
+
+        try:
+            now = datetime.today()
+            # tasks with a custom retention
+            for name, days in retention.items():
+                self.__purge_expired_tasks(res, archive, now - timedelta(days=days), chunk, names=[name])
+            # other tasks
+            exclude_names = list(retention.keys())
+            before = now - timedelta(days=retention_days)
+            self.__purge_expired_tasks(res, archive, before, chunk, exclude_names=exclude_names)
+        except Exception as ex:
+            self.logger.error(ex, exc_info=True)
+            raise ApiManagerError("Tasks purge error: %s" % ex, code=400)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        self.logger.info("Purge tasks: %s" % res)
+        return res
+
+    def __purge_expired_tasks(self, res, archive, before, chunk, names=None, exclude_names=None):
+        """Archive and delete in chunks tasks in an end status expired before a date
+
+        :param res: dict with the purge counters to update
+        :param archive: archive file object or None
+        :param before: tasks start time upper limit
+        :param chunk: number of tasks deleted per transaction
+        :param names: list of task names to select [optional]
+        :param exclude_names: list of task names to skip [optional]
+        """
+        manager: SchedulerDbManager = self.manager
+        while True:
+            tasks = manager.get_expired_tasks(
+                before, status=self.END_STATUS, names=names, exclude_names=exclude_names, size=chunk
+            )
+            if len(tasks) == 0:
+                break
+            task_ids = [t.uuid for t in tasks]
+            if archive is not None:
+                steps = manager.get_tasks_steps(task_ids)
+                traces = manager.get_tasks_traces(task_ids)
+                self.__archive_tasks(archive, tasks, steps, traces)
+            tasks, steps, traces = manager.delete_tasks(task_ids)
+            res["tasks"] += tasks
+            res["steps"] += steps
+            res["traces"] += traces
+            self.logger.debug("Purge %s tasks expired before %s" % (tasks, before))
+            if len(task_ids) < chunk:
+                break
+
+    def __archive_tasks(self, archive, tasks, steps, traces):
+        """Write tasks with their steps and traces in the archive file. File is flushed before tasks are deleted.
+
+        :param archive: archive file object
+        :param tasks: SchedulerTask instance list
+        :param steps: SchedulerStep instance list
+        :param traces: SchedulerTrace instance list
+        """
+
+        def to_dict(entity):
+            res = {}
+            for column in entity.__table__.columns:
+                value = getattr(entity, column.name)
+                if isinstance(value, datetime):
+                    value = value.isoformat()
+                res[column.name] = value
+            return res
+
+        records = {t.uuid: {"task": to_dict(t), "steps": [], "traces": []} for t in tasks}
+        for step in steps:
+            records[step.task_id]["steps"].append(to_dict(step))
+        for item in traces:
+            records[item.task_id]["traces"].append(to_dict(item))
+        for record in records.values():
+            archive.write(json.dumps(record) + "\n")
+        archive.flush()
+
+    @trace(op="insert")
+    def schedule_purge_tasks(self, schedule=None, params=None):
+        """Schedule the periodic purge of the tasks older than their retention
+
+        :param schedule: schedule. If None run every day at 3:00 [optional]
+        :param params: purge params: retention, retention_days, archive_path, chunk [optional]
+        :return: schedule name
+        :raises ApiManagerError: raise :class:`ApiManagerError`
+        """
+        # verify permissions
+        self.controller.check_authorization(self.objtype, self.objdef, None, "delete")
+
+        if schedule is None:
+            schedule = {"type": "crontab", "minute": 0, "hour": 3}
+        if params is None:
+            params = {}
+        params.update(self.get_user())
+        params["objid"] = str(uuid4())
+        params["alias"] = "purge_tasks"
+        schedule_name = "purge-tasks-schedule"
+        task = "beehive.module.scheduler_v2.tasks.purge_tasks_task"
+        self.controller.create_schedule(schedule_name, task, schedule, [params])
+        self.logger.info("create schedule %s" % schedule_name)
+        return schedule_name
+
     @trace(op="insert")
     def run_test_task(self, params):
         """Run test task
@@ -570,6 +833,9 @@ class Task(ApiObject):
 
         self.steps = []
         self.trace = []
+        self.steps_loaded = False
+        self.trace_count = None
+        self.last_trace = None
 
     def info(self):
         """Get object info
@@ -601,6 +867,11 @@ class Task(ApiObject):
             "stop_time": format_date(self.stop_time),
             "duration": self.duration,
         }
+        if self.steps_loaded is True:
+            res["steps"] = self.steps
+        if self.trace_count is not None:
+            res["trace_count"] = self.trace_count
+            res["last_trace"] = self.last_trace
         return res
 
     def detail(self):
@@ -639,8 +910,51 @@ class Task(ApiObject):
         }
         return res
 
+    def set_steps(self, steps):
+        """Set task steps
+
+        :param steps: SchedulerStep instance list
+        """
+        self.steps = []
+        for s in steps:
+            duration = None
+            stop_time = None
+            if isinstance(s.start_time, datetime) and isinstance(s.run_time, datetime):
+                duration = (s.run_time - s.start_time).total_seconds()
+                stop_time = format_date(s.stop_time)
+            self.steps.append(
+                {
+                    "uuid": s.uuid,
+                    "name": s.name,
+                    "status": s.status,
+                    "result": s.result,
+                    "start_time": format_date(s.start_time),
+                    "run_time": format_date(s.run_time),
+                    "stop_time": stop_time,
+                    "duration": duration,
+                }
+            )
+        self.steps_loaded = True
+
+    def set_trace_summary(self, count, last):
+        """Set task trace count and last trace
+
+        :param count: number of task traces
+        :param last: last SchedulerTrace instance or None
+        """
+        self.trace_count = count
+        self.last_trace = None
+        if last is not None:
+            self.last_trace = {
+                "id": str(last.id),
+                "step": last.step_id,
+                "message": last.message,
+                "level": last.level,
+                "date": format_date(last.date),
+            }
+
     def get_trace(self):
-        """Get task trace
+        """Get task trace. Progress traces kept in redis are merged by date with the traces stored in database
 
         :raise ApiManagerError:
         """
@@ -653,9 +967,24 @@ class Task(ApiObject):
                     "step_name": step.name,
                     "message": trace.message,
                     "level": trace.level,
-                    "date": format_date(trace.date),
+                    "date": trace.date,
                 }
             )
+
+        # progress traces stored in redis
+        if self.api_manager.task_progress_trace == "redis":
+            try:
+                items = self.controller.redis_taskmanager.conn.lrange(TRACE_PREFIX + self.uuid, 0, -1)
+                for pos, item in enumerate(items):
+                    item = json.loads(item)
+                    item.update({"id": "redis-%s" % pos, "date": datetime.fromisoformat(item["date"])})
+                    traces.append(item)
+                traces.sort(key=lambda t: t["date"])
+            except Exception as ex:
+                self.logger.warning("Task %s progress traces can not be read from redis: %s" % (self.uuid, ex))
+
+        for trace in traces:
+            trace["date"] = format_date(trace["date"])
         return traces
 
     def get_log(self, size=100, page=0, *args, **kwargs):
@@ -691,22 +1020,5 @@ class Task(ApiObject):
 
         :raise ApiManagerError:
         """
-        steps = self.manager.get_steps(self.uuid)
-        for s in steps:
-            duration = None
-            stop_time = None
-            if isinstance(s.start_time, datetime) and isinstance(s.run_time, datetime):
-                duration = (s.run_time - s.start_time).total_seconds()
-                stop_time = format_date(s.stop_time)
-            self.steps.append(
-                {
-                    "uuid": s.uuid,
-                    "name": s.name,
-                    "status": s.status,
-                    "result": s.result,
-                    "start_time": format_date(s.start_time),
-                    "run_time": format_date(s.run_time),
-                    "stop_time": stop_time,
-                    "duration": duration,
-                }
-            )
+        if self.steps_loaded is False:
+            self.set_steps(self.manager.get_steps(self.uuid))
@@ -5,10 +5,10 @@
 import ujson as json
 import logging
 
-from sqlalchemy import text, asc
+from sqlalchemy import text, asc, func, and_, or_
 
 from beecell.simple import truncate
-from beehive.common.data import query
+from beehive.common.data import query, transaction
 from beehive.common.model import (
     AbstractDbManager,
     PaginatedQueryGenerator,
@@ -117,6 +117,114 @@ class SchedulerDbManager(AbstractDbManager):
         res = query.run(tags, *args, **kvargs)
         return res
 
-    def delete(self):
-        """Delete events"""
-        pass
+    def get_expired_tasks(self, before, status=None, names=None, exclude_names=None, size=500):
+        """Get tasks expired before a date. A task expires when its start time is before the date. A task without
+        start time expires when its stop time is before the date and never expires when it has not stop time too.
+        Tasks are ordered by id so that subsequent calls, after the returned tasks are deleted, read the next chunk.
+
+        :param before: tasks start time upper limit
+        :param status: list of task status to select [optional]
+        :param names: list of task names to select [optional]
+        :param exclude_names: list of task names to skip [optional]
+        :param size: max number of tasks to return [default=500]
+        :return: SchedulerTask instance list
+        """
+        session = self.get_session()
+
+        query = session.query(SchedulerTask).filter(
+            or_(
+                SchedulerTask.start_time < before,
+                and_(SchedulerTask.start_time.is_(None), SchedulerTask.stop_time < before),
+            )
+        )
+        if status:
+            query = query.filter(SchedulerTask.status.in_(status))
+        if names:
+            query = query.filter(SchedulerTask.name.in_(names))
+        if exclude_names:
+            query = query.filter(SchedulerTask.name.notin_(exclude_names))
+        tasks = query.order_by(asc(SchedulerTask.id)).limit(size).all()
+        self.logger.debug("Get tasks expired before %s: %s" % (before, truncate(tasks)))
+        return tasks
+
+    def get_tasks_steps(self, task_ids):
+        """Get steps of a list of tasks
+
+        :param task_ids: list of task id
+        :return: SchedulerStep instance list
+        """
+        session = self.get_session()
+
+        query = (
+            session.query(SchedulerStep)
+            .filter(SchedulerStep.task_id.in_(task_ids))
+            .order_by(asc(SchedulerStep.task_id), asc(SchedulerStep.start_time))
+        )
+        steps = query.all()
+        self.logger.debug("Get tasks %s steps: %s" % (truncate(task_ids), truncate(steps)))
+        return steps
+
+    def get_tasks_traces(self, task_ids):
+        """Get traces of a list of tasks
+
+        :param task_ids: list of task id
+        :return: SchedulerTrace instance list
+        """
+        session = self.get_session()
+
+        query = (
+            session.query(SchedulerTrace)
+            .filter(SchedulerTrace.task_id.in_(task_ids))
+            .order_by(asc(SchedulerTrace.task_id), asc(SchedulerTrace.date))
+        )
+        traces = query.all()
+        self.logger.debug("Get tasks %s traces: %s" % (truncate(task_ids), truncate(traces)))
+        return traces
+
+    def get_tasks_trace_summary(self, task_ids):
+        """Get trace count and last trace of a list of tasks
+
+        :param task_ids: list of task id
+        :return: dict {<task_id>: (<trace count>, <last SchedulerTrace instance>)}
+        """
+        session = self.get_session()
+
+        last = (
+            session.query(
+                SchedulerTrace.task_id,
+                func.count(SchedulerTrace.id).label("count"),
+                func.max(SchedulerTrace.date).label("date"),
+            )
+            .filter(SchedulerTrace.task_id.in_(task_ids))
+            .group_by(SchedulerTrace.task_id)
+            .subquery()
+        )
+        query = (
+            session.query(SchedulerTrace, last.c.count)
+            .join(last, and_(SchedulerTrace.task_id == last.c.task_id, SchedulerTrace.date == last.c.date))
+            .order_by(asc(SchedulerTrace.id))
+        )
+        res = {trace.task_id: (count, trace) for trace, count in query.all()}
+        self.logger.debug("Get tasks %s trace summary: %s" % (truncate(task_ids), truncate(res)))
+        return res
+
+    @transaction
+    def delete_tasks(self, task_ids):
+        """Delete tasks with their steps and traces. Use a short list of tasks to keep the transaction small.
+
+        :param task_ids: list of task id
+        :return: number of deleted tasks, steps and traces
+        """
+        session = self.get_session()
+
+        traces = (
+            session.query(SchedulerTrace)
+            .filter(SchedulerTrace.task_id.in_(task_ids))
+            .delete(synchronize_session=False)
+        )
+        steps = (
+            session.query(SchedulerStep).filter(SchedulerStep.task_id.in_(task_ids)).delete(synchronize_session=False)
+        )
+        tasks = session.query(SchedulerTask).filter(SchedulerTask.uuid.in_(task_ids)).delete(synchronize_session=False)
+        self.logger.debug("Delete %s tasks, %s steps, %s traces" % (tasks, steps, traces))
+        return tasks, steps, traces
@@ -219,6 +219,44 @@ class ScheduledActionTask(BaseTask):
         return True, params
 
 
+class PurgeTasksTask(BaseTask):
+    name = "purge_tasks_task"
+    entity_class = TaskManager
+
+    """Purge tasks older than their retention with their steps and traces
+
+    :param retention: dict with retention days per task name [optional]
+    :param retention_days: retention days of the other tasks [optional]
+    :param archive_path: directory where purged tasks are archived [optional]
+    :param chunk: number of tasks deleted per transaction [optional]
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(PurgeTasksTask, self).__init__(*args, **kwargs)
+
+        self.steps = [PurgeTasksTask.purge_step]
+
+    @staticmethod
+    @task_step()
+    def purge_step(task, step_id, params, *args, **kvargs):
+        """Archive and delete expired tasks
+
+        :param task: parent celery task
+        :param str step_id: step id
+        :param dict params: step params
+        :return: res, params
+        """
+        res = TaskManager(task.controller).purge_tasks(
+            retention=params.get("retention"),
+            retention_days=params.get("retention_days"),
+            archive_path=params.get("archive_path"),
+            chunk=params.get("chunk"),
+        )
+        task.progress(step_id, msg="purge tasks: %s" % res)
+        return res, params
+
+
 task_manager.tasks.register(TestTask())
 task_manager.tasks.register(Test2Task())
 task_manager.tasks.register(ScheduledActionTask())
+task_manager.tasks.register(PurgeTasksTask())
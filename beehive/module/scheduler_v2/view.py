@@ -295,6 +295,11 @@ class GetTasksRequestSchema(PaginatedRequestQuerySchema):
         allow_none=True,
         validate=OneOf(["JOB", "JOBTASK", "TASK"]),
     )
+    include_steps = fields.Boolean(
+        required=False,
+        missing=False,
+        description="if true return also steps, trace count and last trace of every task",
+    )
 
 
 class GetSingleTaskResponseSchema(Schema):
@@ -317,6 +322,9 @@ class GetSingleTaskResponseSchema(Schema):
     run_time = fields.DateTime(required=True, default="1990-12-31T23:59:59Z", example="1990-12-31T23:59:59Z")
     stop_time = fields.DateTime(required=True, default="1990-12-31T23:59:59Z", example="1990-12-31T23:59:59Z")
     duration = fields.Integer(required=True, default=10)
+    steps = fields.List(fields.Dict(), required=False, description="task steps")
+    trace_count = fields.Integer(required=False, default=10, description="number of task traces")
+    last_trace = fields.Dict(required=False, allow_none=True, description="last task trace")
 
 
 class GetTasksResponseSchema(PaginatedResponseSchema):
@@ -414,15 +422,25 @@ class GetTaskStatusResponseSchema(Schema):
     task_instance = fields.Nested(GetSingleTaskStatusResponseSchema, required=True, allow_none=True)
 
 
+class GetTaskStatusRequestSchema(GetTaskRequestSchema):
+    wait = fields.Integer(
+        required=False,
+        missing=0,
+        validate=Range(min=0, max=60),
+        context="query",
+        description="max seconds to wait for task end before returning the status",
+    )
+
+
 class GetTaskStatus(TaskApiView):
     summary = "Get task instance status"
-    description = "Get task instance status"
+    description = "Get task instance status. With wait the request returns as soon as the task ends"
     definitions = {
         "GetTaskStatusResponseSchema": GetTaskStatusResponseSchema,
-        "GetTaskRequestSchema": GetTaskRequestSchema,
+        "GetTaskStatusRequestSchema": GetTaskStatusRequestSchema,
     }
-    parameters = SwaggerHelper().get_parameters(GetTaskRequestSchema)
-    parameters_schema = GetTaskRequestSchema
+    parameters = SwaggerHelper().get_parameters(GetTaskStatusRequestSchema)
+    parameters_schema = GetTaskStatusRequestSchema
     responses = SwaggerApiView.setResponses({200: {"description": "success", "schema": GetTaskResponseSchema}})
 
     def get(self, controller, data, oid, *args, **kwargs):
@@ -430,7 +448,7 @@ class GetTaskStatus(TaskApiView):
 
         task_manager: TaskManager = controller.get_task_manager()
         entity_class_name = data.get("entity_class")
-        res = task_manager.get_task_status(oid, entity_class_name=entity_class_name)
+        res = task_manager.get_task_status(oid, entity_class_name=entity_class_name, wait=data.get("wait"))
         resp = {"task_instance": res}
         return resp
 
@@ -520,6 +538,72 @@ class GetLog(TaskApiView):
         return resp
 
 
+class SchedulePurgeTasksParamRequestSchema(Schema):
+    schedule = fields.Dict(
+        required=False,
+        allow_none=True,
+        example={"type": "crontab", "minute": 0, "hour": 3},
+        description="purge schedule. Default every day at 3:00",
+    )
+    retention = fields.Dict(
+        required=False,
+        allow_none=True,
+        example={"test_task": 7},
+        description="retention days per task name. Default task_retention",
+    )
+    retention_days = fields.Integer(
+        required=False,
+        allow_none=True,
+        example=30,
+        description="retention days of the other tasks. Default task_retention_days",
+        validate=Range(min=1),
+    )
+    archive_path = fields.String(
+        required=False,
+        allow_none=True,
+        example="/var/lib/beehive/archive",
+        description="directory where purged tasks are archived. Default task_archive_path",
+    )
+    chunk = fields.Integer(
+        required=False,
+        allow_none=True,
+        example=500,
+        description="number of tasks deleted per transaction. Default task_purge_chunk",
+        validate=Range(min=1),
+    )
+
+
+class SchedulePurgeTasksBodyRequestSchema(Schema):
+    body = fields.Nested(SchedulePurgeTasksParamRequestSchema, context="body")
+
+
+class SchedulePurgeTasksResponseSchema(Schema):
+    schedule_name = fields.String(required=True, example="purge-tasks-schedule", description="schedule name")
+
+
+class SchedulePurgeTasks(TaskApiView):
+    summary = "Schedule the purge of the expired tasks"
+    description = "Schedule the periodic purge of the tasks in an end status older than their retention"
+    definitions = {
+        "SchedulePurgeTasksParamRequestSchema": SchedulePurgeTasksParamRequestSchema,
+        "SchedulePurgeTasksResponseSchema": SchedulePurgeTasksResponseSchema,
+    }
+    parameters = SwaggerHelper().get_parameters(SchedulePurgeTasksBodyRequestSchema)
+    parameters_schema = SchedulePurgeTasksParamRequestSchema
+    responses = SwaggerApiView.setResponses(
+        {200: {"description": "success", "schema": SchedulePurgeTasksResponseSchema}}
+    )
+
+    def post(self, controller, data, *args, **kwargs):
+        from beehive.module.scheduler_v2.controller import TaskManager
+
+        task_manager: TaskManager = controller.get_task_manager()
+        schedule = data.pop("schedule", None)
+        params = {k: v for k, v in data.items() if v is not None}
+        schedule_name = task_manager.schedule_purge_tasks(schedule=schedule, params=params)
+        return {"schedule_name": schedule_name}, 200
+
+
 # class GetTaskGraphResponseSchema(Schema):
 #     task_instance_graph = fields.Dict(required=True, default={})
 #
@@ -744,6 +828,12 @@ class TaskAPI(ApiView):
                 GetTasksDefinition,
                 {},
             ),
+            (
+                "%s/worker/tasks/purge/schedule" % module.base_path,
+                "POST",
+                SchedulePurgeTasks,
+                {},
+            ),
             ("%s/worker/tasks/<oid>" % module.base_path, "GET", GetTask, {}),
             (
                 "%s/worker/tasks/<oid>/status" % module.base_path,
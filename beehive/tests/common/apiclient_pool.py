@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import sleep, time
+from beehive.common.client.apiclient import BeehiveApiClient, BeehiveApiClientError
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = set()
+    posts = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        body = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # close connection without notify client
+        if self.path == "/close":
+            self.close_connection = True
+
+    def do_DELETE(self):
+        Handler.connections.add(self.client_address)
+        self.send_response(204)
+        self.end_headers()
+
+    def do_POST(self):
+        # close connection without response
+        Handler.posts += 1
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.close_connection = True
+
+
+class ApiClientPoolTestCase(unittest.TestCase):
+    requests = 500
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.port = cls.server.server_address[1]
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.connections = set()
+        Handler.posts = 0
+
+    def get_client(self, pool_size=10, pool_idle=30.0):
+        return BeehiveApiClient([], "keyauth", None, "", None, pool_size=pool_size, pool_idle=pool_idle)
+
+    def call(self, client, path="/ping", method="GET"):
+        return client.http_client("http", "127.0.0.1", path, method, port=self.port, headers={}, silent=True)
+
+    def test_keep_alive(self):
+        client = self.get_client()
+        for i in range(10):
+            self.assertEqual(self.call(client), {"status": "ok"})
+            self.assertEqual(self.call(client, path="/item", method="DELETE"), {})
+        self.assertEqual(len(Handler.connections), 1)
+        self.assertEqual(client.pool.info()["reused"], 19)
+
+    def test_closed_connection(self):
+        client = self.get_client()
+        self.call(client, path="/close")
+        sleep(0.1)
+        self.assertEqual(self.call(client), {"status": "ok"})
+        self.assertEqual(len(Handler.connections), 2)
+        self.assertEqual(client.pool.info()["discarded"], 1)
+
+    def test_not_idempotent_request(self):
+        client = self.get_client()
+        self.call(client)
+        # request is not sent again on a new connection when response can not be read
+        with self.assertRaises(BeehiveApiClientError):
+            client.http_client("http", "127.0.0.1", "/item", "POST", port=self.port, data="{}", headers={}, silent=True)
+        self.assertEqual(Handler.posts, 1)
+
+    def test_idle_eviction(self):
+        client = self.get_client(pool_idle=0)
+        self.call(client)
+        self.call(client)
+        self.assertEqual(len(Handler.connections), 2)
+        self.assertEqual(client.pool.info()["evicted"], 1)
+
+    def test_benchmark(self):
+        client = self.get_client(pool_size=0)
+        start = time()
+        for i in range(self.requests):
+            self.call(client)
+        legacy = self.requests / (time() - start)
+        self.assertEqual(len(Handler.connections), self.requests)
+
+        Handler.connections = set()
+        client = self.get_client()
+        start = time()
+        for i in range(self.requests):
+            self.call(client)
+        pooled = self.requests / (time() - start)
+        self.assertEqual(len(Handler.connections), 1)
+        print("send %s requests - new connection: %.0f req/s keep-alive: %.0f req/s" % (self.requests, legacy, pooled))
+        self.assertGreater(pooled, legacy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import gevent
+import unittest
+from beehive.common.audit import Audit, AuditShipper
+
+
+class ElasticStub(object):
+    """Local elasticsearch stub that records bulk requests"""
+
+    def __init__(self, fail=False, errors=0):
+        self.fail = fail
+        self.errors = errors
+        self.bulks = []
+        self.indexed = []
+
+    def index(self, index=None, document=None):
+        self.indexed.append((index, document))
+
+    def bulk(self, operations=None):
+        if self.fail is True:
+            raise Exception("elasticsearch is not reachable")
+        self.bulks.append(operations)
+        items = []
+        for i in range(int(len(operations) / 2)):
+            if i < self.errors:
+                items.append({"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}})
+            else:
+                items.append({"index": {"status": 201}})
+        return {"errors": self.errors > 0, "items": items}
+
+
+class AuditShipperTestCase(unittest.TestCase):
+    def put(self, shipper, num):
+        for i in range(num):
+            shipper.put("cmp-audit-log-test", {"http.request.id": i})
+
+    def test_batch_size(self):
+        elastic = ElasticStub()
+        shipper = AuditShipper(elastic, queue_size=100, batch_size=10, flush_interval=60)
+        self.put(shipper, 25)
+        gevent.sleep(0.1)
+        self.assertEqual([len(b) / 2 for b in elastic.bulks], [10, 10])
+        shipper.stop()
+        self.assertEqual([len(b) / 2 for b in elastic.bulks], [10, 10, 5])
+        self.assertEqual(shipper.info()["sent"], 25)
+        self.assertEqual(shipper.info()["batches"], 3)
+        self.assertEqual(elastic.bulks[0][0], {"index": {"_index": "cmp-audit-log-test"}})
+
+    def test_flush_interval(self):
+        elastic = ElasticStub()
+        shipper = AuditShipper(elastic, queue_size=100, batch_size=100, flush_interval=0.2)
+        self.put(shipper, 5)
+        gevent.sleep(0.05)
+        self.assertEqual(len(elastic.bulks), 0)
+        gevent.sleep(0.3)
+        self.assertEqual(len(elastic.bulks), 1)
+        self.assertEqual(shipper.info()["sent"], 5)
+        shipper.stop()
+
+    def test_drop_new(self):
+        elastic = ElasticStub()
+        shipper = AuditShipper(elastic, queue_size=5, batch_size=100, flush_interval=60)
+        self.put(shipper, 8)
+        self.assertEqual(shipper.info()["dropped"], 3)
+        shipper.stop()
+        self.assertEqual([d["http.request.id"] for d in elastic.bulks[0][1::2]], [0, 1, 2, 3, 4])
+
+    def test_drop_oldest(self):
+        elastic = ElasticStub()
+        shipper = AuditShipper(elastic, queue_size=5, batch_size=100, flush_interval=60, drop_policy="drop_oldest")
+        self.put(shipper, 8)
+        self.assertEqual(shipper.info()["dropped"], 3)
+        shipper.stop()
+        self.assertEqual([d["http.request.id"] for d in elastic.bulks[0][1::2]], [3, 4, 5, 6, 7])
+
+    def test_failures(self):
+        elastic = ElasticStub(errors=2)
+        shipper = AuditShipper(elastic, queue_size=100, batch_size=5, flush_interval=60)
+        self.put(shipper, 5)
+        gevent.sleep(0.1)
+        self.assertEqual(shipper.info()["sent"], 3)
+        self.assertEqual(shipper.info()["failed"], 2)
+
+        elastic.fail = True
+        self.put(shipper, 5)
+        shipper.stop()
+        self.assertEqual(shipper.info()["failed"], 7)
+
+    def test_send_audit(self):
+        elastic = ElasticStub()
+        shipper = AuditShipper(elastic, queue_size=100, batch_size=100, flush_interval=60)
+        audit = Audit(state=200, api_method="/v1.0/server/ping", request_id="123", req_method="GET", user="test")
+        audit.send_audit(shipper, data={})
+        self.assertEqual(len(elastic.indexed), 0)
+        shipper.stop()
+        self.assertEqual(elastic.bulks[0][1]["http.request.id"], "123")
+
+
+if __name__ == "__main__":
+    unittest.main()
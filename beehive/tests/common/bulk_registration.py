@@ -0,0 +1,117 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from time import time
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model import AbstractDbManager, PermTag, PermTagEntity
+from beehive.common.model.authorization import (
+    AuthDbManager,
+    Base,
+    SysObject,
+    SysObjectAction,
+    SysObjectPermission,
+    SysObjectType,
+)
+
+
+class BulkRegistrationTestCase(unittest.TestCase):
+    """Register objects tagged like api objects: every object has the tags of all its objid levels"""
+
+    objdef = "Item"
+    accounts = 50
+    items = 20
+
+    def setUp(self):
+        self.engine = engine = create_engine("sqlite://")
+        PermTag.__table__.create(engine)
+        PermTagEntity.__table__.create(engine)
+        Base.metadata.create_all(
+            engine,
+            tables=[t.__table__ for t in [SysObjectType, SysObjectAction, SysObject, SysObjectPermission]],
+        )
+        self.session = sessionmaker(bind=engine)()
+        operation.session = self.session
+        operation.transaction = None
+        self.manager = AbstractDbManager(session=self.session)
+
+    def get_items(self, start=0):
+        oid = start * self.items
+        items = []
+        for account in range(start, self.accounts):
+            for item in range(self.items):
+                oid += 1
+                objid = "%s//%s" % (account, item)
+                for level in self.manager.get_all_valid_objids(objid.split("//")):
+                    tag = self.manager.hash_from_permission(self.objdef, level)
+                    items.append((tag, "%s-%s" % (self.objdef.lower(), level), oid, self.objdef))
+        return items
+
+    def count(self, entity):
+        return self.session.query(func.count(entity.id)).scalar()
+
+    def test_add_perm_tags(self):
+        items = self.get_items()
+        half = self.get_items(start=self.accounts // 2)
+        self.assertEqual(self.manager.add_perm_tags(half), len(half))
+        # existing tags and associations are skipped
+        self.assertEqual(self.manager.add_perm_tags(items), len(items) - len(half))
+        self.assertEqual(self.manager.add_perm_tags(items), 0)
+        self.assertEqual(self.count(PermTag), 1 + self.accounts + self.accounts * self.items)
+        self.assertEqual(self.count(PermTagEntity), len(items))
+
+    def test_add_perm_tags_concurrent(self):
+        items = self.get_items(start=self.accounts - 1)
+        tag_ids = {}
+
+        def register_concurrently(conn, clauseelement, multiparams, params, execution_options):
+            # another registration adds the first association after it has been checked
+            if not tag_ids and getattr(clauseelement, "table", None) is PermTagEntity.__table__:
+                tag_ids.update(self.manager.get_perm_tag_ids([items[0][0]]))
+                conn.execute(PermTagEntity.__table__.insert(), [{"tag": tag_ids[items[0][0]], "entity": items[0][2]}])
+
+        event.listen(self.engine, "before_execute", register_concurrently)
+        try:
+            self.manager.add_perm_tags(items)
+        finally:
+            event.remove(self.engine, "before_execute", register_concurrently)
+        self.assertTrue(tag_ids)
+        self.assertEqual(self.count(PermTagEntity), len(items))
+
+    def test_add_objects(self):
+        manager = AuthDbManager(session=self.session)
+        manager.add_object_types([("auth", self.objdef)])
+        manager.add_object_actions(["view", "update"])
+        obj_type = manager.get_object_type(objtype="auth", objdef=self.objdef)[0][0]
+        actions = manager.get_object_action()
+
+        objs = [(obj_type, "%s//*" % account, "") for account in range(self.accounts)]
+        self.assertEqual(len(manager.add_objects(objs[:10], actions)), 10)
+        # existing and duplicated objects are skipped
+        self.assertEqual(len(manager.add_objects(objs + objs, actions)), self.accounts - 10)
+        self.assertEqual(self.count(SysObject), self.accounts)
+        self.assertEqual(self.count(SysObjectPermission), self.accounts * 2)
+
+    def test_benchmark(self):
+        items = self.get_items()
+        start = time()
+        for tag, explain, entity, etype in items:
+            self.manager.add_perm_tag(tag, explain, entity, etype)
+        legacy = time() - start
+        self.session.query(PermTagEntity).delete()
+        self.session.query(PermTag).delete()
+        self.session.commit()
+
+        start = time()
+        self.manager.add_perm_tags(items)
+        bulk = time() - start
+        self.assertEqual(self.count(PermTagEntity), len(items))
+        print("register %s permission tags - legacy: %.3fs bulk: %.3fs" % (len(items), legacy, bulk))
+        self.assertLess(bulk, legacy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from time import sleep, time
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.module.catalog.tasks_v2 import RefreshCatalogTask
+
+
+class PingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        sleep(0.2)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class RefreshCatalogTestCase(unittest.TestCase):
+    """Alive endpoints answer ping after 0.2s. Dead endpoints point to a closed port."""
+
+    alive = 20
+    dead = 5
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), PingHandler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.deleted = []
+        self.endpoints = []
+        for i in range(self.alive + self.dead):
+            port = self.server.server_port if i % 5 != 0 else 1
+            self.endpoints.append(
+                SimpleNamespace(
+                    name="endpoint-%s" % i,
+                    uuid="endpoint-%s" % i,
+                    model=SimpleNamespace(uri="http://127.0.0.1:%s" % port),
+                    delete=self.delete,
+                )
+            )
+        self.task = RefreshCatalogTask()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delete(self):
+        operation.session.execute(text("SELECT 1"))
+        self.deleted.append(operation.transaction)
+
+    def test_ping_endpoints(self):
+        start = time()
+        pings = self.task.ping_endpoints(self.endpoints)
+        elapsed = time() - start
+        self.assertEqual(pings, [i % 5 != 0 for i in range(len(self.endpoints))])
+        # sequential pings take alive * 0.2s
+        self.assertLess(elapsed, self.alive * 0.2 / 2)
+
+    def test_remove_endpoints(self):
+        engine = create_engine("sqlite://")
+        session = sessionmaker(bind=engine)()
+        commits = []
+        event.listen(session, "after_commit", lambda s: commits.append(1))
+        operation.session = session
+        operation.transaction = None
+
+        self.task.remove_endpoints(self.endpoints[: self.dead])
+        self.assertEqual(len(self.deleted), self.dead)
+        # all endpoints are deleted in the same transaction
+        self.assertEqual(len(set(self.deleted)), 1)
+        self.assertEqual(len(commits), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from time import time
+from types import SimpleNamespace
+from unittest import mock
+from beehive.module.event import manager
+from beehive.module.event.manager import EventConsumer
+
+
+class Elastic(object):
+    def __init__(self, fail=False, errors=None):
+        self.fail = fail
+        self.errors = errors or []
+        self.requests = []
+
+    def index(self, index=None, body=None):
+        self.requests.append([body])
+
+    def bulk(self, operations=None):
+        if self.fail is True:
+            raise Exception("connection error")
+        docs = operations[1::2]
+        self.requests.append(docs)
+        items = []
+        for doc in docs:
+            error = None
+            if doc["event_id"] in self.errors:
+                error = {"type": "mapper_parsing_exception"}
+            items.append({"index": {"status": 201, "error": error}})
+        return {"errors": len(self.errors) > 0, "items": items}
+
+
+class LogBeatClient(object):
+    fail = False
+    frames = []
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def connect(self):
+        if LogBeatClient.fail is True:
+            raise OSError("connection refused")
+        LogBeatClient.connections += 1
+
+    def send(self, msgs):
+        if LogBeatClient.fail is True:
+            raise OSError("connection reset")
+        LogBeatClient.frames.append(msgs)
+
+    def close(self):
+        pass
+
+
+class Message(object):
+    def __init__(self):
+        self.state = None
+
+    @property
+    def acknowledged(self):
+        return self.state is not None
+
+    def set_state(self, state):
+        if self.acknowledged:
+            raise Exception("Message already acknowledged with state %s" % self.state)
+        self.state = state
+
+    def ack(self):
+        self.set_state("ack")
+
+    def reject(self):
+        self.set_state("reject")
+
+    def requeue(self):
+        self.set_state("requeue")
+
+
+class EventBulkTestCase(unittest.TestCase):
+    def setUp(self):
+        LogBeatClient.fail = False
+        LogBeatClient.frames = []
+        LogBeatClient.connections = 0
+        patcher = mock.patch.object(manager, "PyLogBeatClient", LogBeatClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_consumer(self, elastic, logstash=None, **params):
+        api_manager = SimpleNamespace(
+            db_manager=None,
+            elasticsearch=elastic,
+            logstash=logstash,
+            pod="pod",
+            server_name="localhost",
+            app_env="test",
+            broker_event_uri="memory://",
+            broker_event_exchange="beehive.event",
+            params=params,
+        )
+        return EventConsumer(None, api_manager)
+
+    def send(self, consumer, size):
+        messages = []
+        for i in range(size):
+            event = {
+                "id": "event-%s" % i,
+                "type": "API",
+                "dest": {},
+                "source": {},
+                "creation": time(),
+                "data": {},
+            }
+            message = Message()
+            consumer.callback(event, message)
+            messages.append(message)
+        return messages
+
+    def test_single_index(self):
+        elastic = Elastic()
+        consumer = self.get_consumer(elastic)
+        messages = self.send(consumer, 5)
+        self.assertEqual(len(elastic.requests), 5)
+        self.assertEqual([m.state for m in messages], ["ack"] * 5)
+
+    def test_bulk_size(self):
+        elastic = Elastic()
+        consumer = self.get_consumer(elastic, event_bulk_size=10)
+        self.assertEqual(consumer.prefetch_count, 20)
+        messages = self.send(consumer, 25)
+        self.assertEqual([len(r) for r in elastic.requests], [10, 10])
+        # messages are acked only after the bulk is written
+        self.assertEqual([m.state for m in messages[20:]], [None] * 5)
+        self.assertEqual([m.state for m in messages[:20]], ["ack"] * 20)
+
+        # pending events are written when the bulk interval is elapsed
+        consumer.on_iteration()
+        self.assertEqual(len(elastic.requests), 2)
+        consumer.bulk_deadline = time()
+        consumer.on_iteration()
+        self.assertEqual([len(r) for r in elastic.requests], [10, 10, 5])
+        self.assertEqual([m.state for m in messages], ["ack"] * 25)
+
+    def test_bulk_errors(self):
+        elastic = Elastic(errors=["event-3"])
+        consumer = self.get_consumer(elastic, event_bulk_size=5)
+        messages = self.send(consumer, 5)
+        self.assertEqual([m.state for m in messages], ["ack"] * 3 + ["reject", "ack"])
+        self.assertEqual(consumer.bulk_stats["failed"], 1)
+
+    def test_bulk_backoff(self):
+        elastic = Elastic(fail=True)
+        consumer = self.get_consumer(elastic, event_bulk_size=5, event_bulk_buffer_size=10)
+        messages = self.send(consumer, 15)
+        # events are kept while elastic search is unreachable
+        self.assertEqual([m.state for m in messages], [None] * 10 + ["requeue"] * 5)
+        info = consumer.info()
+        self.assertEqual(info["pending"], 10)
+        self.assertEqual(info["backoff"], 1.0)
+        self.assertGreaterEqual(consumer.bulk_deadline, consumer.elastic_retry_time)
+
+        # bulk is not written again before the backoff is elapsed
+        elastic.fail = False
+        consumer.bulk_deadline = 0
+        consumer.on_iteration()
+        self.assertEqual(len(elastic.requests), 0)
+        consumer.elastic_retry_time = 0
+        consumer.bulk_deadline = 0
+        consumer.on_iteration()
+        self.assertEqual([len(r) for r in elastic.requests], [10])
+        self.assertEqual([m.state for m in messages], ["ack"] * 10 + ["requeue"] * 5)
+        self.assertEqual(consumer.info()["backoff"], 0)
+
+    def test_bulk_handler_error(self):
+        elastic = Elastic(errors=["event-1"])
+        consumer = self.get_consumer(elastic, event_bulk_size=3)
+        handler = mock.Mock()
+        handler.callback.side_effect = manager.EventConsumerError("handler error")
+        consumer.event_handlers = [handler]
+
+        # message of a pending event is not acked when an handler fails
+        messages = self.send(consumer, 2)
+        self.assertEqual([m.state for m in messages], [None] * 2)
+        messages += self.send(consumer, 1)
+        self.assertEqual([m.state for m in messages], ["ack", "reject", "ack"])
+
+    def get_logstash(self):
+        return {"host": "localhost", "port": 5044, "ca": "Y2E=", "cert": "Y2VydA==", "pkey": "a2V5"}
+
+    def test_logstash_connection(self):
+        consumer = self.get_consumer(None, logstash=self.get_logstash())
+        messages = self.send(consumer, 5)
+        # connection is reused
+        self.assertEqual(LogBeatClient.connections, 1)
+        self.assertEqual([len(f) for f in LogBeatClient.frames], [1] * 5)
+        self.assertEqual([m.state for m in messages], ["ack"] * 5)
+
+    def test_logstash_backoff(self):
+        consumer = self.get_consumer(None, logstash=self.get_logstash())
+        LogBeatClient.fail = True
+        messages = self.send(consumer, 1)
+        # event is requeued, not dropped
+        self.assertEqual([m.state for m in messages], ["requeue"])
+        self.assertEqual(consumer.logstash_sender.backoff, 1.0)
+
+        # next event waits the reconnect backoff before sending
+        LogBeatClient.fail = False
+        sender = consumer.logstash_sender
+        with mock.patch.object(manager, "sleep", side_effect=lambda wait: setattr(sender, "retry_time", 0)) as sleep:
+            messages = self.send(consumer, 1)
+        self.assertLessEqual(sleep.call_args[0][0], 1.0)
+        self.assertEqual([m.state for m in messages], ["ack"])
+        self.assertEqual(LogBeatClient.connections, 1)
+
+    def test_logstash_bulk(self):
+        consumer = self.get_consumer(None, logstash=self.get_logstash(), event_bulk_size=10, event_bulk_buffer_size=20)
+        self.send(consumer, 10)
+        self.assertEqual([len(f) for f in LogBeatClient.frames], [10])
+
+        # events are kept while logstash is unreachable
+        LogBeatClient.fail = True
+        consumer.logstash_sender.close()
+        messages = self.send(consumer, 25)
+        self.assertEqual([m.state for m in messages], [None] * 20 + ["requeue"] * 5)
+        info = consumer.info()
+        self.assertEqual(info["pending"], 20)
+        self.assertEqual(info["logstash"]["failures"], 1)
+        self.assertEqual(info["logstash"]["backoff"], 1.0)
+
+        # events are sent when the backoff is elapsed
+        LogBeatClient.fail = False
+        consumer.on_iteration()
+        self.assertEqual(len(LogBeatClient.frames), 1)
+        consumer.logstash_sender.retry_time = 0
+        consumer.bulk_deadline = 0
+        consumer.on_iteration()
+        self.assertEqual([len(f) for f in LogBeatClient.frames], [10, 10, 10])
+        self.assertEqual([m.state for m in messages], ["ack"] * 20 + ["requeue"] * 5)
+        info = consumer.info()
+        self.assertEqual(info["logstash"]["reconnects"], 1)
+        self.assertEqual(info["logstash"]["backoff"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
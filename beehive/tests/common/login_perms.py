@@ -0,0 +1,109 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model.authorization import (
+    AuthDbManager,
+    Base,
+    Group,
+    Role,
+    RoleGroup,
+    RoleUser,
+    SysObject,
+    SysObjectAction,
+    SysObjectPermission,
+    SysObjectType,
+    User,
+)
+
+
+class LoginPermissionsTestCase(unittest.TestCase):
+    """User with a direct role and many groups. Every role has its own permissions plus a permission shared by all
+    the roles.
+    """
+
+    groups = 50
+    perms = 10
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        operation.session = self.session
+        operation.transaction = None
+        self.manager = AuthDbManager(session=self.session)
+        AuthDbManager.role_perms_cache.remove()
+
+        obj_type = SysObjectType("auth", "Item", None)
+        action = SysObjectAction("view")
+        shared = SysObjectPermission(SysObject(obj_type, "*", desc=""), action)
+        self.session.add_all([obj_type, action, shared])
+
+        def add_role(name):
+            perms = [shared]
+            for i in range(self.perms):
+                perms.append(SysObjectPermission(SysObject(obj_type, "%s//%s" % (name, i), desc=""), action))
+            role = Role(name, name, perms)
+            self.session.add(role)
+            return role
+
+        self.user = User("user", "user")
+        role = add_role("user-role")
+        self.session.add(self.user)
+        self.session.flush()
+        self.session.add(RoleUser(self.user.id, role.id))
+        for i in range(self.groups):
+            role = add_role("group-role-%s" % i)
+            group = Group("group-%s" % i, "group-%s" % i, member=[self.user])
+            self.session.add(group)
+            self.session.flush()
+            self.session.add(RoleGroup(group.id, role.id))
+
+        # expired group role
+        self.expired = add_role("expired-role")
+        self.session.flush()
+        self.session.add(RoleGroup(group.id, self.expired.id, expiry_date=datetime.today() - timedelta(days=1)))
+        self.session.commit()
+        self.session.refresh(self.user)
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.count)
+
+    def count(self, *args):
+        self.statements.append(args[2])
+
+    def test_get_login_permissions(self):
+        perms = self.manager.get_login_permissions(self.user)
+        self.assertEqual(len(perms), 1 + (self.groups + 1) * self.perms)
+        self.assertNotIn("expired-role//0", [p[4] for p in perms])
+        # roles query and role permissions query, whatever the number of groups
+        self.assertEqual(len(self.statements), 2)
+
+        # role permissions are read from cache
+        self.statements.clear()
+        self.assertEqual(sorted(self.manager.get_login_permissions(self.user)), sorted(perms))
+        self.assertEqual(len(self.statements), 1)
+
+    def test_invalidate_role_permissions(self):
+        self.manager.get_login_permissions(self.user)
+        role = self.session.query(Role).filter_by(name="user-role").one()
+        perm = self.session.query(SysObjectPermission).join(SysObject).filter(SysObject.objid == "expired-role//0")
+        self.manager.append_role_permissions(role, [perm.one()])
+        perms = self.manager.get_login_permissions(self.user)
+        self.assertIn("expired-role//0", [p[4] for p in perms])
+
+        self.manager.remove_role_permission(role, [perm.one()])
+        perms = self.manager.get_login_permissions(self.user)
+        self.assertNotIn("expired-role//0", [p[4] for p in perms])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from time import sleep
+from beehive.common.maintenance import MaintenanceCache
+
+
+class RedisStub(object):
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key, None)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+
+class MaintenanceCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.redis = RedisStub()
+        self.key = MaintenanceCache.get_key("auth", "get")
+
+    def test_cache(self):
+        cache = MaintenanceCache(ttl=60)
+        for i in range(100):
+            self.assertIsNone(cache.get(self.redis, self.key))
+        self.assertEqual(self.redis.gets, 1)
+
+        self.redis.set(self.key, b"False")
+        cache.invalidate(self.key)
+        self.assertEqual(cache.get(self.redis, self.key), b"False")
+        self.assertEqual(self.redis.gets, 2)
+        self.assertEqual(cache.info()["hits"], 99)
+
+    def test_expire(self):
+        cache = MaintenanceCache(ttl=0.1)
+        self.assertIsNone(cache.get(self.redis, self.key))
+        self.redis.set(self.key, b"False")
+        self.assertIsNone(cache.get(self.redis, self.key))
+        sleep(0.15)
+        self.assertEqual(cache.get(self.redis, self.key), b"False")
+
+    def test_no_cache(self):
+        cache = MaintenanceCache(ttl=0)
+        for i in range(10):
+            cache.get(self.redis, self.key)
+        self.assertEqual(self.redis.gets, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
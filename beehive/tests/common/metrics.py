@@ -0,0 +1,84 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import logging
+import unittest
+from beecell.simple import truncate
+from beehive.common.metrics import Histogram, MetricsRegistry, PhaseTimer
+from beehive.common.data import LazyParams
+
+
+class RenderCounter(object):
+    def __init__(self):
+        self.rendered = 0
+
+    def __str__(self):
+        self.rendered += 1
+        return "counter"
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_observe(self):
+        hist = Histogram("test", buckets=(0.1, 1.0))
+        for value in [0.05, 0.05, 0.5, 2.0]:
+            hist.observe(value)
+        info = hist.info()
+        self.assertEqual(info["count"], 4)
+        self.assertEqual(info["min"], 0.05)
+        self.assertEqual(info["max"], 2.0)
+        self.assertEqual(info["buckets"], {"0.1": 2, "1.0": 3, "+Inf": 4})
+        self.assertEqual(info["p50"], 0.1)
+        self.assertEqual(info["p99"], 2.0)
+
+    def test_registry(self):
+        registry = MetricsRegistry()
+        registry.observe("query.a", 0.01)
+        registry.observe("query.a", 0.02)
+        registry.observe("transaction.b", 0.01)
+        self.assertEqual(list(registry.info(prefix="query.").keys()), ["query.a"])
+        self.assertEqual(registry.info()["query.a"]["count"], 2)
+
+        registry.enabled = False
+        registry.observe("query.a", 0.01)
+        self.assertEqual(registry.info()["query.a"]["count"], 2)
+
+        registry.reset()
+        self.assertEqual(registry.info(), {})
+
+
+class PhaseTimerTestCase(unittest.TestCase):
+    def test_phases(self):
+        registry = MetricsRegistry()
+        timer = PhaseTimer("api", registry=registry)
+        timer.mark("auth")
+        timer.skip()
+        timer.mark("handler")
+        timer.mark("handler")
+        timer.observe("GET /v1.0/server/ping")
+        self.assertEqual(list(timer.phases.keys()), ["auth", "handler"])
+        info = registry.info()
+        self.assertEqual(
+            sorted(info.keys()),
+            ["api.GET /v1.0/server/ping", "api.phase.auth", "api.phase.handler", "api.total"],
+        )
+        self.assertEqual(info["api.phase.handler"]["count"], 1)
+
+
+class LazyParamsTestCase(unittest.TestCase):
+    def test_render(self):
+        args = ("a", 1)
+        kwargs = {"k": "v"}
+        params = LazyParams(args, kwargs)
+        self.assertEqual(str(params), truncate(["a", "1", "'k':'v'"]))
+
+    def test_not_rendered_when_disabled(self):
+        logger = logging.getLogger("beehive.tests.lazyparams")
+        logger.setLevel(logging.ERROR)
+        counter = RenderCounter()
+        logger.debug("%s", LazyParams((counter,), {}))
+        self.assertEqual(counter.rendered, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
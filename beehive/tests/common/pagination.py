@@ -0,0 +1,132 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from types import SimpleNamespace
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from beecell.db import QueryError
+from marshmallow import ValidationError
+from beehive.common.apimanager import ApiManagerError, ApiView, CursorPaginatedRequestQuerySchema
+from beehive.common.model import PaginatedQueryGenerator, QueryTotal
+from beehive.common.model.authorization import User
+
+
+class KeysetPaginationTestCase(unittest.TestCase):
+    def get_query(self, order="DESC", field="name", cursor=None):
+        query = PaginatedQueryGenerator(User, None, with_perm_tag=False)
+        query.set_pagination(page=100, size=10, order=order, field=field)
+        query.set_cursor(cursor)
+        return query
+
+    def test_cursor(self):
+        cursor = PaginatedQueryGenerator.encode_cursor("user1@local", 10)
+        self.assertEqual(PaginatedQueryGenerator.decode_cursor(cursor), ["user1@local", 10])
+        self.assertRaises(QueryError, PaginatedQueryGenerator.decode_cursor, "not-a-cursor")
+
+    def test_first_page(self):
+        stmp = str(self.get_query(cursor="").base_stmp())
+        self.assertNotIn(":cursor_id", stmp)
+        self.assertTrue(stmp.endswith("ORDER BY t3.name DESC, t3.id DESC LIMIT 10"))
+
+    def test_next_page(self):
+        query = self.get_query(cursor=PaginatedQueryGenerator.encode_cursor("user1@local", 10))
+        stmp = str(query.base_stmp2())
+        self.assertIn("AND (t3.name < :cursor_value OR (t3.name = :cursor_value AND t3.id < :cursor_id))", stmp)
+        self.assertTrue(stmp.endswith("LIMIT 10"))
+        self.assertEqual(query.get_cursor_params(), {"cursor_value": "user1@local", "cursor_id": 10})
+
+        # count is not filtered by cursor
+        self.assertNotIn(":cursor_id", str(query.base_stmp2(count=True)))
+
+    def test_next_page_by_id(self):
+        query = self.get_query(order="ASC", field="id", cursor=PaginatedQueryGenerator.encode_cursor(10, 10))
+        stmp = str(query.base_stmp())
+        self.assertIn("AND t3.id > :cursor_id", stmp)
+        self.assertTrue(stmp.endswith("ORDER BY t3.id ASC LIMIT 10"))
+
+    def test_pages_by_objid(self):
+        engine = create_engine("sqlite://")
+        User.__table__.create(engine)
+        session = sessionmaker(bind=engine)()
+        # objid order is the reverse of id order
+        users = [{"objid": "objid-%02d" % (25 - i), "name": "user%s@local" % i} for i in range(25)]
+        session.execute(User.__table__.insert(), users)
+        session.commit()
+
+        view = ApiView()
+        names = []
+        cursor = ""
+        while cursor is not None:
+            query = PaginatedQueryGenerator(User, session, with_perm_tag=False)
+            query.set_pagination(size=10, order="ASC", field="objid")
+            entities, total = query.run([], cursor=cursor)
+            objs = [SimpleNamespace(model=e) for e in entities]
+            # like User.info() objid is not a key of the rendered item
+            res = [{"id": e.id, "name": e.name, "__meta__": {"objid": e.objid}} for e in entities]
+            resp = view.format_paginated_response(res, "users", total, field="objid", objs=objs, size=10, cursor=cursor)
+            names.extend(item["name"] for item in resp["users"])
+            cursor = resp["next_cursor"]
+        self.assertEqual(names, ["user%s@local" % i for i in range(24, -1, -1)])
+
+        # sorting field must be a column of the db model
+        self.assertRaises(ApiManagerError, view.get_next_cursor, res, field="creation", size=1, objs=objs)
+
+    def test_cursor_fields(self):
+        class ListEventsRequestSchema(CursorPaginatedRequestQuerySchema):
+            cursor_fields = ["id", "objid"]
+
+        schema = ListEventsRequestSchema()
+        self.assertEqual(schema.load({"cursor": "", "field": "objid"})["field"], "objid")
+        self.assertEqual(schema.load({"field": "name"})["field"], "name")
+        with self.assertRaises(ValidationError) as ctx:
+            schema.load({"cursor": "", "field": "name"})
+        self.assertIn("field", ctx.exception.messages)
+
+
+class CountStrategyTestCase(unittest.TestCase):
+    def get_query(self, strategy, page=1, cache=None):
+        query = PaginatedQueryGenerator(User, None, with_perm_tag=False)
+        query.set_pagination(page=page, size=2, order="DESC", field="id")
+        query.set_count_strategy(strategy, cache=cache)
+        return query
+
+    def test_fallback(self):
+        self.assertRaises(QueryError, self.get_query, "unknown")
+        self.assertEqual(self.get_query("cached").count_strategy, "exact")
+        self.assertEqual(self.get_query("cached", cache=object()).count_strategy, "cached")
+
+    def test_cached(self):
+        class Cache(object):
+            def get(self, key):
+                return 7
+
+        query = self.get_query("cached", cache=Cache())
+        self.assertEqual(query.count(query.base_stmp(count=True), [], {}), 7)
+
+    def test_window(self):
+        query = self.get_query("window")
+        self.assertIn("count(*) over() as query_total", str(query.base_stmp()))
+        self.assertNotIn("over()", str(query.base_stmp(count=True)))
+        res, total = query.get_total([("u1", 5), ("u2", 5)], None, [], {})
+        self.assertEqual(res, ["u1", "u2"])
+        self.assertEqual((total, total.strategy), (5, "window"))
+
+    def test_has_more(self):
+        query = self.get_query("has_more")
+        self.assertTrue(str(query.base_stmp()).endswith("LIMIT 2,3"))
+        res, total = query.get_total(["u1", "u2", "u3"], None, [], {})
+        self.assertEqual(res, ["u1", "u2"])
+        self.assertEqual((total, total.has_more), (5, True))
+        res, total = query.get_total(["u1"], None, [], {})
+        self.assertEqual((total, total.has_more), (3, False))
+
+    def test_total(self):
+        total = QueryTotal(10, strategy="cached")
+        self.assertEqual(total + 1, 11)
+        self.assertEqual(total.strategy, "cached")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from time import time
+from sqlalchemy import create_engine, bindparam, Column, Integer, String
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from beehive.common.data import operation
+from beehive.common.model import AbstractDbManager, PaginatedQueryGenerator, PermTag, PermTagEntity
+from beehive.common.perms import PermissionIndex
+
+Fixture = declarative_base()
+
+
+class Item(Fixture):
+    __tablename__ = "item"
+
+    id = Column(Integer, primary_key=True)
+    objid = Column(String(400))
+    name = Column(String(100))
+
+
+class SqlitePaginatedQueryGenerator(PaginatedQueryGenerator):
+    """sqlite driver does not expand list params like mysql driver"""
+
+    def base_stmp(self, count=False):
+        stmp = PaginatedQueryGenerator.base_stmp(self, count=count)
+        params = [bindparam(k, expanding=True) for k in ["tags", "tag_ids"] if ":%s " % k in stmp.text]
+        return stmp.bindparams(*params)
+
+
+class PermTagsTestCase(unittest.TestCase):
+    """Seed items tagged like api objects: every item has the tags of all its objid levels. Identity can view the
+    items of the first 500 accounts.
+    """
+
+    objdef = "Item"
+    accounts = 1000
+    items = 10
+
+    @classmethod
+    def setUpClass(cls):
+        engine = create_engine("sqlite://")
+        Fixture.metadata.create_all(engine)
+        PermTag.__table__.create(engine)
+        PermTagEntity.__table__.create(engine)
+        cls.session = sessionmaker(bind=engine)()
+        cls.manager = AbstractDbManager(session=cls.session)
+
+        tags = {}
+        oid = 0
+        for account in range(cls.accounts):
+            for item in range(cls.items):
+                oid += 1
+                objid = "%s//%s" % (account, item)
+                cls.session.add(Item(id=oid, objid=objid, name="item-%s" % oid))
+                for level in cls.manager.get_all_valid_objids(objid.split("//")):
+                    tag = cls.manager.hash_from_permission(cls.objdef, level)
+                    if tag not in tags:
+                        tags[tag] = len(tags) + 1
+                        cls.session.add(PermTag(tag))
+                    cls.session.add(PermTagEntity(tags[tag], oid, cls.objdef))
+        cls.session.commit()
+
+        perms = [
+            (1, account, "auth", cls.objdef, "%s//*" % account, 1, "view") for account in range(0, cls.accounts, 2)
+        ]
+        # permission on accounts without items
+        perms.extend([(1, 0, "auth", cls.objdef, "%s//*" % account, 1, "view") for account in range(5000, 5100)])
+        cls.index = PermissionIndex(perms)
+        operation.session = cls.session
+
+    def run_query(self, tags, **kvargs):
+        query = SqlitePaginatedQueryGenerator(Item, self.session)
+        query.set_pagination(page=0, size=20, order="DESC", field="id")
+        return query.run(tags, **kvargs)
+
+    def test_get_tag_ids(self):
+        resolved = []
+
+        def resolve(tags):
+            resolved.append(len(tags))
+            return self.manager.get_perm_tag_ids(tags)
+
+        index = PermissionIndex(self.index.perms)
+        ids = index.get_tag_ids("view", "auth", self.objdef, self.manager.hash_from_permission, resolve)
+        self.assertEqual(len(ids), self.accounts / 2)
+        index.get_tag_ids("view", "auth", self.objdef, self.manager.hash_from_permission, resolve, miss_ttl=60)
+        # only missing tags are resolved again
+        index.get_tag_ids("view", "auth", self.objdef, self.manager.hash_from_permission, resolve)
+        self.assertEqual(resolved, [600, 100])
+
+    def test_benchmark(self):
+        tags = self.index.get_tags("view", "auth", self.objdef, self.manager.hash_from_permission)
+        tag_ids = self.index.get_tag_ids(
+            "view", "auth", self.objdef, self.manager.hash_from_permission, self.manager.get_perm_tag_ids
+        )
+        res1, total1 = self.run_query(tags)
+        res2, total2 = self.run_query(tags, tag_ids=tag_ids)
+        self.assertEqual([i.id for i in res1], [i.id for i in res2])
+        self.assertEqual(total1, total2)
+        self.assertEqual(total1, self.accounts * self.items / 2)
+
+        loops = 20
+        res = {}
+        for name, kvargs in [("tags", {}), ("tag_ids", {"tag_ids": tag_ids})]:
+            start = time()
+            for i in range(loops):
+                self.run_query(tags, **kvargs)
+            res[name] = loops / (time() - start)
+        res = {k: round(v, 1) for k, v in res.items()}
+        print("list query with %s permission tags - queries/s: %s" % (len(tags), res))
+
+    def test_keep_perm_tags(self):
+        tags = [
+            self.manager.hash_from_permission(self.objdef, level)
+            for level in self.manager.get_all_valid_objids(["0", "0"])
+        ]
+        ids = self.manager.get_perm_tag_ids(tags)
+        AbstractDbManager.keep_perm_tags = True
+        try:
+            self.manager.delete_perm_tag(1, self.objdef, tags)
+            self.session.commit()
+            # tags are kept also when they are not used anymore
+            self.assertEqual(self.manager.get_perm_tag_ids(tags), ids)
+
+            # item registered again with the same tags is visible with the resolved ids
+            for tag in tags:
+                self.manager.add_perm_tag(tag, "", 1, self.objdef)
+            self.session.commit()
+            self.assertEqual(self.manager.get_perm_tag_ids(tags), ids)
+            res, total = self.run_query(tags, tag_ids=[ids[tags[-1]]])
+            self.assertEqual([i.id for i in res], [1])
+        finally:
+            AbstractDbManager.keep_perm_tags = False
+
+    def test_no_tag(self):
+        res, total = self.run_query([""], tag_ids=[])
+        self.assertEqual((res, total), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import json
+import unittest
+from binascii import a2b_base64, b2a_base64
+from time import time
+from zlib import compress, decompress
+from beecell.auth import extract
+from beehive.common.perms import (
+    PermissionIndex,
+    PermissionCache,
+    decode_perms,
+    encode_perms,
+    is_perms_snapshot,
+)
+
+
+def legacy_can(perms, action, objtype=None, definition=None):
+    """Linear scan made by ApiController.can before PermissionIndex"""
+    res = {}
+    objids = []
+    for perm in perms:
+        perm_objtype = perm[2]
+        perm_objid = perm[4]
+        perm_action = perm[6]
+        perm_definition = perm[3].lower()
+        if definition is not None:
+            definition = definition.lower()
+            if perm_objtype == objtype and perm_definition == definition and perm_action in ["*", action]:
+                objids.append(perm_objid)
+            if len(objids) > 0:
+                res[definition] = objids
+        elif objtype is not None:
+            if perm_objtype == objtype and perm_action in ["*", action]:
+                res.setdefault(perm_definition, []).append(perm_objid)
+        else:
+            if perm_action in ["*", action]:
+                res.setdefault(perm_definition, []).append(perm_objid)
+    for objdef, objids in res.items():
+        res[objdef] = extract(objids)
+    return res
+
+
+def get_needs(args):
+    act_need = ["*" for i in args]
+    needs = ["//".join(act_need)]
+    pos = 0
+    for arg in args:
+        act_need[pos] = arg
+        needs.append("//".join(act_need))
+        pos += 1
+    return set(needs)
+
+
+def make_perms(num):
+    perms = []
+    actions = ["*", "view", "insert", "update", "delete", "use"]
+    pid = 0
+    for i in range(num):
+        for objtype, objdef in [
+            ("service", "Organization.Division.Account"),
+            ("resource", "Provider.Region.Site.AvailabilityZone"),
+            ("auth", "Role"),
+        ]:
+            levels = len(objdef.split("."))
+            objid = "//".join(["%010x" % (i * (j + 1)) for j in range(levels)])
+            perms.append((pid, i, objtype, objdef, objid, 1, actions[pid % len(actions)]))
+            pid += 1
+    return perms
+
+
+class PermissionIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.perms = make_perms(10000)
+        self.index = PermissionIndex(self.perms)
+
+    def test_can_match_legacy(self):
+        for action in ["view", "use", "*"]:
+            for objtype, objdef in [("service", "Organization.Division.Account"), ("auth", "Role"), ("auth", None)]:
+                legacy = legacy_can(self.perms, action, objtype, definition=objdef)
+                res = self.index.can(action, objtype, definition=objdef)
+                self.assertEqual(legacy.keys(), res.keys())
+                for key in legacy.keys():
+                    self.assertEqual(set(legacy[key]), set(res[key]))
+
+    def test_has_needs_match_legacy(self):
+        objtype, objdef = "service", "Organization.Division.Account"
+        for perm in self.perms[:300]:
+            if perm[2] != objtype:
+                continue
+            needs = get_needs(perm[4].split("//"))
+            objset = set(legacy_can(self.perms, "view", objtype, definition=objdef).get(objdef.lower(), []))
+            legacy = len(needs.intersection(objset)) > 0
+            self.assertEqual(legacy, self.index.has_needs("view", objtype, objdef, needs))
+
+    def test_benchmark(self):
+        objtype, objdef = "service", "Organization.Division.Account"
+        needs = get_needs(self.perms[0][4].split("//"))
+        loops = 20
+
+        start = time()
+        for i in range(loops):
+            objset = set(legacy_can(self.perms, "view", objtype, definition=objdef)[objdef.lower()])
+            len(needs.intersection(objset)) > 0
+        legacy_elapsed = time() - start
+
+        start = time()
+        for i in range(loops):
+            self.index.can("view", objtype, definition=objdef)
+            self.index.has_needs("view", objtype, objdef, needs)
+        index_elapsed = time() - start
+
+        print(
+            "check_authorization x%s over %s perms - legacy: %.4fs - index: %.4fs"
+            % (loops, len(self.perms), legacy_elapsed, index_elapsed)
+        )
+        self.assertLess(index_elapsed, legacy_elapsed)
+
+
+class PermissionCacheTestCase(unittest.TestCase):
+    def test_lru(self):
+        cache = PermissionCache(size=2, ttl=60)
+        index = PermissionIndex(make_perms(10))
+        cache.set("uid1", "d1", index)
+        cache.set("uid2", "d2", index)
+        self.assertIs(cache.get("uid1", "d1"), index)
+        cache.set("uid3", "d3", index)
+        self.assertIsNone(cache.get("uid2", "d2"))
+        self.assertIs(cache.get("uid1", "d1"), index)
+        info = cache.info()
+        self.assertEqual(info["hits"], 2)
+        self.assertEqual(info["misses"], 1)
+        self.assertEqual(info["evictions"], 1)
+
+    def test_digest_change(self):
+        cache = PermissionCache(size=10, ttl=60)
+        index = PermissionIndex(make_perms(10))
+        cache.set("uid1", cache.digest("blob1"), index)
+        self.assertIsNone(cache.get("uid1", cache.digest("blob2")))
+        self.assertIsNone(cache.get("uid1", cache.digest("blob1")))
+
+    def test_expire(self):
+        cache = PermissionCache(size=10, ttl=-1)
+        cache.set("uid1", "d1", PermissionIndex(make_perms(10)))
+        self.assertIsNone(cache.get("uid1", "d1"))
+
+
+class PermissionSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.perms = [list(p) for p in make_perms(10000)]
+
+    def test_encode(self):
+        data = encode_perms(reversed(self.perms))
+        self.assertEqual(decode_perms(data), self.perms)
+        self.assertEqual(data, encode_perms(self.perms))
+        self.assertEqual(decode_perms(encode_perms([])), [])
+
+    def test_is_snapshot(self):
+        self.assertTrue(is_perms_snapshot("snapshot:d41d8cd98f00b204e9800998ecf8427e"))
+        self.assertFalse(is_perms_snapshot(b2a_base64(compress(json.dumps(self.perms[:10]).encode("utf-8")))))
+
+    def test_benchmark(self):
+        legacy = b2a_base64(compress(json.dumps(self.perms).encode("utf-8")))
+        data = encode_perms(self.perms)
+        loops = 10
+
+        start = time()
+        for i in range(loops):
+            json.loads(decompress(a2b_base64(legacy)))
+        legacy_elapsed = time() - start
+
+        start = time()
+        for i in range(loops):
+            decode_perms(data)
+        snapshot_elapsed = time() - start
+
+        print(
+            "decode %s perms x%s - legacy: %s bytes %.4fs - snapshot: %s bytes %.4fs"
+            % (len(self.perms), loops, len(legacy), legacy_elapsed, len(data), snapshot_elapsed)
+        )
+        self.assertLess(len(data), len(legacy))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from time import time
+from unittest.mock import patch
+from marshmallow import fields
+from beehive.common.apimanager import ApiView, PaginatedResponseSchema, ApiObjectResponseSchema
+
+
+class ListItemsResponseSchema(PaginatedResponseSchema):
+    items = fields.Nested(ApiObjectResponseSchema, many=True, required=True, allow_none=True)
+
+
+class ListItems(ApiView):
+    response_schema = ListItemsResponseSchema
+
+
+def make_response(num):
+    items = []
+    for i in range(num):
+        items.append(
+            {
+                "id": i,
+                "uuid": "6d960236-d280-46d2-817d-f3ce8f0aeff7",
+                "name": "item-%s" % i,
+                "desc": "item %s" % i,
+                "active": True,
+                "__meta__": {
+                    "objid": "396587362//3328462822",
+                    "type": "auth",
+                    "definition": "Item",
+                    "uri": "/v1.0/items/%s" % i,
+                },
+                "date": {
+                    "creation": "2015-10-19T14:00:00Z",
+                    "modified": "2015-10-19T14:00:00Z",
+                    "expiry": "2015-10-19T14:00:00Z",
+                },
+            }
+        )
+    return {"items": items, "count": num, "page": 0, "total": num, "sort": {"field": "id", "order": "DESC"}}
+
+
+class ResponseValidationTestCase(unittest.TestCase):
+    def test_schema_cache(self):
+        self.assertIs(ListItems.get_response_schema(), ListItems.get_response_schema())
+
+    def test_modes(self):
+        self.assertTrue(ApiView.check_response_validation("always", 0))
+        self.assertFalse(ApiView.check_response_validation("off", 100))
+        self.assertFalse(ApiView.check_response_validation("sampled", 0))
+        self.assertTrue(ApiView.check_response_validation("sampled", 100))
+        res = [ApiView.check_response_validation("sampled", 10) for i in range(10000)]
+        self.assertTrue(500 < res.count(True) < 1500)
+
+    def test_benchmark(self):
+        resp = make_response(1000)
+        loops = 20
+        # deterministic sampler: random values spread evenly over [0, 1)
+        sampler = [i / loops for i in range(loops)]
+        validated = {}
+        res = {}
+        for mode, sample in [("always", None), ("sampled", 10), ("off", None)]:
+            validated[mode] = 0
+            start = time()
+            with patch("beehive.common.apimanager.random", side_effect=sampler):
+                for i in range(loops):
+                    if ApiView.check_response_validation(mode, sample):
+                        ListItems.get_response_schema().load(data=resp)
+                        validated[mode] += 1
+            res[mode] = time() - start
+
+        # legacy mode: schema instantiated for every response
+        start = time()
+        for i in range(loops):
+            ListItems.response_schema().load(data=resp)
+        res["legacy"] = time() - start
+
+        res = {k: round(v, 3) for k, v in res.items()}
+        print("paginated response with 1000 items - %s responses in s: %s" % (loops, res))
+        self.assertEqual(validated, {"always": loops, "sampled": loops // 10, "off": 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
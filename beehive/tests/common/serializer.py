@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from time import time
+from beehive.common.serializer import JsonSerializer, get_serializer, orjson
+
+
+def make_response(num):
+    items = []
+    for i in range(num):
+        items.append(
+            {
+                "id": i,
+                "uuid": "6d960236-d280-46d2-817d-f3ce8f0aeff7",
+                "name": "item-%s" % i,
+                "desc": "item %s" % i,
+                "active": True,
+                "__meta__": {
+                    "objid": "396587362//3328462822",
+                    "type": "auth",
+                    "definition": "Item",
+                    "uri": "/v1.0/items/%s" % i,
+                },
+                "date": {"creation": "2015-10-19T14:00:00Z", "modified": "2015-10-19T14:00:00Z", "expiry": None},
+                "attributes": {"size": 10.5, "tags": ["a", "b"]},
+            }
+        )
+    return {"items": items, "count": num, "page": 0, "total": num, "sort": {"field": "id", "order": "DESC"}}
+
+
+class SerializerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.serializers = [JsonSerializer()]
+        if orjson is not None:
+            self.serializers.append(get_serializer("orjson"))
+
+    def test_complex_types(self):
+        data = {"date": datetime(2024, 1, 2, 3, 4, 5), "amount": Decimal("10.50"), 1: "int key", "big": 2**70}
+        for serializer in self.serializers:
+            res = json.loads(serializer.dumps(data))
+            self.assertEqual(res["date"], "2024-01-02 03:04:05", serializer.name)
+            self.assertEqual(res["amount"], "10.50", serializer.name)
+            self.assertEqual(res["1"], "int key", serializer.name)
+            self.assertEqual(res["big"], 2**70, serializer.name)
+
+    def test_loads(self):
+        data = make_response(10)
+        for serializer in self.serializers:
+            self.assertEqual(serializer.loads(serializer.dumps(data)), data)
+            self.assertEqual(serializer.loads(serializer.dumps(data).encode("utf-8")), data)
+            self.assertRaises(ValueError, serializer.loads, b"")
+
+    def test_loads_big_int(self):
+        data = '{"big": 18446744073709551616, "negative": -9999999999999999999, "id": "1234567890123456789"}'
+        for serializer in self.serializers:
+            for value in [data, data.encode("utf-8")]:
+                res = serializer.loads(value)
+                self.assertEqual(res["big"], 2**64, serializer.name)
+                self.assertIsInstance(res["big"], int, serializer.name)
+                self.assertEqual(res["negative"], -9999999999999999999, serializer.name)
+                self.assertEqual(res["id"], "1234567890123456789", serializer.name)
+            self.assertEqual(serializer.loads(serializer.dumps({"big": 2**70})), {"big": 2**70}, serializer.name)
+
+    def test_benchmark(self):
+        data = make_response(1000)
+        loops = 20
+        res = {}
+        for serializer in self.serializers:
+            start = time()
+            for i in range(loops):
+                serializer.loads(serializer.dumps(data))
+            res[serializer.name] = round(loops / (time() - start), 1)
+        print("paginated response with 1000 items - dumps and loads/s: %s" % res)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model import SchedulerState, SchedulerStep, SchedulerTask, SchedulerTrace
+from beehive.common.task_v2.handler import TaskResult
+
+
+def make_task(**params):
+    api_manager = SimpleNamespace(
+        task_trace_buffer_size=params.get("buffer_size", 50),
+        task_trace_flush_interval=params.get("flush_interval", 60.0),
+        task_progress_trace="db",
+        event_producer=None,
+        server_name="localhost",
+        http_socket=8080,
+        app_k8s_pod="pod",
+        params={},
+    )
+    return SimpleNamespace(
+        app=SimpleNamespace(api_manager=api_manager),
+        name="task",
+        op="task.run",
+        opid="opid",
+        api_id="api-id",
+        objid="*",
+        entity_class=SimpleNamespace(objtype="task", objdef="Task"),
+        controller=SimpleNamespace(module=SimpleNamespace(api_manager=api_manager)),
+    )
+
+
+class TaskBufferTestCase(unittest.TestCase):
+    task_id = "c1f3f1a4-7b3e-4c39-9a43-6c2d1c3a9b01"
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        for entity in [SchedulerTask, SchedulerStep, SchedulerTrace]:
+            entity.__table__.create(engine)
+        self.session = sessionmaker(bind=engine)()
+        operation.session = self.session
+        operation.transaction = None
+        operation.user = ("user", "127.0.0.1", None)
+        self.session.add(SchedulerTask(self.task_id, "task", SchedulerState.STARTED, None))
+        self.session.commit()
+
+        self.commits = 0
+        event.listen(self.session, "after_commit", self.count)
+
+    def count(self, session):
+        self.commits += 1
+
+    def traces(self):
+        return self.session.query(SchedulerTrace).filter_by(task_id=self.task_id).count()
+
+    def test_step_progress(self):
+        result = TaskResult(make_task(buffer_size=1000))
+        step_id = result.step_add(self.task_id, "step")
+        for i in range(100):
+            result.step_progress(self.task_id, step_id, msg="progress %s" % i)
+        # progress is buffered
+        self.assertEqual(self.commits, 1)
+        self.assertEqual(self.traces(), 1)
+
+        result.step_success(self.task_id, step_id, True)
+        self.assertEqual(self.commits, 2)
+        self.assertEqual(self.traces(), 102)
+        step = self.session.query(SchedulerStep).filter_by(uuid=step_id).one()
+        self.assertEqual(step.status, SchedulerState.SUCCESS)
+        self.assertEqual(result.buffers, {})
+
+    def test_buffer_size(self):
+        result = TaskResult(make_task(buffer_size=10))
+        step_id = result.step_add(self.task_id, "step")
+        for i in range(25):
+            result.step_progress(self.task_id, step_id, msg="progress %s" % i)
+        self.assertEqual(self.commits, 3)
+        self.assertEqual(self.traces(), 21)
+        task = self.session.query(SchedulerTask).filter_by(uuid=self.task_id).one()
+        self.assertIsNotNone(task.run_time)
+
+    def test_step_failure(self):
+        result = TaskResult(make_task())
+        step_id = result.step_add(self.task_id, "step")
+        result.step_progress(self.task_id, step_id, msg="progress")
+        result.step_failure(self.task_id, step_id, "error")
+        messages = [t.message for t in self.session.query(SchedulerTrace).order_by(SchedulerTrace.date)]
+        self.assertEqual(messages, ["start step", "progress", "step error: error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import gzip
+import ujson as json
+import unittest
+from datetime import datetime, timedelta
+from tempfile import mkdtemp
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model import SchedulerState, SchedulerStep, SchedulerTask, SchedulerTrace
+from beehive.module.scheduler_v2.controller import TaskManager
+from beehive.module.scheduler_v2.model import SchedulerDbManager
+
+
+class TaskRetentionTestCase(unittest.TestCase):
+    """Tasks of two names, half of them started 10 days ago. Every task has two steps and three traces."""
+
+    tasks = 20
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        for entity in [SchedulerTask, SchedulerStep, SchedulerTrace]:
+            entity.__table__.create(engine)
+        self.session = sessionmaker(bind=engine)()
+        operation.session = self.session
+        operation.transaction = None
+        operation.authorize = False
+
+        old = datetime.today() - timedelta(days=10)
+        for i in range(self.tasks):
+            name = "task%s" % (i % 2)
+            start_time = old if i < self.tasks // 2 else datetime.today()
+            task_id = "task-%s" % i
+            self.session.add(SchedulerTask(task_id, name, SchedulerState.SUCCESS, start_time))
+            for s in range(2):
+                step = SchedulerStep(task_id, "step%s" % s)
+                self.session.add(step)
+                self.session.flush()
+                for t in range(3 if s == 0 else 0):
+                    self.session.add(SchedulerTrace(task_id, step.uuid, "trace %s" % t, "INFO"))
+        self.session.commit()
+
+        self.commits = 0
+        event.listen(self.session, "after_commit", self.count_commit)
+
+        api_manager = SimpleNamespace(
+            params={},
+            task_retention={},
+            task_retention_days=30,
+            task_archive_path=None,
+            task_purge_chunk=3,
+        )
+        controller = SimpleNamespace(
+            module=SimpleNamespace(api_manager=api_manager),
+            manager=SchedulerDbManager(session=self.session),
+            check_authorization=lambda *args: True,
+        )
+        self.task_manager = TaskManager(controller)
+        self.task_manager.send_event = lambda *args, **kwargs: None
+
+    def count_commit(self, session):
+        self.commits += 1
+
+    def count(self, entity):
+        return self.session.query(func.count(entity.id)).scalar()
+
+    def test_purge_default_retention(self):
+        res = self.task_manager.purge_tasks(retention_days=5)
+        self.assertEqual(res, {"tasks": 10, "steps": 20, "traces": 30, "archive": None})
+        self.assertEqual(self.count(SchedulerTask), 10)
+        self.assertEqual(self.count(SchedulerStep), 20)
+        self.assertEqual(self.count(SchedulerTrace), 30)
+        # every chunk is deleted in its own transaction
+        self.assertEqual(self.commits, 4)
+
+        res = self.task_manager.purge_tasks(retention_days=5)
+        self.assertEqual(res["tasks"], 0)
+
+    def test_purge_retention_per_name(self):
+        # task0 keeps the default retention of 30 days
+        res = self.task_manager.purge_tasks(retention={"task1": 5})
+        self.assertEqual(res["tasks"], 5)
+        self.assertEqual(self.session.query(SchedulerTask).filter_by(name="task1").count(), 5)
+        self.assertEqual(self.session.query(SchedulerTask).filter_by(name="task0").count(), 10)
+
+        # task1 is not purged with the default retention
+        res = self.task_manager.purge_tasks(retention={"task1": 30}, retention_days=5)
+        self.assertEqual(res["tasks"], 5)
+        self.assertEqual(self.session.query(SchedulerTask).filter_by(name="task1").count(), 5)
+        self.assertEqual(self.session.query(SchedulerTask).filter_by(name="task0").count(), 5)
+
+    def test_expired_rules(self):
+        old = datetime.today() - timedelta(days=10)
+        # running task is kept whatever its age
+        self.session.add(SchedulerTask("running", "task0", SchedulerState.STARTED, old))
+        # task never started expires with its stop time
+        revoked = SchedulerTask("revoked", "task0", SchedulerState.REVOKED, None)
+        revoked.stop_time = old
+        self.session.add(revoked)
+        # tasks without start and stop time never expire
+        self.session.add(SchedulerTask("pending", "task0", SchedulerState.PENDING, None))
+        self.session.add(SchedulerTask("ended", "task0", SchedulerState.FAILURE, None))
+        self.session.commit()
+
+        res = self.task_manager.purge_tasks(retention_days=5)
+        self.assertEqual(res["tasks"], 11)
+        uuids = ["running", "revoked", "pending", "ended"]
+        tasks = self.session.query(SchedulerTask).filter(SchedulerTask.uuid.in_(uuids)).all()
+        self.assertEqual(sorted(t.uuid for t in tasks), ["ended", "pending", "running"])
+
+    def test_archive(self):
+        res = self.task_manager.purge_tasks(retention_days=5, archive_path=mkdtemp())
+        with gzip.open(res["archive"], "rt") as archive:
+            records = [json.loads(line) for line in archive]
+        self.assertEqual(len(records), 10)
+        self.assertEqual(sorted(r["task"]["uuid"] for r in records), sorted("task-%s" % i for i in range(10)))
+        for record in records:
+            self.assertEqual(len(record["steps"]), 2)
+            self.assertEqual([t["message"] for t in record["traces"]], ["trace 0", "trace 1", "trace 2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
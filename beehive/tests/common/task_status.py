@@ -0,0 +1,85 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import os
+import unittest
+from time import time
+from types import SimpleNamespace
+from uuid import uuid4
+from redis import Redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model import SchedulerState, SchedulerTask
+from beehive.common.task_v2.handler import TASK_END_PREFIX, TASK_STATUS_PREFIX, TaskResult
+from beehive.module.scheduler_v2.model import SchedulerDbManager
+
+redis_uri = os.getenv("BEEHIVE_TEST_REDIS_URI", "redis://localhost:6379/0")
+
+
+def redis_available():
+    try:
+        return Redis.from_url(redis_uri, socket_timeout=1).ping()
+    except Exception:
+        return False
+
+
+@unittest.skipUnless(redis_available(), "redis %s is not available" % redis_uri)
+class TaskStatusTestCase(unittest.TestCase):
+    tasks = 200
+    requests = 500
+
+    def setUp(self):
+        self.redis = Redis.from_url(redis_uri)
+        api_manager = SimpleNamespace(params={"expire": 60})
+        self.task = SimpleNamespace(app=SimpleNamespace(api_manager=api_manager), redis=self.redis)
+        self.task_ids = [str(uuid4()) for i in range(self.tasks)]
+
+    def tearDown(self):
+        keys = [TASK_STATUS_PREFIX + task_id for task_id in self.task_ids]
+        keys.extend([TASK_END_PREFIX + task_id for task_id in self.task_ids])
+        self.redis.delete(*keys)
+
+    def test_set_status(self):
+        result = TaskResult(self.task)
+        task_id = self.task_ids[0]
+        result.set_status(task_id, SchedulerState.STARTED)
+        self.assertEqual(self.redis.hget(TASK_STATUS_PREFIX + task_id, "status"), b"STARTED")
+        self.assertEqual(self.redis.llen(TASK_END_PREFIX + task_id), 0)
+        self.assertGreater(self.redis.ttl(TASK_STATUS_PREFIX + task_id), 0)
+
+        result.set_status(task_id, SchedulerState.SUCCESS)
+        self.assertEqual(self.redis.hget(TASK_STATUS_PREFIX + task_id, "status"), b"SUCCESS")
+        self.assertEqual(self.redis.lrange(TASK_END_PREFIX + task_id, 0, -1), [b"SUCCESS"])
+
+    def test_benchmark(self):
+        engine = create_engine("sqlite://")
+        SchedulerTask.__table__.create(engine)
+        session = sessionmaker(bind=engine)()
+        operation.session = session
+        operation.transaction = None
+        result = TaskResult(self.task)
+        for task_id in self.task_ids:
+            session.add(SchedulerTask(task_id, "task", SchedulerState.STARTED, None))
+            result.set_status(task_id, SchedulerState.STARTED)
+        session.commit()
+        manager = SchedulerDbManager(session=session)
+
+        start = time()
+        for i in range(self.requests):
+            tasks, total = manager.get_tasks(task_id=self.task_ids[i % self.tasks], with_perm_tag=False)
+            self.assertEqual(tasks[0].status, SchedulerState.STARTED)
+        db = self.requests / (time() - start)
+
+        start = time()
+        for i in range(self.requests):
+            status = self.redis.hget(TASK_STATUS_PREFIX + self.task_ids[i % self.tasks], "status")
+            self.assertEqual(status, b"STARTED")
+        cache = self.requests / (time() - start)
+        print("read %s task status - database: %.0f req/s redis: %.0f req/s" % (self.requests, db, cache))
+        self.assertGreater(cache, db)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import unittest
+from types import SimpleNamespace
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from beehive.common.data import operation
+from beehive.common.model import SchedulerState, SchedulerStep, SchedulerTask, SchedulerTrace
+from beehive.module.scheduler_v2.controller import Task, TaskManager
+from beehive.module.scheduler_v2.model import SchedulerDbManager
+
+
+class TaskStepsTestCase(unittest.TestCase):
+    """A page of tasks with some steps and traces. Last task has no step and no trace."""
+
+    tasks = 20
+    steps = 3
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        for entity in [SchedulerTask, SchedulerStep, SchedulerTrace]:
+            entity.__table__.create(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        operation.session = self.session
+        operation.transaction = None
+
+        for i in range(self.tasks):
+            task_id = "task-%s" % i
+            self.session.add(SchedulerTask(task_id, "task", SchedulerState.SUCCESS, None))
+            if i == self.tasks - 1:
+                continue
+            for s in range(self.steps):
+                step = SchedulerStep(task_id, "step%s" % s)
+                self.session.add(step)
+                self.session.flush()
+                self.session.add(SchedulerTrace(task_id, step.uuid, "trace %s" % s, "INFO"))
+        self.session.commit()
+
+        api_manager = SimpleNamespace(params={})
+        self.controller = SimpleNamespace(
+            module=SimpleNamespace(api_manager=api_manager),
+            manager=SchedulerDbManager(session=self.session),
+        )
+        self.task_manager = TaskManager(self.controller)
+
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self.count)
+
+    def tearDown(self):
+        event.remove(self.engine, "before_cursor_execute", self.count)
+
+    def count(self, *args):
+        self.statements.append(args[2])
+
+    def get_tasks(self):
+        models = self.session.query(SchedulerTask).order_by(SchedulerTask.id).all()
+        self.statements.clear()
+        return [Task(self.controller, oid=m.id, objid=m.objid, name=m.name, model=m) for m in models]
+
+    def test_load_steps(self):
+        tasks = self.task_manager.load_steps(self.get_tasks())
+        # steps query and trace summary query, whatever the number of tasks
+        self.assertEqual(len(self.statements), 2)
+
+        for task in tasks[:-1]:
+            info = task.info()
+            self.assertEqual([s["name"] for s in info["steps"]], ["step0", "step1", "step2"])
+            self.assertEqual(info["trace_count"], self.steps)
+            self.assertEqual(info["last_trace"]["message"], "trace 2")
+        info = tasks[-1].info()
+        self.assertEqual(info["steps"], [])
+        self.assertEqual(info["trace_count"], 0)
+        self.assertIsNone(info["last_trace"])
+
+    def test_load_steps_without_traces(self):
+        tasks = self.task_manager.load_steps(self.get_tasks(), traces=False)
+        self.assertEqual(len(self.statements), 1)
+        self.assertNotIn("trace_count", tasks[0].info())
+
+    def test_post_get(self):
+        tasks = self.get_tasks()
+        tasks[0].post_get()
+        steps = tasks[0].steps
+
+        # loaded steps are not read again
+        tasks = self.task_manager.load_steps(self.get_tasks())
+        tasks[0].post_get()
+        self.assertEqual(len(self.statements), 2)
+        self.assertEqual(tasks[0].detail()["steps"], steps)
+
+
+if __name__ == "__main__":
+    unittest.main()
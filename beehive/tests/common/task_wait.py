@@ -0,0 +1,105 @@
+# SPDX-License-Identifier: EUPL-1.2
+#
+# (C) Copyright 2018-2024 CSI-Piemonte
+
+import ujson as json
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Thread, Timer
+from time import time
+from six.moves.urllib.parse import urlparse, parse_qs
+from beehive.common.client.apiclient import BeehiveApiClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Stub of the scheduler_v2 task api. Task ends when ended event is set"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    ended = Event()
+    status_requests = 0
+    timeouts = 0
+    headers = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        url = urlparse(self.path)
+        if url.path.endswith("/status"):
+            Handler.status_requests += 1
+            Handler.headers.append(self.headers.get("CSI-Nvl-Timeout"))
+            wait = int(parse_qs(url.query).get("wait", [0])[0])
+            if Handler.timeouts > 0:
+                # api timeout elapsed before task end
+                Handler.timeouts -= 1
+                return self.send_json(408, {"code": 408, "message": "Request Timeout"})
+            if wait > 0:
+                Handler.ended.wait(wait)
+            status = "SUCCESS" if Handler.ended.is_set() else "STARTED"
+            res = {"task_instance": {"uuid": "task", "status": status}}
+        else:
+            res = {"task_instance": {"uuid": "task", "status": "SUCCESS"}}
+        self.send_json(200, res)
+
+    def send_json(self, code, res):
+        body = json.dumps(res).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TaskWaitTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.ended.clear()
+        Handler.status_requests = 0
+        Handler.timeouts = 0
+        Handler.headers = []
+        self.client = BeehiveApiClient([], "keyauth", None, "", None)
+        self.client.set_endpoints({"resource": "http://127.0.0.1:%s" % self.server.server_address[1]})
+
+    def wait_task(self, **kwargs):
+        Timer(0.5, Handler.ended.set).start()
+        start = time()
+        self.client.wait_task("resource", "nrs", "task", **kwargs)
+        return time() - start
+
+    def test_poll(self):
+        elapsed = self.wait_task(delta=0.1)
+        self.assertGreater(Handler.status_requests, 3)
+        self.assertGreater(elapsed, 0.5)
+
+    def test_long_poll(self):
+        elapsed = self.wait_task(wait=10)
+        self.assertEqual(Handler.status_requests, 1)
+        self.assertLess(elapsed, 1.0)
+        # api timeout is extended beyond wait
+        self.assertEqual(Handler.headers, ["15"])
+
+    def test_request_timeout(self):
+        Handler.timeouts = 1
+        status = self.client.get_task_status("resource", "nrs", "task", wait=10)
+        self.assertEqual(status, "UNKNOWN")
+
+        # task is still running after a status request timeout
+        Handler.timeouts = 1
+        elapsed = self.wait_task(wait=10)
+        self.assertEqual(Handler.status_requests, 3)
+        self.assertLess(elapsed, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -47,6 +47,7 @@ tests = [
     "test_get_user_roles",
     "test_get_role_users",
     "test_get_user_permissions",
+    "test_get_login_permissions",
     "test_verify_user_password",
     "test_verify_user_password_bad",
     "test_append_user_role",
@@ -300,6 +301,11 @@ class AuthManagerTestCase(BeehiveTestCase):
         user = self.manager.get_user(name="user1")[0]
         res = self.manager.get_user_permissions(user)
 
+    def test_get_login_permissions(self):
+        user = self.manager.get_user(name="user1")[0]
+        res = self.manager.get_login_permissions(user)
+        self.assertEqual(res, self.manager.get_login_permissions(user))
+
     def test_get_user_permissions2(self):
         user = self.manager.get_user(name="user2")[0]
         res = self.manager.get_user_permissions(user)
@@ -22,6 +22,9 @@ tests = [
     "test_add_user_twice",
     "test_get_users",
     "test_get_users_by_role",
+    "test_get_users_stream",
+    "test_get_users_cursor",
+    "test_get_users_count_strategy",
     "test_get_user",
     "test_get_user_secret",
     "test_get_user_roles",
@@ -209,6 +212,26 @@ class AuthTestCase(BeehiveTestCase):
     def test_get_users_by_role(self):
         self.get("/v1.0/nas/users", query={"role": "Guest"})
 
+    def test_get_users_stream(self):
+        res = self.get("/v1.0/nas/users", query={"size": -1, "stream": True})
+        self.assertEqual(res["count"], len(res["users"]))
+        self.assertEqual(res["count"], res["total"])
+
+    def test_get_users_cursor(self):
+        res = self.get("/v1.0/nas/users", query={"size": 1, "cursor": ""})
+        first = res["users"][0]["id"]
+        res = self.get("/v1.0/nas/users", query={"size": 1, "cursor": res["next_cursor"]})
+        self.assertLess(res["users"][0]["id"], first)
+
+    def test_get_users_count_strategy(self):
+        total = self.get("/v1.0/nas/users", query={"size": 1})["total"]
+        for strategy in ["exact", "cached", "window"]:
+            res = self.get("/v1.0/nas/users", query={"size": 1, "count_strategy": strategy})
+            self.assertEqual(res["count_strategy"], strategy)
+            self.assertEqual(res["total"], total)
+        res = self.get("/v1.0/nas/users", query={"size": 1, "count_strategy": "has_more"})
+        self.assertEqual(res["has_more"], total > 1)
+
     def test_get_user(self):
         self.get("/v1.0/nas/users/{oid}", params={"oid": "user_prova@local"})
 
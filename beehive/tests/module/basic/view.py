@@ -5,8 +5,9 @@
 from beehive.common.test import runtest, BeehiveTestCase
 
 tests = [
-    "test_ping"
+    "test_ping",
     #'test_info',
+    "test_metrics",
 ]
 
 
@@ -28,6 +29,9 @@ class BaseTestCase(BeehiveTestCase):
     def test_info(self):
         self.get("/v1.0/server")
 
+    def test_metrics(self):
+        self.get("/v1.0/server/metrics", query={"prefix": "api."})
+
 
 def run(args):
     runtest(BaseTestCase, tests, args)
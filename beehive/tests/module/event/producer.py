@@ -5,7 +5,7 @@
 from beehive.common.event import EventProducerRedis
 from beehive.common.test import BeehiveTestCase, runtest
 
-tests = ["test_send_event", "test_get_event"]
+tests = ["test_send_event", "test_send_event_buffered", "test_get_event"]
 
 
 class EventProducerTestCase(BeehiveTestCase):
@@ -42,6 +42,19 @@ class EventProducerTestCase(BeehiveTestCase):
         data = {"key": "value"}
         self.client.send_sync(event_type, data, source, dest)
 
+    def test_send_event_buffered(self):
+        event_type = "prova"
+        source = {"user": "admin", "ip": "localhost", "identity": "uid"}
+        dest = {"ip": "localhost", "port": 6060, "objid": 123, "objtype": "test", "objdef": "test1"}
+        self.client.set_buffered(queue_size=100, batch_size=10, max_latency=0.5)
+        for i in range(25):
+            self.client.send(event_type, {"key": i}, source, dest)
+        self.client.stop()
+        info = self.client.info()
+        self.assertEqual(info["sent"], 25)
+        self.assertEqual(info["batches"], 3)
+        self.assertEqual(info["pending"], 0)
+
     def test_get_event(self):
         self.get("/v1.0/nes/events", query={"type": "prova"})
 